@@ -16,8 +16,9 @@ column_list: column_def (',' column_def)* ;
 column_def: ID type_spec ;
 type_spec: INT | VARCHAR '(' NUMBER ')' | TEXT | BOOLEAN ;
 
-insert_stmt: INSERT INTO ID '(' id_list ')' VALUES '(' value_list ')' ;
+insert_stmt: INSERT INTO ID '(' id_list ')' VALUES row (',' row)* ;
 id_list: ID (',' ID)* ;
+row: '(' value_list ')' ;
 value_list: literal (',' literal)* ;
 literal: NUMBER | STRING | NULL | TRUE | FALSE ;
 
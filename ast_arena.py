@@ -0,0 +1,406 @@
+# ast_arena.py
+# Arena compacta para los ASTs de los parsers (RDParserMatch del punto 5, ParserLL1 del punto 3, y
+# cualquier árbol de tuplas (etiqueta, hijos...) como los de earley_punto4).
+#
+# - Cada nodo es una fila en arrays tipados: código de tipo (kind), cadena de envoltorios colapsados
+#   (wrap), fin de su rango de hijos en el array children (estilo CSR) y offsets inicio/fin en el texto.
+# - Los hijos son enteros: >= 0 es otro nodo, < 0 es ~índice en la tabla de átomos (valores
+#   constantes internados: nombres de operador, nombres de tabla, None, '(' ...).
+# - Los nodos ε (Ep, 'ε') no se guardan como nodos: son un átomo compartido.
+# - Cadenas de un solo hijo se colapsan: E -> T -> F -> id queda como un único nodo id cuyo wrap
+#   recuerda los niveles E, T, F (y los ε de cada nivel), así que no cuestan memoria por nodo.
+# - Hojas (tipo, valor) cuyo valor es exactamente el texto del token no guardan el valor: se corta
+#   del texto fuente al pedirlo.
+# - Arena es una secuencia de raíces: arena[i] arma la tupla de siempre solo para esa raíz, así el
+#   código que consume listas de sentencias sigue funcionando; ArenaVisitor recorre sin recursión.
+# - parse_program_arena(texto) / parse_expression_arena(texto) parsean directo a una arena; las
+#   subclases SpanRDParser / SpanParserLL1 anotan el rango de texto de lo que devuelve cada parse_*.
+
+from array import array
+from collections.abc import Sequence
+from functools import wraps
+
+from diagnostics import ErrorBudgetExceeded
+import rd_parser_match_punto5 as rd
+import codigo_del_3 as ll1
+
+EPSILON = 'ε'
+LIST = '[]'         # kind of nodes rebuilt as lists
+TUPLE = '()'        # kind of untagged tuples, e.g. (column, type) in CREATE
+
+# tuple heads taken as node kinds; any other tuple is stored as an untagged TUPLE node
+RD_TAGS = frozenset({
+    'create', 'insert', 'insert_many', 'select', 'update', 'delete', 'error_stmt',
+    'num', 'str', 'id', 'true', 'false', 'null', 'error_expr', 'error_cond',
+    'PLUS', 'MINUS', 'TIMES', 'DIV', 'eq', 'neq', 'lt', 'le', 'gt', 'ge', 'assign', 'and', 'or',
+})
+LL1_TAGS = frozenset({'E', 'Ep', 'T', 'Tp', 'F', 'id', 'num'})
+
+def _is_epsilon(x):
+    return type(x) is tuple and len(x) == 2 and x[1] == EPSILON and type(x[0]) is str
+
+class Arena(Sequence):
+    """Typed-array AST storage; a Sequence of root nodes rebuilt lazily as tuples."""
+
+    def __init__(self, source=None, tags=None):
+        self.source = source
+        self.tags = tags                    # None: every tuple with a str head is a tagged node
+        self.kind = array('H')
+        self.wrap = array('H')
+        self.child_end = array('I')
+        self.start = array('i')             # -1: span unknown
+        self.end = array('i')
+        self.children = array('i')
+        self.roots = array('i')
+        self.kind_names = []
+        self.kind_leaf = []                 # kind codes of (tag, value) leaves read from the source
+        self._kinds = {}
+        self.atoms = []
+        self._atoms = {}
+        self._eps = set()                   # atom refs of ε nodes
+        self.wraps = [()]                   # wrap code -> ((kind, before, after), ...) outermost first
+        self._wraps = {(): 0}
+
+    # --- interning
+
+    def _kind(self, name, leaf=False):
+        key = (name, leaf)
+        code = self._kinds.get(key)
+        if code is None:
+            code = self._kinds[key] = len(self.kind_names)
+            self.kind_names.append(name)
+            self.kind_leaf.append(leaf)
+        return code
+
+    def atom(self, value):
+        """Child reference (< 0) of a constant value."""
+        # str atoms (the common case) are their own key; others keep the type apart (1 vs True vs 1.0)
+        key = value if type(value) is str else (type(value), value)
+        ref = self._atoms.get(key)
+        if ref is None:
+            ref = self._atoms[key] = ~len(self.atoms)
+            self.atoms.append(value)
+            if _is_epsilon(value):
+                self._eps.add(ref)
+        return ref
+
+    def _wrap(self, levels):
+        code = self._wraps.get(levels)
+        if code is None:
+            code = self._wraps[levels] = len(self.wraps)
+            self.wraps.append(levels)
+        return code
+
+    # --- building
+
+    def node(self, kind, refs=(), start=-1, end=-1, leaf=False):
+        """Append a node; refs are child references (nodes >= 0, atoms < 0)."""
+        self.children.extend(refs)
+        self.kind.append(self._kind(kind, leaf))
+        self.wrap.append(0)
+        self.child_end.append(len(self.children))
+        self.start.append(start)
+        self.end.append(end)
+        return len(self.kind) - 1
+
+    def _tagged(self, x):
+        return type(x) is tuple and x and type(x[0]) is str and (self.tags is None or x[0] in self.tags)
+
+    def add_tree(self, tree, spans=None):
+        """Store a tuple/list tree; returns its reference. spans: {id(obj): (obj, start, end)}."""
+        spans = spans or {}
+        src = self.source
+        out = []
+        stack = [(tree, False, None)]
+        while stack:
+            x, done, outer = stack.pop()
+            if not done:
+                if type(x) is list or (type(x) is tuple and not _is_epsilon(x)):
+                    tagged = self._tagged(x)
+                    items = x[1:] if tagged else x
+                    if len(items) != 1:
+                        stack.append((x, True, None))
+                        stack.extend((c, False, None) for c in reversed(items))
+                        continue
+                    # the span of a node with a single item is also the item's span when the item
+                    # has none of its own (('F', ('id', v)) in ParserLL1)
+                    sp = spans.get(id(x), outer)
+                    if (tagged and sp is not None and src is not None and type(items[0]) is str
+                            and src[sp[1]:sp[2]] == items[0]):
+                        out.append(self.node(x[0], (), sp[1], sp[2], leaf=True))
+                        continue
+                    stack.append((x, True, outer))
+                    stack.append((items[0], False, sp))
+                else:
+                    out.append(self.atom(x))
+                continue
+            tagged = self._tagged(x)
+            n = len(x) - 1 if tagged else len(x)
+            refs = out[len(out) - n:] if n else []
+            del out[len(out) - n:]
+            sp = spans.get(id(x), outer)
+            if sp is not None:
+                s, e = sp[1], sp[2]
+            else:
+                # no parse_* boundary for this object: cover its child nodes
+                s = min((self.start[r] for r in refs if r >= 0 and self.start[r] >= 0), default=-1)
+                e = max((self.end[r] for r in refs if r >= 0), default=-1)
+            if not tagged:
+                out.append(self.node(LIST if type(x) is list else TUPLE, refs, s, e))
+                continue
+            nodes = [k for k, r in enumerate(refs) if r >= 0 or r not in self._eps]
+            if len(nodes) == 1 and refs[nodes[0]] >= 0:
+                # single-child chain: fold this level into the child's wrap
+                k = nodes[0]
+                child = refs[k]
+                level = (x[0], tuple(self.atoms[~r] for r in refs[:k]), tuple(self.atoms[~r] for r in refs[k + 1:]))
+                self.wrap[child] = self._wrap((level,) + self.wraps[self.wrap[child]])
+                if s >= 0:
+                    self.start[child] = min(s, self.start[child]) if self.start[child] >= 0 else s
+                    self.end[child] = max(e, self.end[child])
+                out.append(child)
+                continue
+            out.append(self.node(x[0], refs, s, e))
+        return out[0]
+
+    def append(self, tree, spans=None):
+        ref = self.add_tree(tree, spans)
+        self.roots.append(ref)
+        return ref
+
+    # --- reading
+
+    def kind_name(self, ref):
+        return self.kind_names[self.kind[ref]] if ref >= 0 else None
+
+    def child_refs(self, ref):
+        return self.children[self.child_end[ref - 1] if ref else 0:self.child_end[ref]]
+
+    def span(self, ref):
+        return (self.start[ref], self.end[ref]) if ref >= 0 and self.start[ref] >= 0 else None
+
+    def value(self, ref):
+        """Atom value, or the source text of a leaf node."""
+        if ref < 0:
+            return self.atoms[~ref]
+        if self.kind_leaf[self.kind[ref]]:
+            return self.source[self.start[ref]:self.end[ref]]
+        return None
+
+    def wrappers(self, ref):
+        """Collapsed levels above a node, outermost first, as (kind, atoms before, atoms after)."""
+        return self.wraps[self.wrap[ref]] if ref >= 0 else ()
+
+    def to_tuple(self, ref):
+        """The original tuple/list shape of a reference (no recursion, any depth)."""
+        if ref < 0:
+            return self.atoms[~ref]
+        atoms, names, leaf, wraps = self.atoms, self.kind_names, self.kind_leaf, self.wraps
+        ends, children, kind, wrap = self.child_end, self.children, self.kind, self.wrap
+        starts, stops, src = self.start, self.end, self.source
+        # nodes are stored in post-order, so the subtree of ref is the index range [first, ref]:
+        # first is reached by following first node children down
+        first = ref
+        while True:
+            c = next((c for c in children[ends[first - 1] if first else 0:ends[first]] if c >= 0), -1)
+            if c < 0:
+                break
+            first = c
+        vals = []
+        lo = ends[first - 1] if first else 0
+        for r in range(first, ref + 1):
+            hi = ends[r]
+            items = [vals[c - first] if c >= 0 else atoms[~c] for c in children[lo:hi]]
+            lo = hi
+            k = kind[r]
+            name = names[k]
+            if leaf[k]:
+                v = (name, src[starts[r]:stops[r]])
+            elif name == LIST:
+                v = items
+            elif name == TUPLE:
+                v = tuple(items)
+            else:
+                v = (name, *items)
+            w = wrap[r]
+            if w:
+                for level, before, after in reversed(wraps[w]):
+                    v = (level, *before, v, *after)
+            vals.append(v)
+        return vals[-1]
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.to_tuple(r) for r in self.roots[i]]
+        return self.to_tuple(self.roots[i])
+
+    def nbytes(self):
+        """Bytes held by the typed arrays (the atom/kind/wrap tables are shared and small)."""
+        return sum(a.itemsize * len(a) for a in (self.kind, self.wrap, self.child_end, self.start,
+                                                 self.end, self.children, self.roots))
+
+    def stats(self):
+        return {'nodes': len(self.kind), 'child_refs': len(self.children), 'atoms': len(self.atoms),
+                'kinds': len(self.kind_names), 'wrap_chains': len(self.wraps) - 1, 'array_bytes': self.nbytes()}
+
+class ArenaVisitor:
+    """Iterative walk over arena nodes. For each node enter_<kind>(ref), else enter(ref), runs before
+    its children and leave_<kind>(ref), else leave(ref), after them; an enter returning False skips
+    the children. Atoms are not visited; self.arena is set during visit()."""
+
+    def visit(self, arena, ref):
+        self.arena = arena
+        stack = [(ref, False)]
+        while stack:
+            r, done = stack.pop()
+            name = arena.kind_names[arena.kind[r]]
+            if done:
+                getattr(self, 'leave_' + name, self.leave)(r)
+                continue
+            if getattr(self, 'enter_' + name, self.enter)(r) is False:
+                continue
+            stack.append((r, True))
+            stack.extend((c, False) for c in reversed(arena.child_refs(r)) if c >= 0)
+
+    def enter(self, ref):
+        pass
+
+    def leave(self, ref):
+        pass
+
+# --- parsers annotating spans
+
+def _span_wrapper(fn, cursor):
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        c0 = getattr(self, cursor)
+        result = fn(self, *args, **kwargs)
+        if self.buf is not None and type(result) in (tuple, list) and id(result) not in self.spans:
+            # innermost call wins: an outer parse_* returning the same object keeps the tighter span
+            c1 = getattr(self, cursor)
+            s = self.buf.starts[c0]
+            self.spans[id(result)] = (result, s, self.buf.ends[c1 - 1] if c1 > c0 else s)
+        return result
+    return wrapper
+
+def with_spans(cls, cursor):
+    """Subclass of cls whose parse_* results get their source span in self.spans (TokenBuffer input).
+    cursor: attribute holding the current token index ('j' in RDParserMatch, 'i' in ParserLL1)."""
+    ns = {name: _span_wrapper(getattr(cls, name), cursor)
+          for name in dir(cls) if name.startswith('parse_') and callable(getattr(cls, name))}
+
+    def __init__(self, *args, **kwargs):
+        cls.__init__(self, *args, **kwargs)
+        self.spans = {}
+    ns['__init__'] = __init__
+    return type(f'Span{cls.__name__}', (cls,), ns)
+
+SpanRDParser = with_spans(rd.RDParserMatch, 'j')
+SpanParserLL1 = with_spans(ll1.ParserLL1, 'i')
+
+def parse_program_arena(text, **parser_kwargs):
+    """Like RDParserMatch(tokenize_buffer(text)).parse_program(), into an Arena; returns (arena, errors).
+    Each statement's tuples only live until the statement is stored."""
+    buf = rd.tokenize_buffer(text)
+    p = SpanRDParser(buf, **parser_kwargs)
+    arena = Arena(buf.src, RD_TAGS)
+    try:
+        while p.kind != rd.K_EOF:
+            arena.append(p.parse_terminated_stmt(), p.spans)
+            p.spans.clear()
+    except ErrorBudgetExceeded:
+        pass
+    return arena, p.errors
+
+def parse_expression_arena(text):
+    """Like codigo_del_3.parse_expression(text), into an Arena with one root."""
+    buf = ll1.tokenize_buffer(text)
+    p = SpanParserLL1(buf)
+    ast = p.parse_E()
+    if p.kind != ll1.K_EOF:
+        raise SyntaxError(f"Extra input after valid expression at pos {p.curr.pos}: {p.curr}")
+    arena = Arena(buf.src, LL1_TAGS)
+    arena.append(ast, p.spans)
+    return arena
+
+if __name__ == '__main__':
+    import gc
+    import random
+    import sys
+    import tracemalloc
+
+    class KindCounter(ArenaVisitor):
+        def __init__(self):
+            self.counts = {}
+
+        def enter(self, ref):
+            name = self.arena.kind_name(ref)
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    expr = 'a + b / (c - 12) + d'
+    arena = parse_expression_arena(expr)
+    print('expression:', expr)
+    print('  same tree as parse_expression:', arena[0] == ll1.parse_expression(expr))
+    print('  ', arena.stats())
+    root = arena.roots[0]
+    print('  root', arena.kind_name(root), arena.span(root), 'children',
+          [(arena.kind_name(c), arena.span(c), arena.wrappers(c)) if c >= 0 else arena.value(c)
+           for c in arena.child_refs(root)])
+
+    script = """
+    CREATE TABLE users (id INT, name VARCHAR(100), active BOOLEAN);
+    INSERT INTO users (id, name, active) VALUES (1, 'Ana', TRUE), (2, 'Bo', FALSE);
+    SELECT id, name FROM users WHERE active = TRUE AND id > 1 + 2;
+    UPDATE users SET = 'x' WHERE id = 2;
+    DELETE FROM users WHERE (id = 1 OR name = 'Bo');
+    """
+    arena, errors = parse_program_arena(script)
+    plain = rd.RDParserMatch(rd.tokenize_buffer(script))
+    print('\nscript: same statements as parse_program:', list(arena) == plain.parse_program(),
+          '| same errors:', list(errors) == list(plain.errors))
+    for r in arena.roots:
+        s, e = arena.span(r)
+        print(f'  {arena.kind_name(r):<12} {s:>4}-{e:<4} {script[s:e][:60]!r}')
+    v = KindCounter()
+    for r in arena.roots:
+        v.visit(arena, r)
+    print('  kinds:', v.counts)
+
+    # retained memory: tuple ASTs vs arena, for a generated script and a long LL(1) expression
+    rng = random.Random(23)
+    stmts = []
+    for k in range(5000):
+        c = rng.randrange(4)
+        if c == 0:
+            stmts.append(f"INSERT INTO t{k % 50} (id, name, score) VALUES ({k}, 'n{k}', {rng.randrange(1000)});")
+        elif c == 1:
+            stmts.append(f"SELECT id, name FROM t{k % 50} WHERE score > {k} AND name = 'n{k}';")
+        elif c == 2:
+            stmts.append(f"UPDATE t{k % 50} SET score = score + {k} WHERE id = {k};")
+        else:
+            stmts.append(f"DELETE FROM t{k % 50} WHERE id = {k} OR score < {k} - 3;")
+    big = '\n'.join(stmts)
+    long_expr = ' + '.join(f'(x{k} - {k}) / y' for k in range(1000))
+    cases = (('RD script', big, lambda t: rd.RDParserMatch(rd.tokenize_buffer(t)).parse_program(),
+              lambda t: parse_program_arena(t)[0]),
+             ('LL(1) expression', long_expr, ll1.parse_expression, parse_expression_arena))
+    sys.setrecursionlimit(100000)
+    for label, text, as_tuples, as_arena in cases:
+        sizes = []
+        for build in (as_tuples, as_arena):
+            gc.collect()
+            tracemalloc.start()
+            result = build(text)
+            gc.collect()        # RDParserMatch keeps a bound method of itself: free the parser and tokens
+            sizes.append(tracemalloc.get_traced_memory()[0])
+            tracemalloc.stop()
+            del result
+        a = as_arena(text)
+        st = a.stats()
+        print(f'\n{label}: {len(text)} chars, {st["nodes"]} arena nodes, {st["atoms"]} atoms, '
+              f'{st["wrap_chains"]} wrap chains')
+        print(f'  retained: tuples {sizes[0] / 1e6:.2f} MB, arena {sizes[1] / 1e6:.2f} MB '
+              f'({sizes[0] / sizes[1]:.1f}x smaller); arrays alone {st["array_bytes"] / 1e6:.2f} MB')
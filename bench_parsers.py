@@ -0,0 +1,257 @@
+# bench_parsers.py
+# Benchmark de escalamiento para los parsers del parcial: RDParserMatch (punto 5), ParserLL1 (punto 3),
+# CYK / Earley (punto 4) y el parser ANTLR (punto 2, solo si antlr4 y antlr_out están instalados).
+#
+# - Generador sintético con semilla: número de sentencias, profundidad de expresiones, ancho de
+#   VALUES y densidad de errores.
+# - Cada motor se corre con tamaños crecientes; se reporta throughput, latencia por token,
+#   memoria pico (tracemalloc) y el exponente de escalamiento ajustado (t ~ n^k).
+# - Los resultados se escriben en JSON; con --baseline se comparan contra una corrida anterior.
+#
+# Uso: python bench_parsers.py --sizes 100,200,400,800 --engines rd,ll1,cyk --out bench.json
+
+import argparse, json, math, platform, random, sys, time, tracemalloc
+
+# ---------------------------------------------------------------- workload generation
+
+def _expr(rng, depth, ops='+-/'):
+    # random arithmetic expression over ids/numbers with nesting up to `depth`
+    if depth <= 0 or rng.random() < 0.3:
+        return rng.choice(['a', 'b', 'qty', 'price', str(rng.randint(0, 999))])
+    left = _expr(rng, depth - 1, ops)
+    right = _expr(rng, depth - 1, ops)
+    e = f'{left} {rng.choice(ops)} {right}'
+    return f'({e})' if rng.random() < 0.5 else e
+
+def _literal(rng):
+    r = rng.random()
+    if r < 0.5:
+        return str(rng.randint(0, 10**6))
+    if r < 0.8:
+        return "'" + ''.join(rng.choice('abcdefghij_') for _ in range(rng.randint(1, 12))) + "'"
+    return rng.choice(['TRUE', 'FALSE', 'NULL'])
+
+def _break(rng, stmt):
+    # inject one syntax error: drop a token or insert a stray one
+    words = stmt.rstrip(';').split(' ')
+    k = rng.randrange(len(words))
+    if rng.random() < 0.5 and len(words) > 1:
+        del words[k]
+    else:
+        words.insert(k, rng.choice(['=', ',', 'FROM', '(']))
+    return ' '.join(words) + ';'
+
+def generate_sql(n_statements, expr_depth=3, values_width=5, error_density=0.0, seed=0):
+    rng = random.Random(seed)
+    cols = [f'c{k}' for k in range(values_width)]
+    out = [f"CREATE TABLE t ({', '.join(c + ' INT' for c in cols)});"]
+    for _ in range(n_statements - 1):
+        kind = rng.random()
+        if kind < 0.4:
+            stmt = f"INSERT INTO t ({', '.join(cols)}) VALUES ({', '.join(_literal(rng) for _ in cols)});"
+        elif kind < 0.7:
+            stmt = f"SELECT {', '.join(rng.sample(cols, min(2, len(cols))))} FROM t WHERE {_expr(rng, expr_depth)} < {_expr(rng, expr_depth)};"
+        elif kind < 0.9:
+            stmt = f"UPDATE t SET {rng.choice(cols)} = {_expr(rng, expr_depth)} WHERE c0 = {rng.randint(0, 999)};"
+        else:
+            stmt = f"DELETE FROM t WHERE c0 >= {_expr(rng, expr_depth)};"
+        if rng.random() < error_density:
+            stmt = _break(rng, stmt)
+        out.append(stmt)
+    return '\n'.join(out) + '\n'
+
+def generate_expression(n_ops, expr_depth=3, seed=0):
+    # flat chain of n_ops operators whose operands are small nested expressions (ParserLL1 syntax)
+    rng = random.Random(seed)
+    parts = [_expr(rng, expr_depth, '+-*/') for _ in range(n_ops + 1)]
+    return ' '.join(p + ' ' + rng.choice('+-*/') for p in parts[:-1]) + ' ' + parts[-1]
+
+def expression_terminals(s):
+    # token list in the terminal alphabet of cyk_full_punto4.GRAMMAR (ids and numbers -> 'id')
+    from codigo_del_3 import tokenize
+    sym = {'PLUS': '+', 'MINUS': '-', 'TIMES': '*', 'DIV': '/', 'LPAREN': '(', 'RPAREN': ')'}
+    return [sym.get(t.type, 'id') for t in tokenize(s) if t.type != 'EOF']
+
+# ---------------------------------------------------------------- engines
+# every engine is (prepare(size, args) -> (input, n_tokens, n_bytes), run(input))
+
+def _prep_sql(size, args):
+    from rd_parser_match_punto5 import tokenize_buffer
+    s = generate_sql(size, args.expr_depth, args.values_width, args.error_density, args.seed)
+    return s, len(tokenize_buffer(s)), len(s.encode('utf-8'))
+
+def _run_rd(s):
+    from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+    return RDParserMatch(tokenize_buffer(s), iterative_expr=True).parse_program()
+
+def _run_antlr(s):
+    from antlr4 import InputStream, CommonTokenStream
+    from antlr_out.CRUDLexer import CRUDLexer
+    from antlr_out.CRUDParser import CRUDParser
+    parser = CRUDParser(CommonTokenStream(CRUDLexer(InputStream(s))))
+    parser.removeErrorListeners()
+    return parser.program()
+
+def _prep_expr(size, args):
+    from codigo_del_3 import tokenize_buffer
+    s = generate_expression(size, args.expr_depth, args.seed)
+    return s, len(tokenize_buffer(s)), len(s.encode('utf-8'))
+
+def _run_ll1(s):
+    from codigo_del_3 import parse_expression
+    return parse_expression(s, iterative=True)
+
+def _run_ll1_table(s):
+    from codigo_del_3 import parse_expression_table
+    return parse_expression_table(s)
+
+def _prep_terminals(size, args):
+    toks = expression_terminals(generate_expression(size, args.expr_depth, args.seed))
+    return toks, len(toks), sum(len(t) for t in toks)
+
+def _run_cyk(toks):
+    from cyk_full_punto4 import GRAMMAR, compile_grammar, cyk_bitset
+    return cyk_bitset(toks, compile_grammar(GRAMMAR, 'E'), 'E')
+
+def _run_earley(toks):
+    from cyk_full_punto4 import GRAMMAR
+    from earley_punto4 import earley
+    return earley(toks, GRAMMAR, 'E')
+
+ENGINES = {
+    'rd':        (_prep_sql, _run_rd),
+    'antlr':     (_prep_sql, _run_antlr),
+    'll1':       (_prep_expr, _run_ll1),
+    'll1-table': (_prep_expr, _run_ll1_table),
+    'cyk':       (_prep_terminals, _run_cyk),
+    'earley':    (_prep_terminals, _run_earley),
+}
+
+def engine_available(name):
+    if name != 'antlr':
+        return True
+    try:
+        import antlr4, antlr_out.CRUDParser  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# ---------------------------------------------------------------- measurement
+
+def fit_exponent(sizes, times):
+    # least squares slope of log(time) against log(size)
+    pts = [(math.log(n), math.log(t)) for n, t in zip(sizes, times) if n > 0 and t > 0]
+    if len(pts) < 2:
+        return None
+    mx = sum(x for x, _ in pts) / len(pts)
+    my = sum(y for _, y in pts) / len(pts)
+    den = sum((x - mx) ** 2 for x, _ in pts)
+    return sum((x - mx) * (y - my) for x, y in pts) / den if den else None
+
+def measure(name, size, args):
+    prep, run = ENGINES[name]
+    data, n_tokens, n_bytes = prep(size, args)
+    run(data)   # warm-up: imports, grammar compilation, lazy tables
+    best = float('inf')
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    run(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'size': size,
+        'tokens': n_tokens,
+        'bytes': n_bytes,
+        'seconds': best,
+        'tokens_per_s': n_tokens / best if best else None,
+        'mb_per_s': n_bytes / best / 1e6 if best else None,
+        'us_per_token': best / n_tokens * 1e6 if n_tokens else None,
+        'peak_bytes': peak,
+    }
+
+def run_suite(args):
+    results = {}
+    for name in args.engines:
+        if not engine_available(name):
+            results[name] = {'skipped': 'antlr4 runtime or generated antlr_out package not available'}
+            continue
+        sizes = [n for n in args.sizes if name not in ('cyk', 'earley') or n <= args.max_cyk]
+        runs = [measure(name, n, args) for n in sizes]
+        results[name] = {
+            'runs': runs,
+            'exponent': fit_exponent([r['tokens'] for r in runs], [r['seconds'] for r in runs]),
+        }
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'expr_depth': args.expr_depth,
+            'values_width': args.values_width,
+            'error_density': args.error_density,
+            'repeat': args.repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def compare(baseline, current, tolerance=0.2):
+    # regressions: same engine and size, per-token latency worse than baseline by more than tolerance
+    out = []
+    for name, res in current['results'].items():
+        old = baseline.get('results', {}).get(name, {})
+        old_runs = {r['size']: r for r in old.get('runs', ())}
+        for r in res.get('runs', ()):
+            o = old_runs.get(r['size'])
+            if o and o['us_per_token'] and r['us_per_token'] > o['us_per_token'] * (1 + tolerance):
+                out.append((name, r['size'], o['us_per_token'], r['us_per_token']))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Scaling benchmark for the CRUD / expression parsers')
+    ap.add_argument('--engines', default='rd,ll1,ll1-table,cyk,earley,antlr')
+    ap.add_argument('--sizes', default='100,200,400,800')
+    ap.add_argument('--max-cyk', type=int, default=400, help='largest size run through cyk/earley')
+    ap.add_argument('--expr-depth', type=int, default=3)
+    ap.add_argument('--values-width', type=int, default=5)
+    ap.add_argument('--error-density', type=float, default=0.0)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--out', default=None, help='write JSON results here (default: stdout)')
+    ap.add_argument('--baseline', default=None, help='previous JSON results to check for regressions')
+    ap.add_argument('--tolerance', type=float, default=0.2)
+    args = ap.parse_args(argv)
+    args.engines = [e for e in args.engines.split(',') if e]
+    args.sizes = [int(n) for n in args.sizes.split(',') if n]
+    unknown = [e for e in args.engines if e not in ENGINES]
+    if unknown:
+        ap.error(f'unknown engines: {unknown}')
+    report = run_suite(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    for name, res in report['results'].items():
+        if 'runs' in res:
+            last = res['runs'][-1] if res['runs'] else None
+            exp = res['exponent']
+            print(f"{name:10s} exponent={exp if exp is None else round(exp, 2)}"
+                  + (f" tokens/s={last['tokens_per_s']:.0f} us/token={last['us_per_token']:.2f}" if last else ''),
+                  file=sys.stderr)
+        else:
+            print(f"{name:10s} skipped: {res['skipped']}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for name, size, old, new in regressions:
+            print(f'REGRESSION {name} size={size}: {old:.2f} -> {new:.2f} us/token', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,10 @@
 import re, sys
 from pprint import pprint
 
+from token_buffer import TokenBuffer
+from ll1_table import LL1Table, VALUE
+from dfa_lexer import DFALexer
+
 TOKENS = [
     ('NUMBER',   r'\d+'),
     ('ID',       r'[a-zA-Z_][a-zA-Z0-9_]*'),
@@ -41,34 +45,77 @@ def tokenize(s):
         yield Token(kind, val, m.start())
     yield Token('EOF','', len(s))
 
+# Integer token kinds; sets of kinds are tested as bitmasks
+TOKEN_NAMES = ['EOF'] + [name for name, _ in TOKENS if name not in ('WS', 'MISMATCH')]
+KIND = {name: k for k, name in enumerate(TOKEN_NAMES)}
+K_EOF, K_NUMBER, K_ID, K_PLUS, K_MINUS, K_TIMES, K_DIV, K_LPAREN, K_RPAREN = range(len(TOKEN_NAMES))
+M_ADDOP = (1 << K_PLUS) | (1 << K_MINUS)
+M_MULOP = (1 << K_TIMES) | (1 << K_DIV)
+
+def tokenize_buffer_re(s):
+    # same tokens as tokenize(), stored as a TokenBuffer (kinds + offsets, no Token objects)
+    buf = TokenBuffer(s, TOKEN_NAMES, (), Token)
+    kinds, starts, ends = buf.kinds.append, buf.starts.append, buf.ends.append
+    for m in TOK_REGEX.finditer(s):
+        kind = m.lastgroup
+        if kind == 'WS': continue
+        if kind == 'MISMATCH':
+            raise SyntaxError(f'Unexpected char {m.group()!r} at {m.start()}')
+        kinds(KIND[kind]); starts(m.start()); ends(m.end())
+    kinds(K_EOF); starts(len(s)); ends(len(s))
+    return buf
+
+def _unexpected_char(val, pos):
+    return SyntaxError(f'Unexpected char {val!r} at {pos}')
+
+# TOKENS compiled to a DFA (dfa_lexer.py); same TokenBuffer as tokenize_buffer_re
+DFA_LEXER = DFALexer(TOKENS, TOKEN_NAMES, skip=('WS',), token_cls=Token, error=_unexpected_char)
+
+def tokenize_buffer(s):
+    return DFA_LEXER.tokenize(s)
+
 class ParserLL1:
     def __init__(self, tokens):
-        self.tokens = list(tokens)
+        if isinstance(tokens, TokenBuffer):
+            self.buf = tokens
+            self.kinds = tokens.kinds
+        else:
+            # plain Token streams are still accepted; their kinds are computed once up front
+            self.buf = None
+            self.tokens = list(tokens)
+            self.kinds = [KIND[t.type] for t in self.tokens]
         self.i = 0
-        self.curr = self.tokens[self.i]
+        self.last = len(self.kinds) - 1
+        self.kind = self.kinds[0]
     def next(self):
-        self.i += 1
-        if self.i < len(self.tokens):
-            self.curr = self.tokens[self.i]
-        else:
-            self.curr = Token('EOF','', self.curr.pos if self.curr else 0)
+        if self.i < self.last:
+            self.i += 1
+            self.kind = self.kinds[self.i]
+    # Token view of the current token (debugging, error messages)
+    @property
+    def curr(self):
+        return self.tokens[self.i] if self.buf is None else self.buf.token(self.i)
+    def value(self):
+        return self.tokens[self.i].value if self.buf is None else self.buf.value(self.i)
     def match(self, expected):
-        # expected: token type string or tuple/list of types
-        if isinstance(expected, str):
+        # expected: token kind or tuple of kinds
+        if isinstance(expected, int):
             expected = (expected,)
-        if self.curr.type in expected:
-            val = self.curr.value
+        if self.kind in expected:
+            val = self.value()
             self.next()
             return val
-        raise SyntaxError(f"Expected {expected} at pos {self.curr.pos}, got {self.curr.type} ('{self.curr.value}')")
+        curr = self.curr
+        names = tuple(TOKEN_NAMES[k] for k in expected)
+        raise SyntaxError(f"Expected {names} at pos {curr.pos}, got {curr.type} ('{curr.value}')")
     # Grammar functions
     def parse_E(self):
         t = self.parse_T()
         ep = self.parse_Ep()
         return ('E', t, ep)
     def parse_Ep(self):
-        if self.curr.type in ('PLUS','MINUS'):
-            op = self.curr.type; self.next()
+        if (1 << self.kind) & M_ADDOP:
+            op = TOKEN_NAMES[self.kind]; self.next()
             t = self.parse_T()
             ep = self.parse_Ep()
             return ('Ep', op, t, ep)
@@ -79,39 +126,122 @@ class ParserLL1:
         tp = self.parse_Tp()
         return ('T', f, tp)
     def parse_Tp(self):
-        if self.curr.type in ('TIMES','DIV'):
-            op = self.curr.type; self.next()
+        if (1 << self.kind) & M_MULOP:
+            op = TOKEN_NAMES[self.kind]; self.next()
             f = self.parse_F()
             tp = self.parse_Tp()
             return ('Tp', op, f, tp)
         return ('Tp', 'ε')
     def parse_F(self):
-        if self.curr.type == 'LPAREN':
-            self.match('LPAREN')
+        k = self.kind
+        if k == K_LPAREN:
+            self.match(K_LPAREN)
             e = self.parse_E()
-            self.match('RPAREN')
+            self.match(K_RPAREN)
             return ('F', '(', e, ')')
-        if self.curr.type == 'ID':
-            v = self.match('ID'); return ('F', ('id', v))
-        if self.curr.type == 'NUMBER':
-            v = self.match('NUMBER'); return ('F', ('num', v))
+        if k == K_ID:
+            v = self.match(K_ID); return ('F', ('id', v))
+        if k == K_NUMBER:
+            v = self.match(K_NUMBER); return ('F', ('num', v))
         raise SyntaxError(f"Unexpected token in F at pos {self.curr.pos}: {self.curr}")
 
-def parse_expression(s):
-    toks = tokenize(s)
+    # Iterative version of parse_E (same tree, same errors): operator precedence with an explicit
+    # stack of open parentheses, so long '+'/'*' chains and deep nesting never hit the recursion limit.
+    # terms holds (op, T) for the E being built and factors holds (op, F) for the current T.
+    def parse_E_iterative(self):
+        frames = []
+        terms, addop, factors, mulop = [], None, [], None
+        while True:
+            k = self.kind
+            if k == K_LPAREN:
+                self.next()
+                frames.append((terms, addop, factors, mulop))
+                terms, addop, factors, mulop = [], None, [], None
+                continue
+            if k == K_ID:
+                f = ('F', ('id', self.match(K_ID)))
+            elif k == K_NUMBER:
+                f = ('F', ('num', self.match(K_NUMBER)))
+            else:
+                raise SyntaxError(f"Unexpected token in F at pos {self.curr.pos}: {self.curr}")
+            factors.append((mulop, f))
+            while True:
+                k = self.kind
+                if (1 << k) & M_MULOP:
+                    mulop = TOKEN_NAMES[k]; self.next()
+                    break
+                terms.append((addop, _build_chain('T', 'Tp', factors)))
+                factors, mulop = [], None
+                if (1 << k) & M_ADDOP:
+                    addop = TOKEN_NAMES[k]; self.next()
+                    break
+                e = _build_chain('E', 'Ep', terms)
+                if not frames:
+                    return e
+                self.match(K_RPAREN)
+                terms, addop, factors, mulop = frames.pop()
+                factors.append((mulop, ('F', '(', e, ')')))
+
+def _build_chain(head, tail, items):
+    # [(None, x0), (op1, x1), ...] -> (head, x0, (tail, op1, x1, (tail, ... (tail, 'ε'))))
+    rest = (tail, 'ε')
+    for k in range(len(items) - 1, 0, -1):
+        op, node = items[k]
+        rest = (tail, op, node, rest)
+    return (head, items[0][1], rest)
+
+def parse_expression(s, iterative=False):
+    toks = tokenize_buffer(s)
     p = ParserLL1(toks)
-    ast = p.parse_E()
-    if p.curr.type != 'EOF':
+    ast = p.parse_E_iterative() if iterative else p.parse_E()
+    if p.kind != K_EOF:
         raise SyntaxError(f"Extra input after valid expression at pos {p.curr.pos}: {p.curr}")
     return ast
 
+# Versión dirigida por tabla: la misma gramática en formato dict (terminales = tipos de token),
+# tabla LL(1) generada con FIRST/FOLLOW/PRED calculados y una pila explícita en vez de recursión.
+# Produce los mismos árboles que ParserLL1, no depende del límite de recursión y es algo más rápida
+# con miles de tokens (~1.1-1.5x), más lenta con pocos (~0.75x); ver ll1_table.py.
+EXPR_GRAMMAR = {
+    'E' : [('T','Ep')],
+    'Ep': [('PLUS','T','Ep'), ('MINUS','T','Ep'), ()],
+    'T' : [('F','Tp')],
+    'Tp': [('TIMES','F','Tp'), ('DIV','F','Tp'), ()],
+    'F' : [('LPAREN','E','RPAREN'), ('ID',), ('NUMBER',)],
+}
+
+EXPR_TABLE = LL1Table(EXPR_GRAMMAR, 'E', TOKEN_NAMES, end='EOF')
+
+# how each token kind appears in the tree (same leaves as ParserLL1)
+EXPR_LEAVES = list(TOKEN_NAMES)
+EXPR_LEAVES[K_ID] = ('id', VALUE)
+EXPR_LEAVES[K_NUMBER] = ('num', VALUE)
+EXPR_LEAVES[K_LPAREN] = '('
+EXPR_LEAVES[K_RPAREN] = ')'
+
+def parse_expression_table(s):
+    buf = tokenize_buffer(s)
+    ast, i = EXPR_TABLE.parse(buf, EXPR_LEAVES)
+    if buf.kinds[i] != K_EOF:
+        raise SyntaxError(f"Extra input after valid expression at pos {buf.starts[i]}: {buf.token(i)}")
+    return ast
+
 if __name__ == '__main__':
+    from parse_profile import Profile, profile_arg, profile_ll1
     samples = [
         "id + id * id",
         "( id + id ) * id",
         "id + - id",
         "(1 + 2) * 3",
     ]
+    dest = profile_arg(sys.argv[1:])
+    if dest:
+        # the same parses, instrumented; nothing but the JSON is printed so tools can read it
+        prof = Profile()
+        for s in samples:
+            profile_ll1(s, prof)
+        prof.dump(dest)
+        sys.exit(0)
     for s in samples:
         try:
             print('\nInput:', s)
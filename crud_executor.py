@@ -0,0 +1,468 @@
+# crud_executor.py
+# Motor de ejecución en memoria para los AST que produce RDParserMatch (punto 5).
+#
+# - CREATE arma almacenamiento por columnas: array('q') para INT, array('b') para BOOLEAN (con un
+#   bytearray de validez para NULL) y listas para VARCHAR/TEXT.
+# - INSERT / UPDATE / DELETE modifican las columnas; DELETE marca filas como borradas y vacuum()
+#   compacta la tabla. Un INSERT que falla (tipo, rango de INT, largo de VARCHAR) no deja ninguna
+#   de sus filas: las columnas se recortan al largo que tenían antes.
+# - WHERE se evalúa columna a columna sobre vectores de selección (listas de índices de fila): AND
+#   filtra la selección que dejó el lado izquierdo, OR une las dos, y las comparaciones
+#   columna-constante recorren el array directamente. No se arman diccionarios por fila.
+# - Índices hash opcionales (create_index, o auto_index=True) convierten WHERE col = N en una
+#   búsqueda O(1).
+# - Comparar con NULL da falso; = y == son la misma igualdad.
+
+import operator
+from array import array
+from itertools import compress
+
+from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer, literal_value, iter_insert_rows
+
+class ExecutionError(Exception):
+    pass
+
+_COMPARE = {
+    'assign': operator.eq, 'eq': operator.eq, 'neq': operator.ne,
+    'lt': operator.lt, 'le': operator.le, 'gt': operator.gt, 'ge': operator.ge,
+}
+_FLIPPED = {'assign': 'assign', 'eq': 'eq', 'neq': 'neq', 'lt': 'gt', 'le': 'ge', 'gt': 'lt', 'ge': 'le'}
+_LITERALS = ('num', 'str', 'true', 'false', 'null')
+
+def _div(a, b):
+    if b == 0:
+        raise ExecutionError('division by zero')
+    if isinstance(a, int) and isinstance(b, int):
+        q = abs(a) // abs(b)     # integer division truncates toward zero, as in SQL
+        return q if (a < 0) == (b < 0) else -q
+    return a / b
+
+_ARITH = {'PLUS': operator.add, 'MINUS': operator.sub, 'TIMES': operator.mul, 'DIV': _div}
+_INT_MIN, _INT_MAX = -2**63, 2**63 - 1      # range of array('q')
+
+class Column:
+    def __init__(self, name, type_):
+        self.name = name
+        self.type = type_
+        self.limit = None
+        if type_ == 'INT':
+            self.data, self.valid, self.pytype = array('q'), bytearray(), int
+        elif type_ == 'BOOLEAN':
+            self.data, self.valid, self.pytype = array('b'), bytearray(), bool
+        elif type_ == 'TEXT' or type_.startswith('VARCHAR'):
+            self.data, self.valid, self.pytype = [], None, str
+            if type_.startswith('VARCHAR(') and type_[8:-1].isdigit():
+                self.limit = int(type_[8:-1])
+        else:
+            raise ExecutionError(f'unsupported type {type_} for column {name}')
+
+    def check(self, v):
+        if v is None:
+            return v
+        if self.pytype is int:
+            if type(v) is not int:
+                raise ExecutionError(f'column {self.name} is INT, got {v!r}')
+            if not _INT_MIN <= v <= _INT_MAX:
+                raise ExecutionError(f'value out of range for {self.name}: {v!r}')
+        if self.pytype is bool and type(v) is not bool:
+            raise ExecutionError(f'column {self.name} is BOOLEAN, got {v!r}')
+        if self.pytype is str:
+            if type(v) is not str:
+                raise ExecutionError(f'column {self.name} is {self.type}, got {v!r}')
+            if self.limit is not None and len(v) > self.limit:
+                raise ExecutionError(f'value too long for {self.name} {self.type}: {v!r}')
+        return v
+
+    def append(self, v):
+        if self.valid is None:
+            self.data.append(v)
+            return
+        try:
+            self.data.append(0 if v is None else v)
+        except OverflowError:
+            raise ExecutionError(f'value out of range for {self.name}: {v!r}') from None
+        self.valid.append(v is not None)
+
+    def truncate(self, n):
+        del self.data[n:]
+        if self.valid is not None:
+            del self.valid[n:]
+
+    def get(self, i):
+        if self.valid is None:
+            return self.data[i]
+        if not self.valid[i]:
+            return None
+        return bool(self.data[i]) if self.pytype is bool else self.data[i]
+
+    def set(self, i, v):
+        if self.valid is None:
+            self.data[i] = v
+            return
+        try:
+            self.data[i] = 0 if v is None else v
+        except OverflowError:
+            raise ExecutionError(f'value out of range for {self.name}: {v!r}') from None
+        self.valid[i] = v is not None
+
+    def values(self, sel):
+        # column values at the selected rows, None for NULL
+        data, valid = self.data, self.valid
+        if valid is None:
+            return [data[i] for i in sel]
+        if self.pytype is bool:
+            return [bool(data[i]) if valid[i] else None for i in sel]
+        return [data[i] if valid[i] else None for i in sel]
+
+    def compact(self, keep):
+        if self.valid is None:
+            self.data = [self.data[i] for i in keep]
+        else:
+            self.data = array(self.data.typecode, (self.data[i] for i in keep))
+            self.valid = bytearray(self.valid[i] for i in keep)
+
+class Table:
+    def __init__(self, name, cols):
+        self.name = name
+        self.columns = {}
+        for col, type_ in cols:
+            if col in self.columns:
+                raise ExecutionError(f'duplicate column {col} in table {name}')
+            self.columns[col] = Column(col, type_)
+        self.nrows = 0                # rows ever stored, including deleted ones
+        self.live = bytearray()
+        self.deleted = 0
+        self.indexes = {}             # column -> {value: set of row ids}
+
+    def __len__(self):
+        return self.nrows - self.deleted
+
+    def column(self, name):
+        if '.' in name:
+            tbl, name = name.split('.', 1)
+            if tbl != self.name:
+                raise ExecutionError(f'unknown table {tbl} in {self.name} query')
+        col = self.columns.get(name)
+        if col is None:
+            raise ExecutionError(f'unknown column {name} in table {self.name}')
+        return col
+
+    def all_rows(self):
+        if not self.deleted:
+            return list(range(self.nrows))
+        return list(compress(range(self.nrows), self.live))
+
+    def create_index(self, name):
+        col = self.column(name)
+        index = {}
+        live = self.live
+        for i, v in enumerate(col.values(range(self.nrows))):
+            if v is not None and live[i]:
+                index.setdefault(v, set()).add(i)
+        self.indexes[col.name] = index
+
+    def _index_add(self, name, v, i):
+        index = self.indexes.get(name)
+        if index is not None and v is not None:
+            index.setdefault(v, set()).add(i)
+
+    def _index_remove(self, name, v, i):
+        index = self.indexes.get(name)
+        if index is not None and v is not None:
+            rows = index.get(v)
+            if rows is not None:
+                rows.discard(i)
+                if not rows:
+                    del index[v]
+
+    def _rollback(self, n):
+        # drop the rows appended from row n on (a failed INSERT must not leave columns of
+        # different lengths behind)
+        for name in self.indexes:
+            col = self.columns[name]
+            for i in range(n, len(col.data)):
+                self._index_remove(name, col.get(i), i)
+        for col in self.columns.values():
+            col.truncate(n)
+        del self.live[n:]
+        self.nrows = n
+
+    def insert(self, values):
+        # values: column name -> Python value (missing columns are NULL)
+        row = {name: col.check(values.get(name)) for name, col in self.columns.items()}
+        i = self.nrows
+        try:
+            for name, col in self.columns.items():
+                col.append(row[name])
+                self._index_add(name, row[name], i)
+            self.live.append(1)
+            self.nrows += 1
+        except BaseException:
+            self._rollback(i)
+            raise
+
+    def insert_many(self, ids, rows):
+        # rows: tuples of Python values in the order of ids; appended column by column
+        cols = [self.column(name) for name in ids]
+        if len(set(c.name for c in cols)) != len(cols):
+            raise ExecutionError(f'duplicate column in INSERT INTO {self.name}')
+        missing = [c for c in self.columns.values() if c not in cols]
+        indexed = [(k, c.name) for k, c in enumerate(cols) if c.name in self.indexes]
+        start = self.nrows
+        try:
+            for row in rows:
+                if len(row) != len(cols):
+                    raise ExecutionError(f'INSERT INTO {self.name}: {len(cols)} columns but {len(row)} values')
+                for c, v in zip(cols, row):
+                    c.check(v)
+                for c, v in zip(cols, row):
+                    c.append(v)
+                for c in missing:
+                    c.append(None)
+                for k, name in indexed:
+                    self._index_add(name, row[k], self.nrows)
+                self.live.append(1)
+                self.nrows += 1
+        except BaseException:
+            self._rollback(start)    # all rows of the statement or none
+            raise
+        return self.nrows - start
+
+    def vacuum(self):
+        if not self.deleted:
+            return
+        keep = self.all_rows()
+        for col in self.columns.values():
+            col.compact(keep)
+        self.nrows, self.deleted = len(keep), 0
+        self.live = bytearray(b'\x01') * self.nrows
+        for name in list(self.indexes):
+            self.create_index(name)
+
+class Result:
+    """Rows of a SELECT, as tuples in column order."""
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return f'Result({self.columns}, {len(self.rows)} rows)'
+
+class Database:
+    def __init__(self, auto_index=False):
+        self.tables = {}
+        self.auto_index = auto_index   # index a column the first time it is equality-filtered
+
+    def table(self, name):
+        t = self.tables.get(name)
+        if t is None:
+            raise ExecutionError(f'unknown table {name}')
+        return t
+
+    def create_index(self, table, column):
+        self.table(table).create_index(column)
+
+    def bulk_load(self, source):
+        """Load a script of INSERT statements (text, bytes, mmap, PathLike path or file object)
+        through the iter_insert_rows fast path, without building ASTs. Returns the number of rows."""
+        n = 0
+        current, batch = None, []
+        for table, cols, row in iter_insert_rows(source):
+            if (table, cols) != current:
+                if batch:
+                    n += self.table(current[0]).insert_many(current[1], batch)
+                current, batch = (table, cols), []
+            batch.append(row)
+            if len(batch) >= 4096:
+                n += self.table(table).insert_many(cols, batch)
+                batch = []
+        if batch:
+            n += self.table(current[0]).insert_many(current[1], batch)
+        return n
+
+    def execute_script(self, s):
+        """Parse and run a whole script; parse errors raise SyntaxError before anything runs."""
+        p = RDParserMatch(tokenize_buffer(s))
+        stmts = p.parse_program()
+        if p.errors:
+            raise SyntaxError(p.errors.render(s))
+        return [self.execute(stm) for stm in stmts]
+
+    def execute(self, stm):
+        kind = stm[0]
+        if kind == 'create':
+            _, name, cols = stm
+            if name is None or not cols:
+                raise ExecutionError('incomplete CREATE TABLE')
+            if name in self.tables:
+                raise ExecutionError(f'table {name} already exists')
+            self.tables[name] = Table(name, cols)
+            return 0
+        if kind == 'insert':
+            _, name, ids, vals = stm
+            t = self.table(name)
+            if len(ids) != len(vals):
+                raise ExecutionError(f'INSERT INTO {name}: {len(ids)} columns but {len(vals)} values')
+            for col in ids:
+                t.column(col)
+            t.insert({col: literal_value(v) for col, v in zip(ids, vals)})
+            return 1
+        if kind == 'insert_many':
+            _, name, ids, rows = stm
+            return self.table(name).insert_many(ids, [tuple(literal_value(v) for v in vals) for vals in rows])
+        if kind == 'select':
+            return self._select(*stm[1:])
+        if kind == 'update':
+            return self._update(*stm[1:])
+        if kind == 'delete':
+            _, name, where = stm
+            t = self.table(name)
+            sel = self.where(t, where)
+            for i in sel:
+                t.live[i] = 0
+                for col in t.indexes:
+                    t._index_remove(col, t.columns[col].get(i), i)
+            t.deleted += len(sel)
+            return len(sel)
+        raise ExecutionError(f'can not execute {kind}')
+
+    def _select(self, items, name, where):
+        t = self.table(name)
+        sel = self.where(t, where)
+        names, cols = [], []
+        for item in items:
+            if item == '*':
+                names.extend(t.columns); cols.extend(t.columns.values())
+                continue
+            alias = None
+            if isinstance(item, tuple):
+                item, alias = item
+            col = t.column(item)
+            names.append(alias or col.name); cols.append(col)
+        return Result(names, list(zip(*[c.values(sel) for c in cols])) if cols else [])
+
+    def _update(self, name, assigns, where):
+        t = self.table(name)
+        sel = self.where(t, where)
+        # every right-hand side sees the old row, as in SQL
+        new = [(t.column(col), self.eval_expr(t, expr, sel)) for col, expr in assigns]
+        for col, vals in new:
+            for v in vals:
+                col.check(v)
+        for col, vals in new:
+            indexed = col.name in t.indexes
+            for i, v in zip(sel, vals):
+                if indexed:
+                    t._index_remove(col.name, col.get(i), i)
+                    t._index_add(col.name, v, i)
+                col.set(i, v)
+        return len(sel)
+
+    # --- column-at-a-time evaluation over selection vectors
+
+    def where(self, t, cond, sel=None):
+        """Row ids (ascending) of the rows of t that satisfy cond; sel=None means all live rows."""
+        if cond is None:
+            return t.all_rows() if sel is None else sel
+        op = cond[0]
+        if op == 'and':
+            return self.where(t, cond[2], self.where(t, cond[1], sel))
+        if op == 'or':
+            left = self.where(t, cond[1], sel)
+            base = t.all_rows() if sel is None else sel
+            taken = set(left)
+            right = self.where(t, cond[2], [i for i in base if i not in taken])
+            if not right:
+                return left
+            taken.update(right)
+            return [i for i in base if i in taken]
+        if op not in _COMPARE:
+            raise ExecutionError(f'can not evaluate condition {cond!r}')
+        _, l, r = cond
+        if r[0] == 'id' and l[0] in _LITERALS:
+            op, l, r = _FLIPPED[op], r, l
+        if l[0] == 'id' and r[0] in _LITERALS:
+            return self._compare_const(t, op, t.column(l[1]), literal_value(r), sel)
+        if sel is None:
+            sel = t.all_rows()
+        f = _COMPARE[op]
+        try:
+            return [i for i, a, b in zip(sel, self.eval_expr(t, l, sel), self.eval_expr(t, r, sel))
+                    if a is not None and b is not None and f(a, b)]
+        except TypeError as e:
+            raise ExecutionError(f'can not compare in {cond!r}: {e}') from None
+
+    def _compare_const(self, t, op, col, c, sel):
+        if c is None:
+            return []
+        if op in ('eq', 'assign'):
+            if col.name not in t.indexes and self.auto_index:
+                t.create_index(col.name)
+            index = t.indexes.get(col.name)
+            if index is not None:
+                rows = index.get(c, ())
+                if sel is None:
+                    return sorted(rows)
+                return [i for i in sel if i in rows] if len(rows) > len(sel) else sorted(rows.intersection(sel))
+        if sel is None:
+            sel = t.all_rows()
+        f = _COMPARE[op]
+        data, valid = col.data, col.valid
+        if col.pytype is bool:
+            c = int(c) if type(c) is bool else c
+        try:
+            if valid is None:
+                if f is operator.eq:
+                    return [i for i in sel if data[i] == c]
+                return [i for i in sel if data[i] is not None and f(data[i], c)]
+            if f is operator.eq:
+                return [i for i in sel if data[i] == c and valid[i]]
+            return [i for i in sel if valid[i] and f(data[i], c)]
+        except TypeError as e:
+            raise ExecutionError(f'can not compare {col.name} with {c!r}: {e}') from None
+
+    def eval_expr(self, t, expr, sel):
+        """Values of expr at the selected rows (a list aligned with sel)."""
+        tag = expr[0]
+        if tag == 'id':
+            return t.column(expr[1]).values(sel)
+        if tag in _LITERALS:
+            return [literal_value(expr)] * len(sel)
+        f = _ARITH.get(tag)
+        if f is None:
+            raise ExecutionError(f'can not evaluate expression {expr!r}')
+        left = self.eval_expr(t, expr[1], sel)
+        right = self.eval_expr(t, expr[2], sel)
+        try:
+            return [None if a is None or b is None else f(a, b) for a, b in zip(left, right)]
+        except TypeError as e:
+            raise ExecutionError(f'can not evaluate {expr!r}: {e}') from None
+
+if __name__ == '__main__':
+    import time
+    db = Database()
+    db.execute_script("""
+        CREATE TABLE users (id INT, name VARCHAR(100), active BOOLEAN, score INT);
+        INSERT INTO users (id, name, active, score) VALUES (1, 'Ana', TRUE, 10);
+        INSERT INTO users (id, name, active, score) VALUES (2, 'Luis', FALSE, 7);
+        INSERT INTO users (id, name, score) VALUES (3, 'Eva', 12);
+    """)
+    print(db.execute_script("SELECT id, name AS who FROM users WHERE score > 8 OR id = 2;")[0].rows)
+    db.execute_script("UPDATE users SET score = score + score + 1 WHERE name = 'Luis'; DELETE FROM users WHERE id = 3;")
+    print(db.execute_script("SELECT * FROM users;")[0].rows)
+
+    n = 200000
+    t = db.table('users')
+    for k in range(4, n):
+        t.insert({'id': k, 'name': f'user{k}', 'active': k % 2 == 0, 'score': k % 100})
+    q = ('select', ['id', 'name'], 'users', ('assign', ('id', 'id'), ('num', str(n // 2))))
+    t0 = time.perf_counter(); r1 = db.execute(q); t1 = time.perf_counter()
+    db.create_index('users', 'id')
+    t2 = time.perf_counter(); r2 = db.execute(q); t3 = time.perf_counter()
+    print('WHERE id = N  scan:', round((t1 - t0) * 1000, 2), 'ms  index:', round((t3 - t2) * 1000, 3), 'ms  same:', r1.rows == r2.rows)
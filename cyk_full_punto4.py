@@ -3,12 +3,22 @@
 # Implementación de:
 # - Conversión a CNF (básica) para una gramática dada en forma de diccionario
 # - Algoritmo CYK que usa la CNF producida
+# - compile_grammar: CNF compilada una vez por gramática (cache en memoria y opcionalmente en disco)
+# - cyk_bitset: misma respuesta que cyk() con celdas como bitmasks (mucho más rápido en entradas largas)
+# - to_cnf_poly: CNF de tamaño polinomial (binariza antes de quitar ε), con terminales explícitos,
+#   sin símbolos inútiles y con estadísticas por etapa; es la que usa compile_grammar
+# - cyk_parallel / ParallelCYK: llena cada anti-diagonal con un pool de procesos sobre memoria compartida;
+#   cyk_batch: muchas oraciones contra una CNF, la gramática se carga una vez por proceso
+# - cyk_forest: CYK con punteros hacia atrás que arma un bosque compartido (SPPF): contar, enumerar o
+#   extraer árboles y volverlos a los no terminales de la gramática original (sin X*, T_*)
 # - Comparativa de tiempos entre parser LL(1) (importado desde rd_parser_ll1.py) y CYK
 #
 
 
-import itertools, time
+import itertools, time, os, sys, json, hashlib, pickle, tempfile
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 
 GRAMMAR = {
@@ -124,13 +134,14 @@ def _binarize_full(grammar):
                 rest = symbols[1:]
                 prev = left
                 
+                lhs = A     # head of the chain; A itself must keep owning the next rhs
                 for i in range(len(rest)-1):
                     nxt = new_nt()
-                    newg.setdefault(A, []).append( (prev, nxt) )
+                    newg.setdefault(lhs, []).append( (prev, nxt) )
                     prev = rest[i]
-                    A = nxt  
+                    lhs = nxt
                 # last production
-                newg.setdefault(A,[]).append( (prev, rest[-1]) )
+                newg.setdefault(lhs,[]).append( (prev, rest[-1]) )
     # Note: this implementation is somewhat ad-hoc; for our grammar sizes it will suffice.
     return newg
 
@@ -181,6 +192,120 @@ def to_cnf(grammar, start='E'):
     g4 = replace_terminals(g3, terminals)
     return g4
 
+# CNF polinomial. Etapas: TERM (terminales dentro de reglas largas -> T_a), BIN (reglas de más de dos
+# símbolos -> cadenas de X*, compartiendo sufijos iguales), DEL (quitar ε: con reglas de a lo sumo dos
+# símbolos cada una da como mucho tres variantes, en lugar de 2^k), UNIT (quitar A -> B) y USELESS
+# (quitar símbolos que no generan cadenas de terminales o no se alcanzan desde start).
+# Los terminales se pasan explícitos; el orden de las reglas es determinista (listas sin repetidos).
+def grammar_size(grammar):
+    rules = sum(len(rhss) for rhss in grammar.values())
+    return {'nonterminals': len(grammar), 'rules': rules,
+            'size': rules + sum(len(rhs) for rhss in grammar.values() for rhs in rhss)}
+
+def _dedup(rhss):
+    return list(dict.fromkeys(rhss))
+
+def to_cnf_poly(grammar, start='E', terminals=None, stats=None):
+    """CNF for grammar. terminals: set of terminal symbols (default: every symbol that is not a key
+    of grammar). stats: optional dict, filled with grammar_size() of the input and after each stage."""
+    if terminals is None:
+        terminals = {x for rhss in grammar.values() for rhs in rhss for x in rhs if x not in grammar}
+    terminals = set(terminals)
+    used = set(grammar) | terminals
+    def fresh(name):
+        while name in used:
+            name += "'"
+        used.add(name)
+        return name
+    def report(stage, g):
+        if stats is not None:
+            stats[stage] = grammar_size(g)
+    g = {A: _dedup(tuple(rhs) for rhs in rhss) for A, rhss in grammar.items()}
+    report('input', g)
+
+    # TERM: terminals only appear alone on a right-hand side
+    term_nt = {}
+    def term(a):
+        if a not in term_nt:
+            term_nt[a] = fresh(f'T_{a}')
+        return term_nt[a]
+    g = {A: [tuple(term(x) if x in terminals else x for x in rhs) if len(rhs) >= 2 else rhs for rhs in rhss]
+         for A, rhss in g.items()}
+    for a, T in term_nt.items():
+        g[T] = [(a,)]
+    report('TERM', g)
+
+    # BIN: A -> s1 s2 ... sk becomes A -> s1 X, X -> s2 X', ...; equal suffixes share their X
+    suffix_nt = {}
+    helpers = {}
+    def suffix(symbols):
+        X = suffix_nt.get(symbols)
+        if X is None:
+            X = suffix_nt[symbols] = fresh(f'X{len(suffix_nt)}')
+            rest = symbols[1:]
+            helpers[X] = [(symbols[0], suffix(rest) if len(rest) > 1 else rest[0])]
+        return X
+    g = {A: _dedup(rhs if len(rhs) <= 2 else (rhs[0], suffix(rhs[1:])) for rhs in rhss) for A, rhss in g.items()}
+    g.update(helpers)
+    report('BIN', g)
+
+    # DEL: every rule has at most two symbols, so each one gives at most three variants
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for A, rhss in g.items():
+            if A not in nullable and any(all(x in nullable for x in rhs) for rhs in rhss):
+                nullable.add(A); changed = True
+    def variants(rhs):
+        yield rhs
+        if len(rhs) == 2:
+            if rhs[0] in nullable:
+                yield rhs[1:]
+            if rhs[1] in nullable:
+                yield rhs[:1]
+    g = {A: _dedup(v for rhs in rhss for v in variants(rhs) if v) for A, rhss in g.items()}
+    report('DEL', g)
+
+    # UNIT: A -> B is replaced by B's non-unit rules (for every B reachable through unit rules)
+    def is_unit(rhs):
+        return len(rhs) == 1 and rhs[0] in g
+    newg = {}
+    for A in g:
+        closure, stack = {A}, [A]
+        while stack:
+            for rhs in g[stack.pop()]:
+                if is_unit(rhs) and rhs[0] not in closure:
+                    closure.add(rhs[0]); stack.append(rhs[0])
+        newg[A] = _dedup(rhs for B in [A] + [B for B in g if B in closure and B != A]
+                         for rhs in g[B] if not is_unit(rhs))
+    g = newg
+    report('UNIT', g)
+
+    # USELESS: keep symbols that derive some terminal string and are reachable from start
+    generating = set()
+    changed = True
+    while changed:
+        changed = False
+        for A, rhss in g.items():
+            if A not in generating and any(all(x in generating or x not in g for x in rhs) for rhs in rhss):
+                generating.add(A); changed = True
+    g = {A: [rhs for rhs in rhss if all(x in generating or x not in g for x in rhs)]
+         for A, rhss in g.items() if A in generating}
+    reachable, stack = set(), [start] if start in g else []
+    reachable.update(stack)
+    while stack:
+        for rhs in g[stack.pop()]:
+            for x in rhs:
+                if x in g and x not in reachable:
+                    reachable.add(x); stack.append(x)
+    g = {A: rhss for A, rhss in g.items() if A in reachable}
+    if start in nullable:
+        # only the start symbol may derive ε; the recognizers answer the empty input from this rule
+        g.setdefault(start, []).append(())
+    report('USELESS', g)
+    return g
+
 def invert_rules(cnf):
     inv = defaultdict(set)
     for A, rhss in cnf.items():
@@ -188,11 +313,106 @@ def invert_rules(cnf):
             inv[rhs].add(A)
     return inv
 
-def cyk(tokens, cnf, start='E'):
-    inv = invert_rules(cnf)
+# Gramática compilada: CNF + reglas invertidas + numeración de símbolos, construida una vez por
+# gramática y reutilizada. La clave es un hash del contenido del dict (más el símbolo inicial y
+# CNF_VERSION), así que cambiar la gramática la invalida sola. Opcionalmente se guarda en disco
+# (pickle en cache_dir) para que otros procesos no repitan to_cnf_poly. Una gramática compilada sirve
+# solo para su símbolo inicial: cyk, cyk_bitset, cyk_forest, ParallelCYK y cyk_batch rechazan
+# (ValueError) otro start.
+CNF_VERSION = 2
+
+_COMPILED = {}
+
+def grammar_key(grammar, start='E', terminals=None):
+    data = json.dumps([CNF_VERSION, start, sorted(terminals) if terminals is not None else None, sorted((A, [list(rhs) for rhs in rhss]) for A, rhss in grammar.items())])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class CompiledGrammar:
+    def __init__(self, grammar, start='E', terminals=None):
+        t0 = time.perf_counter()
+        self.key = grammar_key(grammar, start, terminals)
+        self.start = start
+        self.stats = {}
+        self.cnf = to_cnf_poly(grammar, start, terminals, self.stats)
+        self.inv = invert_rules(self.cnf)
+        self.index, self.unary, self.rules = number_symbols(self.cnf)
+        self.build_time = time.perf_counter() - t0
+        self.load_time = None
+        self.source = 'built'
+
+def compile_grammar(grammar, start='E', cache_dir=None, terminals=None):
+    key = grammar_key(grammar, start, terminals)
+    cg = _COMPILED.get(key)
+    if cg is not None:
+        return cg
+    path = os.path.join(cache_dir, key + '.pickle') if cache_dir else None
+    if path and os.path.exists(path):
+        t0 = time.perf_counter()
+        with open(path, 'rb') as f:
+            cg = CompiledGrammar.__new__(CompiledGrammar)
+            cg.__dict__.update(pickle.load(f))
+        cg.load_time = time.perf_counter() - t0
+        cg.source = 'disk'
+    else:
+        cg = CompiledGrammar(grammar, start, terminals)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                # plain dict, so files written by the __main__ script load from an import too
+                pickle.dump(cg.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)   # atomic: readers never see a half-written file
+    _COMPILED[key] = cg
+    return cg
+
+def clear_compiled_cache(cache_dir=None):
+    _COMPILED.clear()
+    if cache_dir and os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith('.pickle'):
+                os.remove(os.path.join(cache_dir, name))
+
+def measure_compile(grammar, start='E', cache_dir=None):
+    # rebuild time (full to_cnf_poly pipeline) vs load time from the on-disk cache; in a throwaway
+    # directory unless cache_dir is given, and then only this grammar's entry is rebuilt
+    if cache_dir is None:
+        with tempfile.TemporaryDirectory() as d:
+            return measure_compile(grammar, start, d)
+    key = grammar_key(grammar, start)
+    path = os.path.join(cache_dir, key + '.pickle')
+    _COMPILED.pop(key, None)
+    if os.path.exists(path):
+        os.remove(path)
+    built = compile_grammar(grammar, start, cache_dir)
+    _COMPILED.pop(key, None)
+    loaded = compile_grammar(grammar, start, cache_dir)
+    return {'build': built.build_time, 'load': loaded.load_time}
+
+def _check_start(cnf, start):
+    # a CompiledGrammar only answers for the start symbol it was compiled for: to_cnf_poly drops
+    # what start can not reach and keeps ε only on start
+    compiled = getattr(cnf, 'start', None)
+    if compiled is not None and compiled != start:
+        raise ValueError(f'grammar compiled for start symbol {compiled!r}, not {start!r}')
+
+def _accepts_empty(cnf, start):
+    # the empty input has no cells: it is in the language iff to_cnf_poly kept start -> ()
+    rules = cnf.cnf if isinstance(cnf, CompiledGrammar) else cnf
+    return () in rules.get(start, ())
+
+def _cell_stats(stats, cells):
+    # cells: the symbol count of every non-empty cell
+    stats['cells_filled'] = stats.get('cells_filled', 0) + len(cells)
+    stats['symbols'] = stats.get('symbols', 0) + sum(cells)
+
+def cyk(tokens, cnf, start='E', stats=None):
+    """stats: optional dict, incremented with the table's cells, split points, rule probes (pairs
+    (B, C) looked up), filled cells and symbols; counted from the finished table, not in the loops."""
+    _check_start(cnf, start)
+    inv = cnf.inv if isinstance(cnf, CompiledGrammar) else invert_rules(cnf)
     n = len(tokens)
     if n == 0:
-        return False
+        return _accepts_empty(cnf, start)
     table = [ [set() for _ in range(n+1)] for _ in range(n) ]
     # length 1
     for i in range(n):
@@ -208,22 +428,508 @@ def cyk(tokens, cnf, start='E'):
                     for C in right:
                         for A in inv.get((B,C), set()):
                             table[i][l].add(A)
+    if stats is not None:
+        probes = n + sum(len(table[i][p]) * len(table[i+p][l-p])
+                         for l in range(2, n+1) for i in range(0, n-l+1) for p in range(1, l))
+        for k, v in (('tokens', n), ('cells', n * (n+1) // 2),
+                     ('split_points', sum((n-l+1) * (l-1) for l in range(2, n+1))), ('rule_probes', probes)):
+            stats[k] = stats.get(k, 0) + v
+        _cell_stats(stats, [len(c) for row in table for c in row if c])
     return start in table[0][n]
 
+# CYK con bitsets: los no terminales se numeran y, para cada inicio i, ends[A][i] es un entero
+# usado como bitmask con el bit j encendido si A =>* tokens[i:j]. Se recorre i de derecha a izquierda,
+# así las filas ends[C][k] con k > i ya están completas y A -> B C sobre (i, k) produce de una vez
+# todos los finales j posibles: ends[A][i] |= ends[C][k] (una operación para todos los cortes).
+# Solo se visitan y guardan las celdas no vacías (chart es un dict (i, j) -> mask de índices;
+# se puede pasar un dict propio para inspeccionarlo después; stats, como en cyk, suma las celdas
+# llenas y sus símbolos a partir de chart).
+def number_symbols(cnf):
+    # index: symbol -> bit number; unary: terminal -> mask of A with A -> terminal;
+    # rules[B]: [(A, C)] for every rule A -> B C
+    index = {A: k for k, A in enumerate(cnf)}
+    def idx(sym):
+        return index.setdefault(sym, len(index))
+    unary = defaultdict(int)
+    by_left = defaultdict(list)
+    for A, rhss in cnf.items():
+        for rhs in rhss:
+            if len(rhs) == 1:
+                unary[rhs[0]] |= 1 << index[A]
+            elif len(rhs) == 2:
+                by_left[idx(rhs[0])].append((index[A], idx(rhs[1])))
+    rules = [by_left.get(B, ()) for B in range(len(index))]
+    return index, dict(unary), rules
+
+def cyk_bitset(tokens, cnf, start='E', chart=None, stats=None):
+    _check_start(cnf, start)
+    if stats is not None:
+        stats['tokens'] = stats.get('tokens', 0) + len(tokens)
+    n = len(tokens)
+    if n == 0:
+        return _accepts_empty(cnf, start)
+    if isinstance(cnf, CompiledGrammar):
+        index, unary, rules = cnf.index, cnf.unary, cnf.rules
+    else:
+        index, unary, rules = number_symbols(cnf)
+    if start not in index:
+        return False
+    ends = [[0]*(n+1) for _ in range(len(index))]
+    if chart is None:
+        chart = {}
+    for i in range(n-1, -1, -1):
+        m = unary.get(tokens[i], 0)
+        if not m:
+            continue    # every span starting at i needs a length-1 cell at i
+        pending = {i+1: m}
+        todo = 1 << (i+1)
+        while todo:
+            k = (todo & -todo).bit_length() - 1   # smallest pending end: all its producers are done
+            todo ^= 1 << k
+            m = pending.pop(k)
+            chart[(i, k)] = m
+            bk = 1 << k
+            B = 0
+            while m:
+                if m & 1:
+                    ends[B][i] |= bk
+                    for A, C in rules[B]:
+                        add = ends[C][k] & ~ends[A][i]
+                        if add:
+                            ends[A][i] |= add
+                            bit = 1 << A
+                            while add:
+                                low = add & -add
+                                j = low.bit_length() - 1
+                                if j in pending:
+                                    pending[j] |= bit
+                                else:
+                                    pending[j] = bit
+                                    todo |= low
+                                add ^= low
+                m >>= 1; B += 1
+    if stats is not None:
+        _cell_stats(stats, [bin(m).count('1') for m in chart.values()])
+    return bool((ends[index[start]][0] >> n) & 1)
+
+# CYK en paralelo. cyk_parallel: todas las celdas de un mismo largo de tramo l (una anti-diagonal)
+# son independientes, así que cada diagonal se reparte por rangos de inicios entre procesos; la tabla
+# vive en memoria compartida (shared_memory), una máscara de no terminales por celda (un uint64 si la
+# CNF tiene hasta 64 símbolos), guardadas diagonal por diagonal. Las diagonales con poco trabajo se llenan en el proceso principal.
+# cyk_batch: muchas oraciones contra la misma CNF; cada proceso recibe la gramática una sola vez
+# (initializer) y corre cyk_bitset sobre lotes de oraciones.
+PARALLEL_MIN_WORK = 20000       # splits per diagonal below which dispatching costs more than it saves
+
+def _pair_rules(rules, nsym):
+    # pairs[B] = (mask of every C, [(C, mask of A)]) for the rules A -> B C, grouped by C
+    pairs = []
+    for B in range(nsym):
+        by_c = defaultdict(int)
+        for A, C in rules[B]:
+            by_c[C] |= 1 << A
+        pairs.append((sum(1 << C for C in by_c), tuple(by_c.items())))
+    return pairs
+
+def _fill_diagonal(buf, width, n, l, i0, i1, pairs):
+    # cells (i, l) for i0 <= i < i1; cell (i, l) lives at ((l-1)*n + i) * width bytes
+    if width == 8:
+        # the cast view is an export of buf: released on every path, or closing the segment fails
+        with buf.cast('Q') as q:
+            return _fill_diagonal_q(q, n, l, i0, i1, pairs)
+    get = int.from_bytes
+    out = ((l - 1) * n + i0) * width
+    for i in range(i0, i1):
+        m = 0
+        for p in range(1, l):
+            o = ((p - 1) * n + i) * width
+            left = get(buf[o:o + width], 'little')
+            if not left:
+                continue
+            o = ((l - p - 1) * n + i + p) * width
+            right = get(buf[o:o + width], 'little')
+            if not right:
+                continue
+            while left:
+                low = left & -left
+                cmask, by_c = pairs[low.bit_length() - 1]
+                if right & cmask:
+                    for C, mask in by_c:
+                        if right >> C & 1:
+                            m |= mask
+                left ^= low
+        if m:
+            buf[out:out + width] = m.to_bytes(width, 'little')
+        out += width
+
+def _fill_diagonal_q(q, n, l, i0, i1, pairs):
+    # same as _fill_diagonal for grammars of at most 64 symbols: one uint64 per cell
+    out = (l - 1) * n
+    for i in range(i0, i1):
+        m = 0
+        right_at = (l - 2) * n + i + 1
+        for left_at in range(i, (l - 1) * n + i, n):
+            left = q[left_at]
+            if left:
+                right = q[right_at]
+                if right:
+                    while left:
+                        low = left & -left
+                        cmask, by_c = pairs[low.bit_length() - 1]
+                        if right & cmask:
+                            for C, mask in by_c:
+                                if right >> C & 1:
+                                    m |= mask
+                        left ^= low
+            right_at += 1 - n
+        q[out + i] = m
+
+_worker_pairs = None
+_worker_shm = {}
+
+def _init_cyk_worker(pairs):
+    global _worker_pairs
+    _worker_pairs = pairs
+
+def _diagonal_job(job):
+    name, width, n, l, i0, i1 = job
+    shm = _worker_shm.get(name)
+    if shm is None:
+        for old in _worker_shm.values():
+            old.close()
+        _worker_shm.clear()
+        shm = _worker_shm[name] = shared_memory.SharedMemory(name=name)
+    _fill_diagonal(shm.buf, width, n, l, i0, i1, _worker_pairs)
+    return i1 - i0
+
+class ParallelCYK:
+    """Pool of workers holding one compiled CNF; recognize(tokens) fills the chart diagonal by diagonal."""
+
+    def __init__(self, cnf, workers=None, min_work=PARALLEL_MIN_WORK):
+        if not isinstance(cnf, CompiledGrammar):
+            cg = CompiledGrammar.__new__(CompiledGrammar)
+            cg.cnf = cnf
+            cg.index, cg.unary, cg.rules = number_symbols(cnf)
+            cnf = cg
+        self.grammar = cnf
+        self.nsym = len(cnf.index)
+        self.width = 8 * max(1, -(-self.nsym // 64))     # whole uint64 words per cell
+        self.pairs = _pair_rules(cnf.rules, self.nsym)
+        self.workers = workers or os.cpu_count() or 1
+        self.min_work = min_work
+        self.pool = None
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_cyk_worker, initargs=(self.pairs,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def recognize(self, tokens, start='E'):
+        _check_start(self.grammar, start)
+        n = len(tokens)
+        if n == 0:
+            return _accepts_empty(self.grammar, start)
+        if start not in self.grammar.index:
+            return False
+        width = self.width
+        shm = shared_memory.SharedMemory(create=True, size=max(1, n * n * width))
+        try:
+            buf = shm.buf
+            for i, t in enumerate(tokens):
+                m = self.grammar.unary.get(t, 0)
+                if m:
+                    buf[i * width:(i + 1) * width] = m.to_bytes(width, 'little')
+            for l in range(2, n + 1):
+                cells = n - l + 1
+                if self.pool is None or cells * (l - 1) < self.min_work:
+                    _fill_diagonal(buf, width, n, l, 0, cells, self.pairs)
+                    continue
+                step = -(-cells // self.workers)
+                jobs = [(shm.name, width, n, l, i, min(i + step, cells)) for i in range(0, cells, step)]
+                for _ in self.pool.map(_diagonal_job, jobs):
+                    pass
+            o = (n - 1) * n * width
+            top = int.from_bytes(buf[o:o + width], 'little')
+            del buf
+        finally:
+            try:
+                shm.close()
+            finally:
+                shm.unlink()
+        return bool(top >> self.grammar.index[start] & 1)
+
+def cyk_parallel(tokens, cnf, start='E', workers=None, min_work=PARALLEL_MIN_WORK):
+    """Same answer as cyk(); one-off pool (use ParallelCYK to reuse it across inputs)."""
+    with ParallelCYK(cnf, workers, min_work) as p:
+        return p.recognize(tokens, start)
+
+_batch_grammar = None
+
+def _init_batch_worker(grammar):
+    global _batch_grammar
+    _batch_grammar = grammar
+
+def _batch_job(job):
+    sentences, start = job
+    return [cyk_bitset(toks, _batch_grammar, start) for toks in sentences]
+
+def cyk_batch(sentences, cnf, start='E', workers=None, chunksize=None):
+    """Recognize many token sequences against one CNF; returns a list of bools in input order."""
+    _check_start(cnf, start)
+    if not isinstance(cnf, CompiledGrammar):
+        cg = CompiledGrammar.__new__(CompiledGrammar)
+        cg.cnf = cnf
+        cg.index, cg.unary, cg.rules = number_symbols(cnf)
+        cnf = cg
+    sentences = list(sentences)
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or len(sentences) < 2:
+        return [cyk_bitset(toks, cnf, start) for toks in sentences]
+    chunksize = chunksize or max(1, -(-len(sentences) // (workers * 4)))
+    jobs = [(sentences[i:i + chunksize], start) for i in range(0, len(sentences), chunksize)]
+    # only what cyk_bitset needs is shipped, once per worker
+    slim = CompiledGrammar.__new__(CompiledGrammar)
+    slim.index, slim.unary, slim.rules = cnf.index, cnf.unary, cnf.rules
+    slim.cnf = {start: [()]} if _accepts_empty(cnf, start) else {}     # for empty sentences
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_init_batch_worker, initargs=(slim,)) as ex:
+        for part in ex.map(_batch_job, jobs):
+            results.extend(part)
+    return results
+
+# Bosque de parseo compartido (SPPF). Un nodo de símbolo es (A, i, j): A =>* tokens[i:j]; sus
+# alternativas empaquetadas son (k, B, C) por cada regla A -> B C y corte k que funciona, o LEAF si
+# A -> tokens[i]. Los subárboles iguales se guardan una sola vez, así que una cantidad exponencial de
+# derivaciones ocupa O(n^3 |G|) espacio. Los árboles son tuplas (A, hijos...) con tokens como hojas.
+LEAF = ()
+
+def cyk_forest(tokens, cnf, start='E'):
+    """CYK recording back-pointers; returns a Forest, or None if tokens are not in the language.
+    The empty input has no tree of tokens and also gives None (cyk and cyk_bitset answer it)."""
+    _check_start(cnf, start)
+    inv = cnf.inv if isinstance(cnf, CompiledGrammar) else invert_rules(cnf)
+    n = len(tokens)
+    if n == 0:
+        return None
+    # cells[i][l]: A -> list of packed alternatives for the symbol node (A, i, i+l)
+    cells = [[None] + [{} for _ in range(n - i)] for i in range(n)]
+    for i, t in enumerate(tokens):
+        for A in inv.get((t,), ()):
+            cells[i][1][A] = [LEAF]
+    for l in range(2, n + 1):
+        for i in range(0, n - l + 1):
+            cell = cells[i][l]
+            for p in range(1, l):
+                left, right = cells[i][p], cells[i + p][l - p]
+                if not left or not right:
+                    continue
+                for B in left:
+                    for C in right:
+                        for A in inv.get((B, C), ()):
+                            alts = cell.get(A)
+                            if alts is None:
+                                cell[A] = [(i + p, B, C)]
+                            else:
+                                alts.append((i + p, B, C))
+    if start not in cells[0][n]:
+        return None
+    return Forest(tokens, cells, start)
+
+class Forest:
+    def __init__(self, tokens, cells, start):
+        self.tokens = tokens
+        self.cells = cells
+        self.root = (start, 0, len(tokens))
+
+    def packed(self, node):
+        A, i, j = node
+        return self.cells[i][j - i][A]
+
+    def _reachable(self, node):
+        # symbol nodes below node, children before parents
+        order, seen, stack = [], set(), [(node, False)]
+        while stack:
+            x, done = stack.pop()
+            if done:
+                order.append(x); continue
+            if x in seen:
+                continue
+            seen.add(x)
+            stack.append((x, True))
+            for alt in self.packed(x):
+                if alt is not LEAF:
+                    k, B, C = alt
+                    stack.append(((B, x[1], k), False))
+                    stack.append(((C, k, x[2]), False))
+        return order
+
+    def stats(self):
+        nodes = self._reachable(self.root)
+        return {'symbol_nodes': len(nodes), 'packed_nodes': sum(len(self.packed(x)) for x in nodes),
+                'ambiguous_nodes': sum(len(self.packed(x)) > 1 for x in nodes)}
+
+    def count(self, node=None):
+        """Number of distinct CNF derivations (can be exponential; computed in polynomial time)."""
+        counts = {}
+        for x in self._reachable(node or self.root):
+            total = 0
+            for alt in self.packed(x):
+                if alt is LEAF:
+                    total += 1
+                else:
+                    k, B, C = alt
+                    total += counts[(B, x[1], k)] * counts[(C, k, x[2])]
+            counts[x] = total
+        return counts[node or self.root]
+
+    def tree(self, node=None):
+        """One derivation, following the first back-pointer of each node: O(n) nodes, O(1) each."""
+        root = node or self.root
+        stack = [(root, None)]
+        out = []
+        while stack:
+            x, parent = stack.pop()
+            alt = self.packed(x)[0]
+            if alt is LEAF:
+                item = [x[0], self.tokens[x[1]]]
+            else:
+                k, B, C = alt
+                item = [x[0]]
+                stack.append(((C, k, x[2]), item))
+                stack.append(((B, x[1], k), item))
+            (parent if parent is not None else out).append(item)
+        return _freeze(out[0])
+
+    def trees(self, node=None):
+        """Lazily yields every derivation under node (there may be exponentially many), in the
+        order of the nested loops "for left ...: for right ...", without recursion.
+        A search state is (tasks, values), two linked lists of (head, tail) pairs shared between
+        states: a task is a symbol node to expand or a label A that pops two values into (A, l, r)."""
+        tokens = self.tokens
+        stack = [((node or self.root, None), None)]
+        while stack:
+            tasks, values = stack.pop()
+            while tasks is not None:
+                x, tasks = tasks
+                if isinstance(x, str):
+                    right, values = values
+                    left, values = values
+                    values = ((x, left, right), values)
+                    continue
+                alts = self.packed(x)
+                # later alternatives wait on the stack; the choice made last varies fastest
+                for alt in reversed(alts):
+                    if alt is LEAF:
+                        state = tasks, ((x[0], tokens[x[1]]), values)
+                    else:
+                        k, B, C = alt
+                        state = ((B, x[1], k), ((C, k, x[2]), (x[0], tasks))), values
+                    stack.append(state)
+                tasks, values = stack.pop()
+            yield values[0]
+
+def _freeze(item):
+    # nested lists from Forest.tree -> nested tuples, without recursion
+    order, stack = [], [item]
+    while stack:
+        x = stack.pop()
+        order.append(x)
+        stack.extend(c for c in x[1:] if isinstance(c, list))
+    frozen = {}
+    for x in reversed(order):
+        frozen[id(x)] = tuple(frozen[id(c)] if isinstance(c, list) else c for c in x)
+    return frozen[id(item)]
+
+def original_tree(tree, nonterminals):
+    """Splice CNF helper nodes (X*, T_*: every label not in nonterminals) into their parents, so the
+    tree only uses the original grammar's nonterminals. Rules removed by to_cnf_poly (unit chains,
+    epsilon productions) are not put back."""
+    order, stack = [], [tree]
+    while stack:
+        x = stack.pop()
+        order.append(x)
+        stack.extend(c for c in x[1:] if isinstance(c, tuple))
+    spliced = {}
+    for x in reversed(order):
+        children = []
+        for c in x[1:]:
+            if not isinstance(c, tuple):
+                children.append(c)
+            elif c[0] in nonterminals:
+                children.append(spliced[id(c)])
+            else:
+                children.extend(spliced[id(c)][1:])
+        spliced[id(x)] = (x[0], *children)
+    return spliced[id(tree)]
+
 if __name__ == '__main__':
+    from parse_profile import Profile, profile_arg, cyk_profiled
     # Convert grammar to CNF and print it
-    cnf = to_cnf(GRAMMAR, start='E')
-    print('CNF produced (nonterm -> rhss):')
-    for A, rhss in cnf.items():
-        print(A, '->', rhss)
-    # Test tokens and parse with CYK
+    cnf = compile_grammar(GRAMMAR, start='E')
     samples = [
         ['id','+','id','*','id'],
         ['(','id','+','id',')','*','id'],
         ['id','+','*','id'],  # invalid
     ]
+    dest = profile_arg(sys.argv[1:])
+    if dest:
+        # the samples below through both engines, instrumented; nothing but the JSON is printed
+        prof = Profile()
+        for tokens in samples:
+            for engine in (cyk, cyk_bitset):
+                cyk_profiled(tokens, cnf, prof, 'E', engine)
+        prof.dump(dest)
+        sys.exit(0)
+    print('CNF produced (nonterm -> rhss):')
+    for A, rhss in cnf.cnf.items():
+        print(A, '->', rhss)
+    for stage, size in cnf.stats.items():
+        print(f'  {stage:8s}', size)
+    # one long rule of nullable symbols: remove_epsilon enumerates 2^k subsets, to_cnf_poly stays small
+    for k in (8, 12, 16):
+        g = {'S': [tuple(f'B{i}' for i in range(k))], **{f'B{i}': [(f'b{i}',), ()] for i in range(k)}}
+        t0 = time.perf_counter(); poly = to_cnf_poly(g, 'S'); t1 = time.perf_counter()
+        old = to_cnf(g, 'S'); t2 = time.perf_counter()
+        print(f'nullable rule of length {k}: to_cnf {grammar_size(old)} {t2 - t1:.4f}s'
+              f'  to_cnf_poly {grammar_size(poly)} {t1 - t0:.4f}s')
+    # Test tokens and parse with CYK
     for tokens in samples:
         t0 = time.perf_counter()
         ok = cyk(tokens, cnf, start='E')
         t1 = time.perf_counter()
-        print('tokens=', tokens, ' -> CYK:', ok, ' time=', (t1-t0))
+        ok_bits = cyk_bitset(tokens, cnf, start='E')
+        t2 = time.perf_counter()
+        print('tokens=', tokens, ' -> CYK:', ok, ' time=', (t1-t0), ' bitset:', ok_bits, ' time=', (t2-t1))
+        forest = cyk_forest(tokens, cnf, start='E')
+        if forest is not None:
+            print('   trees:', forest.count(), ' one tree:', original_tree(forest.tree(), GRAMMAR))
+    # Ambiguous grammar S -> S + S | id (already in CNF): Catalan-many trees, shared in the forest
+    ambiguous = {'S': [('S', 'X0'), ('id',)], 'X0': [('T_+', 'S')], 'T_+': [('+',)]}
+    tokens = ['id'] + ['+', 'id'] * 14
+    forest = cyk_forest(tokens, ambiguous, start='S')
+    print('S -> S + S | id on', len(tokens), 'tokens: trees =', forest.count(), forest.stats())
+    print('   first tree:', original_tree(forest.tree(), {'S'}))
+    third = next(itertools.islice(forest.trees(), 2, None))
+    print('   third tree (lazy enumeration):', original_tree(third, {'S'}))
+    # parallel CYK on one long input and batched recognition of many short ones
+    import random
+    from bench_parsers import generate_expression, expression_terminals
+    cores = os.cpu_count() or 1
+    tokens = expression_terminals(generate_expression(30, 3, 1))
+    for w in sorted({1, cores}):
+        t0 = time.perf_counter(); ok = cyk_parallel(tokens, cnf, 'E', workers=w); t1 = time.perf_counter()
+        print(f'cyk_parallel n={len(tokens)} workers={w}: {ok} {t1 - t0:.3f}s')
+    t0 = time.perf_counter(); ok = cyk(tokens, cnf, 'E'); t1 = time.perf_counter()
+    print(f'cyk          n={len(tokens)}: {ok} {t1 - t0:.3f}s')
+    rng = random.Random(0)
+    batch = [expression_terminals(generate_expression(rng.randint(1, 12), 3, k)) for k in range(3000)]
+    for w in sorted({1, cores}):
+        t0 = time.perf_counter(); res = cyk_batch(batch, cnf, 'E', workers=w); t1 = time.perf_counter()
+        print(f'cyk_batch {len(batch)} sentences workers={w}: {sum(res)} accepted {t1 - t0:.3f}s')
@@ -0,0 +1,363 @@
+# dfa_lexer.py
+# Generador de lexers DFA para las tablas de tokens del punto 5 (TOKEN_SPEC + KEYWORDS) y del
+# punto 3 (TOKENS de codigo_del_3.py).
+#
+# - Cada patrón se traduce (subconjunto de sintaxis de re: literales, escapes, [clases], '.', grupos,
+#   |, *, +, ?) a un NFA de Thompson; las palabras clave entran como reglas propias, antes de ID, así
+#   que el DFA ya las reconoce sin upper() ni búsqueda en KEYWORDS.
+# - Construcción por subconjuntos a un DFA sobre clases de caracteres equivalentes: el texto se pasa
+#   a clases con un solo translate() y se recorre una vez con la regla de la coincidencia más larga
+#   (a igual largo gana la regla anterior, como en la alternación de MASTER_RE).
+# - Emite tipos enteros y offsets en un TokenBuffer, igual que tokenize_buffer; acepta str o bytes
+#   (offsets en bytes, como tokenize_stream).
+# - Caracteres no ASCII en un str: su clase se calcula la primera vez que aparecen (con los mismos
+#   predicados), agregando columnas a la tabla si hace falta.
+# - Reglas que el DFA nunca acepta quedan en unreachable (TIMES: '*' siempre es STAR).
+
+import re
+from array import array
+
+from token_buffer import TokenBuffer
+from diagnostics import LexError
+
+# --- regex subset -> NFA
+
+class _NFA:
+    def __init__(self):
+        self.edges = []     # state -> [(atom, target)]
+        self.eps = []       # state -> [target]
+
+    def state(self):
+        self.edges.append([]); self.eps.append([])
+        return len(self.edges) - 1
+
+class _PatternParser:
+    # recursive descent over the pattern text; each char set becomes an atom (a predicate)
+    def __init__(self, pattern, flags, binary, atoms, nfa):
+        self.p, self.i = pattern, 0
+        self.flags, self.binary = flags, binary
+        self.atoms, self.nfa = atoms, nfa
+
+    def parse(self):
+        frag = self.alt()
+        if self.i != len(self.p):
+            raise ValueError(f'unsupported pattern syntax at {self.i} in {self.p!r}')
+        return frag
+
+    def peek(self):
+        return self.p[self.i] if self.i < len(self.p) else None
+
+    def alt(self):
+        frags = [self.seq()]
+        while self.peek() == '|':
+            self.i += 1
+            frags.append(self.seq())
+        if len(frags) == 1:
+            return frags[0]
+        s, e = self.nfa.state(), self.nfa.state()
+        for a, b in frags:
+            self.nfa.eps[s].append(a); self.nfa.eps[b].append(e)
+        return s, e
+
+    def seq(self):
+        s = e = self.nfa.state()
+        while self.peek() not in (None, '|', ')'):
+            a, b = self.repeat()
+            self.nfa.eps[e].append(a)
+            e = b
+        return s, e
+
+    def repeat(self):
+        a, b = self.atom()
+        op = self.peek()
+        if op not in ('*', '+', '?'):
+            return a, b
+        self.i += 1
+        s, e = self.nfa.state(), self.nfa.state()
+        self.nfa.eps[s].append(a); self.nfa.eps[b].append(e)
+        if op in ('*', '?'):
+            self.nfa.eps[s].append(e)
+        if op in ('*', '+'):
+            self.nfa.eps[b].append(a)
+        return s, e
+
+    def atom(self):
+        c = self.peek()
+        if c == '(':
+            self.i += 1
+            if self.p.startswith('?:', self.i):
+                self.i += 2
+            frag = self.alt()
+            if self.peek() != ')':
+                raise ValueError(f'unbalanced parenthesis in {self.p!r}')
+            self.i += 1
+            return frag
+        if c == '[':
+            j = self.i + 1
+            if j < len(self.p) and self.p[j] == '^':
+                j += 1
+            if j < len(self.p) and self.p[j] == ']':
+                j += 1
+            while j < len(self.p) and self.p[j] != ']':
+                j += 2 if self.p[j] == '\\' else 1
+            src, self.i = self.p[self.i:j + 1], j + 1
+        elif c == '\\':
+            src, self.i = self.p[self.i:self.i + 2], self.i + 2
+        elif c in '*+?{^$':
+            raise ValueError(f'unsupported pattern syntax {c!r} in {self.p!r}')
+        else:
+            src, self.i = c, self.i + 1
+            if c != '.':
+                src = re.escape(c)
+        return self.edge(self.char_set(src))
+
+    def char_set(self, src):
+        if self.binary:
+            return re.compile(src.encode('ascii'), self.flags).fullmatch
+        return re.compile(src, self.flags).fullmatch
+
+    def edge(self, predicate):
+        return _edge(self.nfa, self.atoms, predicate)
+
+def _edge(nfa, atoms, predicate):
+    atoms.append(predicate)
+    s, e = nfa.state(), nfa.state()
+    nfa.edges[s].append((len(atoms) - 1, e))
+    return s, e
+
+def _keyword_char(c, binary):
+    # same test tokenize() makes on the whole word (val.upper() in KEYWORDS), one char at a time
+    if binary:
+        u = c.encode('ascii')
+        return lambda ch: ch.upper() == u
+    return lambda ch: ch.upper() == c
+
+# --- DFA
+
+DEAD = 0
+SKIP_KIND = -1
+ERROR_KIND = -2
+NO_MATCH = -3       # accept[] of a non-accepting state
+
+class DFALexer:
+    """Longest-match DFA lexer for a [(name, regex)] table.
+    names: token type names, their index is the emitted kind; keywords: words recognized as their own
+    kind (case-insensitive, as tokenize()) instead of ID; skip: names not emitted; mismatch: the
+    catch-all rule whose match is an error."""
+
+    def __init__(self, spec, names, keywords=(), skip=(), mismatch='MISMATCH', flags=0, binary=False,
+                 token_cls=None, error=LexError, ident='ID'):
+        self.names = list(names)
+        self.binary = binary
+        self.token_cls = token_cls
+        self.error = error
+        kind_of = {name: k for k, name in enumerate(self.names)}
+        self.keyword_kinds = frozenset(kind_of[kw] for kw in keywords)
+        nfa = _NFA()
+        self.atoms = []
+        start = nfa.state()
+        rules = []
+        for name, pattern in spec:
+            if name == ident:
+                rules.extend((kw, None) for kw in sorted(keywords))
+            rules.append((name, pattern))
+        self.rule_names = [name for name, _ in rules]
+        self.rule_kind = [SKIP_KIND if name in skip else ERROR_KIND if name == mismatch else kind_of[name]
+                          for name in self.rule_names]
+        self._final = {}        # accepting NFA state -> rule index (= priority)
+        for r, (name, pattern) in enumerate(rules):
+            if pattern is None:
+                s = e = nfa.state()
+                for c in name:
+                    a, b = _edge(nfa, self.atoms, _keyword_char(c, binary))
+                    nfa.eps[e].append(a)
+                    e = b
+            else:
+                s, e = _PatternParser(pattern, flags, binary, self.atoms, nfa).parse()
+            nfa.eps[start].append(s)
+            self._final[e] = r
+        self.nfa = nfa
+        self.eof = kind_of['EOF']
+        self.rows = None
+        self._flat = None
+        # classes: chars with the same atom membership behave the same in every state
+        self.class_sigs = []
+        self._class_of_sig = {}
+        alphabet = [bytes([b]) for b in range(256)] if binary else [chr(c) for c in range(128)]
+        codes = [self._class(ch) for ch in alphabet]
+        self.table = bytes(codes) if binary else {c: codes[c] for c in range(128)}
+        # subset construction; state 0 is the dead state
+        self.sets = [frozenset()]
+        self.state_of_set = {frozenset(): DEAD}
+        self.rows = [[DEAD] * len(self.class_sigs)]
+        self.accept = [NO_MATCH]
+        self.accept_rule = [-1]
+        self._todo = []
+        self.start = self._state(self._closure({start}))
+        self._build()
+        accepted = set(self.accept_rule)
+        self.unreachable = [name for r, name in enumerate(self.rule_names) if r not in accepted]
+
+    def _closure(self, states):
+        stack = list(states)
+        seen = set(states)
+        while stack:
+            for t in self.nfa.eps[stack.pop()]:
+                if t not in seen:
+                    seen.add(t); stack.append(t)
+        return frozenset(seen)
+
+    def _state(self, nfa_set):
+        k = self.state_of_set.get(nfa_set)
+        if k is None:
+            k = len(self.sets)
+            self.sets.append(nfa_set)
+            self.state_of_set[nfa_set] = k
+            self.rows.append(None)
+            rule = min((self._final[s] for s in nfa_set if s in self._final), default=-1)
+            self.accept_rule.append(rule)
+            self.accept.append(self.rule_kind[rule] if rule >= 0 else NO_MATCH)
+            self._todo.append(k)
+        return k
+
+    def _move(self, k, sig):
+        nxt = {t for s in self.sets[k] for atom, t in self.nfa.edges[s] if sig >> atom & 1}
+        return self._state(self._closure(nxt)) if nxt else DEAD
+
+    def _build(self):
+        # fill rows of new states; new states may appear while doing it
+        while self._todo:
+            k = self._todo.pop()
+            self.rows[k] = [self._move(k, sig) for sig in self.class_sigs]
+
+    def _class(self, ch):
+        sig = 0
+        for a, pred in enumerate(self.atoms):
+            if pred(ch):
+                sig |= 1 << a
+        c = self._class_of_sig.get(sig)
+        if c is None:
+            c = len(self.class_sigs)
+            self.class_sigs.append(sig)
+            self._class_of_sig[sig] = c
+            if self.rows is not None:
+                # a class first seen in the text (non-ASCII char): one more column everywhere
+                for k in range(1, len(self.rows)):
+                    if self.rows[k] is not None:
+                        self.rows[k].append(self._move(k, sig))
+                self.rows[DEAD].append(DEAD)
+                self._build()
+        return c
+
+    def classes(self, src):
+        """src translated to class codes, as bytes (one code per char/byte)."""
+        if self.binary:
+            return bytes(src).translate(self.table)
+        if not src.isascii():
+            for ch in set(src):
+                if ord(ch) >= 128 and ord(ch) not in self.table:
+                    self.table[ord(ch)] = self._class(ch)
+            if len(self.class_sigs) > 256:
+                raise ValueError('more than 256 character classes')
+        return src.translate(self.table).encode('latin-1')
+
+    def flat_table(self):
+        # (trans, accept, start) with states pre-multiplied by the row width: one index per char
+        width = len(self.class_sigs)
+        if self._flat is None or self._flat[0] != (len(self.rows), width):
+            trans = [t * width for row in self.rows for t in row]
+            accept = [NO_MATCH] * (len(self.rows) * width)
+            for k, a in enumerate(self.accept):
+                accept[k * width] = a
+            self._flat = ((len(self.rows), width), trans, accept, self.start * width)
+        return self._flat[1:]
+
+    def tokenize(self, src):
+        """TokenBuffer with the same kinds and offsets as the regex tokenizer (EOF included)."""
+        buf = TokenBuffer(src, self.names, self.keyword_kinds, self.token_cls)
+        cls = self.classes(src)
+        n = len(cls)
+        trans, accept, start = self.flat_table()
+        kinds, starts, ends = array('B'), array('q'), array('q')
+        i = 0
+        while i < n:
+            state, j = start, i
+            kind, end = NO_MATCH, i
+            # run while the DFA is alive, remembering the last accepting position
+            while j < n:
+                state = trans[state + cls[j]]
+                if not state:
+                    break
+                j += 1
+                if accept[state] != NO_MATCH:
+                    kind, end = accept[state], j
+            if end == i:
+                i += 1      # nothing matches here (finditer would skip the char too)
+                continue
+            if kind >= 0:
+                kinds.append(kind); starts.append(i); ends.append(end)
+            elif kind == ERROR_KIND:
+                ch = src[i:end]
+                raise self.error(ch.decode('latin-1') if self.binary else ch, i)
+            i = end
+        kinds.append(self.eof); starts.append(n); ends.append(n)
+        buf.kinds, buf.starts, buf.ends = kinds, starts, ends
+        return buf
+
+    def __repr__(self):
+        return f'DFALexer({len(self.rows) - 1} states, {len(self.class_sigs)} classes)'
+
+if __name__ == '__main__':
+    import random, time
+    import rd_parser_match_punto5 as rd
+    import codigo_del_3 as c3
+    from bench_parsers import generate_sql, generate_expression
+
+    def same(a, b):
+        return a.kinds == b.kinds and a.starts == b.starts and a.ends == b.ends
+
+    def outcome(f, s):
+        try:
+            buf = f(s)
+            return list(buf.kinds), list(buf.starts), list(buf.ends)
+        except SyntaxError as e:
+            return str(e)
+
+    print(rd.DFA_LEXER, 'unreachable rules:', rd.DFA_LEXER.unreachable)
+    print(c3.DFA_LEXER, 'unreachable rules:', c3.DFA_LEXER.unreachable)
+    # random fragments, with case changes, non-ASCII letters (ı, ſ, é) and unterminated quotes
+    rng = random.Random(0)
+    pieces = ['SELECT', 'select', 'SeLeCt', 'ſelect', 'ınt', 'id', 'x1', '12', "'a b'", "'x\\'y'", "'", '--c\n',
+              '==', '=', '<=', '<', '*', '-', '--', '/', ',', ';', '(', ')', '.', ' ', '\n', 'é', '#', 'nulls']
+    mismatches = 0
+    for _ in range(3000):
+        s = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        mismatches += outcome(rd.tokenize_buffer_re, s) != outcome(rd.tokenize_buffer, s)
+        mismatches += outcome(c3.tokenize_buffer_re, s) != outcome(c3.tokenize_buffer, s)
+    print('random inputs checked: 6000, mismatches:', mismatches)
+
+    def mb_s(f, s, size, base=None):
+        # best of 3; the ratio to the regex lexer is the figure to compare across machines and loads
+        best = min(timeit(f, s) for _ in range(3))
+        rate = size / best / 1e6
+        return rate, f'{rate:.2f} MB/s' + (f'  ({rate / base:.2f}x regex)' if base else '')
+
+    def timeit(f, s):
+        t0 = time.perf_counter(); f(s); return time.perf_counter() - t0
+
+    sql = generate_sql(20000, 3, 4, 0.05, 1)
+    data = sql.encode('utf-8')
+    sql_bytes = DFALexer(rd.TOKEN_SPEC, rd.TOKEN_NAMES, rd.KEYWORDS, rd.SKIP, flags=re.DOTALL | re.IGNORECASE,
+                         binary=True, token_cls=rd.Token)
+    print('SQL', len(data), 'bytes, same tokens:', same(rd.tokenize_buffer_re(sql), rd.tokenize_buffer(sql)),
+          same(rd.tokenize_buffer(sql), sql_bytes.tokenize(data)))
+    base, text = mb_s(rd.tokenize_buffer_re, sql, len(data))
+    print('  MASTER_RE tokenize_buffer_re:', text)
+    print('  MASTER_RE tokenize (Tokens): ', mb_s(lambda s: sum(1 for _ in rd.tokenize(s)), sql, len(data), base)[1])
+    print('  DFA str:                     ', mb_s(rd.tokenize_buffer, sql, len(data), base)[1])
+    print('  DFA bytes:                   ', mb_s(sql_bytes.tokenize, data, len(data), base)[1])
+    expr = generate_expression(200000, 6, 1)
+    print('expression', len(expr), 'chars, same tokens:', same(c3.tokenize_buffer_re(expr), c3.tokenize_buffer(expr)))
+    base, text = mb_s(c3.tokenize_buffer_re, expr, len(expr))
+    print('  TOK_REGEX tokenize_buffer_re:', text)
+    print('  DFA str:                     ', mb_s(c3.tokenize_buffer, expr, len(expr), base)[1])
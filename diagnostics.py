@@ -0,0 +1,129 @@
+# diagnostics.py
+# Diagnósticos estructurados para el parser del punto 5 (RDParserMatch).
+#
+# - Cada error es un registro compacto Diagnostic(code, offset, expected, found, value, detail):
+#   código del error, offset absoluto en el texto, tipos de token esperados, tipo y texto del token
+#   encontrado. No se imprime nada mientras se parsea.
+# - La línea y columna se calculan solo al pedirlas (LineIndex: offsets de inicio de línea, que se
+#   construyen una vez, y bisect).
+# - DiagnosticCollector junta los registros con un presupuesto opcional (max_errors): al pasarlo el
+#   parser se detiene ('stop') o salta cada sentencia con errores hasta su ';' sin registrar más
+#   ('skip'); dropped cuenta los errores que chocaron con el presupuesto (en 'skip', uno por
+#   sentencia saltada).
+# - render() arma todos los mensajes juntos al final, con línea:columna si se conoce el texto.
+
+from bisect import bisect_right
+from collections import namedtuple
+
+MESSAGES = {
+    'expected':     'Expected {expected}',
+    'stmt_start':   'Unexpected start of statement',
+    'column_type':  'Missing type for column {detail}',
+    'literal':      'Expected literal in VALUES list',
+    'expr_token':   'Unexpected token in expression',
+    'comparison':   'Expected comparison operator',
+    'bad_char':     'Unexpected character {value!r}',
+}
+
+class Diagnostic(namedtuple('Diagnostic', 'code offset expected found value detail')):
+    __slots__ = ()
+
+    @property
+    def message(self):
+        return MESSAGES[self.code].format(expected='/'.join(self.expected), value=self.value, detail=self.detail)
+
+    def shifted(self, delta):
+        return self._replace(offset=self.offset + delta) if delta else self
+
+    def __str__(self):
+        # the one-line form RDParserMatch used to print
+        return f"Error at pos {self.offset}: {self.message} (got {self.found}:'{self.value}')"
+
+class LexError(SyntaxError):
+    """Raised by the tokenizers on a character no token matches (still a SyntaxError)."""
+
+    def __init__(self, char, pos):
+        super().__init__(f'Unexpected character {char!r} at {pos}')
+        self.char, self.pos = char, pos
+
+    def diagnostic(self):
+        return Diagnostic('bad_char', self.pos, (), 'MISMATCH', self.char, '')
+
+class ErrorBudgetExceeded(Exception):
+    pass
+
+class LineIndex:
+    def __init__(self, text):
+        self.text = text
+        self._starts = None
+
+    @property
+    def starts(self):
+        if self._starts is None:
+            starts = [0]
+            find, text = self.text.find, self.text
+            i = find('\n')
+            while i >= 0:
+                starts.append(i + 1)
+                i = find('\n', i + 1)
+            self._starts = starts
+        return self._starts
+
+    def line_col(self, offset):
+        """1-based (line, column) of a character offset."""
+        starts = self.starts
+        line = bisect_right(starts, offset)
+        return line, offset - starts[line - 1] + 1
+
+class DiagnosticCollector(list):
+    """List of Diagnostic records with an optional error budget.
+    on_limit: 'stop' ends the parse, 'skip' fast-skips each later failing statement to its ';'."""
+
+    def __init__(self, max_errors=None, on_limit='stop', source=None):
+        super().__init__()
+        if on_limit not in ('stop', 'skip'):
+            raise ValueError(f'on_limit must be stop or skip, not {on_limit!r}')
+        self.max_errors = max_errors
+        self.on_limit = on_limit
+        self.source = source
+        self.total = 0          # records added over the collector's life (take() does not reset it)
+        self.dropped = 0        # errors past the budget, not recorded
+        self._index = None
+
+    @property
+    def exhausted(self):
+        return self.max_errors is not None and self.total >= self.max_errors
+
+    def add(self, code, offset, expected=(), found='', value='', detail=''):
+        """Record one error; raises ErrorBudgetExceeded once the budget is used up."""
+        if self.exhausted:
+            self.dropped += 1
+            raise ErrorBudgetExceeded(self.max_errors)
+        self.append(Diagnostic(code, offset, expected, found, value, detail))
+        self.total += 1
+
+    def take(self):
+        """Hand over the records collected so far and forget them (the budget keeps counting)."""
+        out = list(self)
+        self.clear()
+        return out
+
+    def line_col(self, offset, source=None):
+        source = source if source is not None else self.source
+        if source is None:
+            return None
+        if self._index is None or self._index.text is not source:
+            self._index = LineIndex(source)
+        return self._index.line_col(offset)
+
+    def render(self, source=None, limit=None):
+        """All messages as one string, 'line:col: message (got TYPE 'value')' when the text is known."""
+        lines = []
+        for d in self[:limit]:
+            lc = self.line_col(d.offset, source)
+            where = f'{lc[0]}:{lc[1]}' if lc else f'pos {d.offset}'
+            lines.append(f"{where}: {d.code}: {d.message} (got {d.found}:'{d.value}')")
+        hidden = len(self) - len(lines) + self.dropped
+        if hidden:
+            lines.append(f'... {hidden} more error(s) not shown')
+        return '\n'.join(lines)
@@ -0,0 +1,251 @@
+# earley_punto4.py
+# Reconocedor y parser de Earley que trabaja directamente sobre GRAMMAR (el mismo formato de dict
+# de cyk_full_punto4.py, con producciones vacías como EP -> ()), sin convertir a CNF.
+#
+# - Los símbolos anulables se tratan con el truco de Aycock-Horspool: al predecir un no terminal
+#   anulable se avanza también el punto del ítem que lo esperaba.
+# - Cada conjunto de ítems está indexado por el símbolo que se espera (waiting) y los ítems
+#   completos por no terminal (done), así completar no recorre el conjunto entero.
+# - Optimización de Leo para la recursión por la derecha (EP -> + T EP, TP -> * F TP): en entradas
+#   no ambiguas el costo es casi lineal en vez de cuadrático.
+# - earley(tokens, grammar, start) tiene la misma forma que cyk(tokens, cnf, start) para
+#   compararlos; earley_parse devuelve un árbol (A, hijos...) con 'ε' en las producciones vacías.
+
+import time
+from collections import defaultdict
+
+from cyk_full_punto4 import GRAMMAR, cyk_bitset, compile_grammar
+
+def nullable_symbols(grammar):
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for A, rhss in grammar.items():
+            if A in nullable:
+                continue
+            if any(all(sym in nullable for sym in rhs) for rhs in rhss):
+                nullable.add(A); changed = True
+    return nullable
+
+class EarleyChart:
+    """Earley sets for one input. done[j][A] holds (origin, rule index) of the completed items
+    A -> rhs . in set j; waiting[k][A] the items of set k with the dot before A."""
+
+    def __init__(self, tokens, grammar, start='E'):
+        self.tokens = tokens
+        self.start = start
+        self.rules = {A: [tuple(rhs) for rhs in rhss] for A, rhss in grammar.items()}
+        self.nullable = nullable_symbols(grammar)
+        n = len(tokens)
+        self.done = [defaultdict(set) for _ in range(n+1)]
+        self.waiting = []
+        self.leo = [dict() for _ in range(n+1)]    # Leo memo: leo[k][A] -> topmost item or None
+        self.leo_src = [dict() for _ in range(n+1)]
+        self._run()
+
+    def _leo_top(self, o, A):
+        # Leo's optimization for right recursion: if set o has exactly one item waiting for A and
+        # A is its last symbol, completing A completes that item too, and so on upwards. Only the
+        # topmost item of that deterministic path is added, which keeps chains like EP -> + T EP linear.
+        # The chain stops below start at origin 0, so accepted() still finds that completion in done;
+        # a chain that comes back to a pair it already went through (unit cycles such as S -> S) is
+        # not shortcut at all and those items complete normally.
+        rules, path, seen = self.rules, [], set()
+        while True:
+            memo = self.leo[o]
+            if A in memo:
+                top = memo[A]
+                break
+            if o == 0 and A == self.start:
+                memo[A] = top = None
+                break
+            if (o, A) in seen:
+                for po, pA, _ in path:
+                    self.leo[po][pA] = None
+                return None
+            seen.add((o, A))
+            parents = self.waiting[o].get(A, ())
+            if len(parents) != 1:
+                memo[A] = top = None
+                break
+            B, rb, db, ob = parents[0]
+            if db + 1 != len(rules[B][rb]):
+                memo[A] = top = None
+                break
+            path.append((o, A, (B, rb, db+1, ob)))
+            o, A = ob, B
+        for po, pA, item in reversed(path):
+            if top is None:
+                top = item
+            self.leo[po][pA] = top
+        return top
+
+    def _run(self):
+        tokens, rules, nullable, done = self.tokens, self.rules, self.nullable, self.done
+        n = len(tokens)
+        scanned = [(self.start, r, 0, 0) for r in range(len(rules.get(self.start, ())))]   # seed for set 0
+        for i in range(n+1):
+            items = set(scanned)
+            work = list(scanned)
+            scanned = []
+            waiting = defaultdict(list)   # symbol -> items of this set with the dot before it
+            self.waiting.append(waiting)
+            predicted = set()
+            while work:
+                item = work.pop()
+                A, r, dot, origin = item
+                rhs = rules[A][r]
+                if dot == len(rhs):
+                    # complete: advance every item of set `origin` that was waiting for A
+                    if (origin, r) in done[i][A]:
+                        continue
+                    done[i][A].add((origin, r))
+                    if origin < i:
+                        top = self._leo_top(origin, A)
+                        if top is not None:
+                            if top not in items:
+                                items.add(top); work.append(top)
+                                self.leo_src[i][top] = (origin, A)
+                            continue
+                    parents = waiting[A] if origin == i else self.waiting[origin].get(A, ())
+                    for B, rb, db, ob in parents:
+                        nxt = (B, rb, db+1, ob)
+                        if nxt not in items:
+                            items.add(nxt); work.append(nxt)
+                    continue
+                sym = rhs[dot]
+                if sym in rules:
+                    waiting[sym].append(item)
+                    if sym not in predicted:
+                        predicted.add(sym)
+                        for rb in range(len(rules[sym])):
+                            nxt = (sym, rb, 0, i)
+                            if nxt not in items:
+                                items.add(nxt); work.append(nxt)
+                    if sym in nullable:
+                        nxt = (A, r, dot+1, origin)
+                        if nxt not in items:
+                            items.add(nxt); work.append(nxt)
+                elif i < n and tokens[i] == sym:
+                    scanned.append((A, r, dot+1, origin))
+            if not scanned and i < n:
+                # no item can read tokens[i]: the remaining sets stay empty
+                self.waiting.extend(defaultdict(list) for _ in range(n - i))
+                break
+
+    def accepted(self):
+        return any(origin == 0 for origin, _ in self.done[len(self.tokens)].get(self.start, ()))
+
+def earley(tokens, grammar, start='E'):
+    return EarleyChart(tokens, grammar, start).accepted()
+
+def _splits(rhs, i, j, chart):
+    # every way of giving each rhs symbol a span inside [i, j), using the completed-item index
+    tokens, done, rules = chart.tokens, chart.done, chart.rules
+    out = [None] * len(rhs)
+    def go(pos, end):
+        if pos < 0:
+            if end == i:
+                yield list(out)
+            return
+        sym = rhs[pos]
+        if sym not in rules:
+            if end > i and tokens[end-1] == sym:
+                out[pos] = (sym, end-1, end)
+                yield from go(pos-1, end-1)
+            return
+        for origin, _ in sorted(done[end].get(sym, ())):
+            if origin >= i:
+                out[pos] = (sym, origin, end)
+                yield from go(pos-1, origin)
+    return go(len(rhs)-1, j)
+
+def _leo_chain(chart, top, j):
+    # rebuild the intermediate nodes that Leo's optimization skipped: returns
+    # {(B, origin, j): (rule, dot, last child)} from the real completion up to `top`
+    implied = {}
+    o, A = chart.leo_src[j][top]
+    while True:
+        B, rb, db, ob = chart.waiting[o][A][0]
+        implied[(B, ob, j)] = (rb, db, (A, o, j))
+        if (B, rb, db+1, ob) == top:
+            return implied
+        o, A = ob, B
+
+def earley_parse(tokens, grammar, start='E'):
+    """Return one parse tree as nested tuples, or None if tokens are not in the language."""
+    chart = EarleyChart(tokens, grammar, start)
+    if not chart.accepted():
+        return None
+    n, rules, done = len(tokens), chart.rules, chart.done
+    # 1. every symbol node reachable from the root with all its ways of splitting into children;
+    #    explicit stack instead of recursion: deep right-recursive trees (EP, TP) would overflow
+    implied = {}
+    options = {}
+    stack = [(start, 0, n)]
+    while stack:
+        node = stack.pop()
+        if node in options:
+            continue
+        A, i, j = node
+        candidates = []
+        for origin, r in sorted(done[j].get(A, ())):
+            if origin == i:
+                top = (A, r, len(rules[A][r]), i)
+                if top in chart.leo_src[j]:
+                    implied.update(_leo_chain(chart, top, j))
+                candidates.append(r)
+        found = [spans for r in candidates for spans in _splits(rules[A][r], i, j, chart)]
+        if node in implied:
+            # the derivation Leo's optimization went through, next to the ones done[] records
+            rb, db, last = implied[node]
+            found += [[*spans, last] for spans in _splits(rules[A][rb][:db], i, last[1], chart)]
+        options[node] = found
+        for spans in found:
+            stack.extend(s for s in spans if s[0] in rules and s not in options)
+    # 2. a node gets a derivation once all the children of one of its options have one, so on
+    #    cyclic grammars (unit/ε chains) a node is never built out of itself
+    users = defaultdict(list)
+    missing = {}
+    ready = []
+    for node, found in options.items():
+        for k, spans in enumerate(found):
+            kids = [s for s in spans if s[0] in rules]
+            missing[node, k] = len(kids)
+            if not kids:
+                ready.append((node, k))
+            for s in kids:
+                users[s].append((node, k))
+    built = {}
+    for node, k in ready:    # grows while it is walked: first come, first served (shallow trees first)
+        if node in built:
+            continue
+        spans = options[node][k]
+        A = node[0]
+        built[node] = (A,) + tuple(built[s] if s[0] in rules else s[0] for s in spans) if spans else (A, 'ε')
+        for user in users.pop(node, ()):
+            missing[user] -= 1
+            if not missing[user]:
+                ready.append(user)
+    root = (start, 0, n)
+    if root not in built:
+        raise RuntimeError(f'no derivation found for {root}')
+    return built[root]
+
+if __name__ == '__main__':
+    from pprint import pprint
+    cnf = compile_grammar(GRAMMAR, start='E')
+    samples = [
+        ['id','+','id','*','id'],
+        ['(','id','+','id',')','*','id'],
+        ['id','+','*','id'],  # invalid
+    ]
+    for tokens in samples:
+        t0 = time.perf_counter()
+        ok = earley(tokens, GRAMMAR, start='E')
+        t1 = time.perf_counter()
+        ok_cyk = cyk_bitset(tokens, cnf, start='E')
+        t2 = time.perf_counter()
+        print('tokens=', tokens, ' -> Earley:', ok, ' time=', (t1-t0), ' CYK:', ok_cyk, ' time=', (t2-t1))
+    pprint(earley_parse(samples[1], GRAMMAR, start='E'))
@@ -0,0 +1,309 @@
+# incremental_parse.py
+# Re-parseo incremental de scripts CRUD para el parser del punto 5 (RDParserMatch).
+#
+# - El script se divide en segmentos contiguos que terminan justo después de cada ';' (los mismos
+#   cortes que split_statements); cada segmento guarda su texto, sus ASTs, su cantidad de tokens y
+#   sus errores con posiciones relativas al inicio del segmento.
+# - Los segmentos son las piezas del texto (no se guarda el script entero): se agrupan en bloques
+#   de hasta 2 * BLOCK segmentos y un árbol de Fenwick sobre el largo de cada bloque ubica el
+#   segmento de un offset en O(log N + BLOCK). Una edición toca solo los bloques de los segmentos
+#   que reemplaza; session.text arma el script recién cuando se lo pide.
+# - Una edición (offset, largo borrado, texto insertado) solo vuelve a cortar, tokenizar y parsear
+#   desde el segmento que toca la edición hasta que los cortes vuelven a coincidir con los viejos;
+#   los segmentos siguientes se reutilizan tal cual (los offsets de sus Diagnostic se corren al
+#   reportar errores).
+# - Cada segmento se parsea por separado, como en parse_program_parallel: la recuperación de
+#   errores no cruza el ';' de una sentencia, así statements() y errors() dan lo mismo que
+#   parse_program sobre el texto entero. Única diferencia: con un error léxico (string sin cerrar)
+#   parse_program no produce nada y reporta solo ese error; la sesión reporta el mismo error como
+#   el primero de su tipo pero sigue parseando los demás segmentos.
+
+import re
+
+from rd_parser_match_punto5 import RDParserMatch, SPLIT_RE, tokenize_buffer
+from diagnostics import LexError
+
+_QUOTED_RE = re.compile(r"'([^'\\]|\\.)*'|--[^\n]*", re.DOTALL)
+# SPLIT_RE plus a lone quote, so a quote without a closing one is seen while scanning
+_SCAN_RE = re.compile(SPLIT_RE.pattern + "|'", re.DOTALL)
+
+BLOCK = 128                 # segments per block; a block grows to 2 * BLOCK before it is split
+
+def _parse_segment(text):
+    # (text, stmts, errors, token count, lexer failed) for one segment, positions relative to it
+    try:
+        buf = tokenize_buffer(text)
+    except LexError as e:
+        # only an unterminated string literal can change how the text before it is split
+        return text, [], [e.diagnostic()], 0, "'" in _QUOTED_RE.sub('', text)
+    p = RDParserMatch(buf)
+    return text, p.parse_program(), p.errors.take(), len(buf), False
+
+class _Block:
+    # a run of consecutive segments, each one as returned by _parse_segment
+    __slots__ = ('segs', 'size', 'ntokens', 'nbad')
+
+    def __init__(self, segs):
+        self.segs = segs
+        self.update()
+
+    def update(self):
+        self.size = sum(len(seg[0]) for seg in self.segs)
+        self.ntokens = sum(seg[3] for seg in self.segs)
+        self.nbad = sum(seg[4] for seg in self.segs)
+
+class IncrementalSession:
+    """Keeps the statements of a script parsed and updates them after each text edit."""
+
+    def __init__(self, text):
+        self._blocks = []
+        self._tree = [0]            # Fenwick tree over the block sizes
+        self._text = None           # joined text, cached until the next edit
+        self.length = 0
+        self.last_reparsed = 0      # segments re-parsed by the last edit
+        self.edit(0, 0, text)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = ''.join(seg[0] for blk in self._blocks for seg in blk.segs)
+        return self._text
+
+    def substring(self, start, end):
+        """text[start:end] without joining the whole script."""
+        if start >= end or not self._blocks:
+            return ''
+        b, j, pos = self._locate(start)
+        parts, last = [], pos
+        for seg in self._segments_from(b, j):
+            parts.append(seg[0])
+            last += len(seg[0])
+            if last >= end:
+                break
+        return ''.join(parts)[start-pos:end-pos]
+
+    # ---------------------------------------------------------------- block index
+
+    def _rebuild(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for b, blk in enumerate(self._blocks, 1):
+            tree[b] += blk.size
+            up = b + (b & -b)
+            if up <= n:
+                tree[up] += tree[b]
+        self._tree = tree
+
+    def _add(self, b, delta):
+        tree = self._tree
+        b += 1
+        while b < len(tree):
+            tree[b] += delta
+            b += b & -b
+
+    def _prefix(self, b):
+        # characters in blocks[:b]
+        tree, total = self._tree, 0
+        while b:
+            total += tree[b]
+            b -= b & -b
+        return total
+
+    def _locate(self, offset):
+        # (block, segment in it, segment start) of the segment holding offset; the end of the
+        # text belongs to the last segment
+        blocks, tree = self._blocks, self._tree
+        if not blocks:
+            return 0, 0, 0
+        if offset >= self.length:
+            b = len(blocks) - 1
+            return b, len(blocks[b].segs) - 1, self.length - len(blocks[b].segs[-1][0])
+        b, pos, step = 0, 0, 1 << (len(blocks).bit_length() - 1)
+        while step:
+            if b + step <= len(blocks) and pos + tree[b + step] <= offset:
+                b += step
+                pos += tree[b]
+            step >>= 1
+        for j, seg in enumerate(blocks[b].segs):
+            if offset < pos + len(seg[0]):
+                return b, j, pos
+            pos += len(seg[0])
+        raise AssertionError('block sizes out of date')
+
+    def _first_bad(self):
+        # (block, segment, start) of the first segment with an unterminated string literal
+        for b, blk in enumerate(self._blocks):
+            if blk.nbad:
+                pos = self._prefix(b)
+                for j, seg in enumerate(blk.segs):
+                    if seg[4]:
+                        return b, j, pos
+                    pos += len(seg[0])
+        return None
+
+    def _segments_from(self, b, j):
+        blocks = self._blocks
+        while b < len(blocks):
+            yield from blocks[b].segs[j:]
+            b, j = b + 1, 0
+
+    def _replace(self, b, j, k, new):
+        # the k segments from segment j of block b on (they may run into the next blocks) := new
+        blocks = self._blocks
+        if b == len(blocks):
+            blocks.append(_Block([]))
+        blk = blocks[b]
+        if j + k <= len(blk.segs) and len(blk.segs) - k + len(new) <= 2 * BLOCK:
+            old_size = blk.size
+            blk.segs[j:j+k] = new
+            if blk.segs:
+                blk.update()
+                if len(self._tree) == len(blocks) + 1:
+                    self._add(b, blk.size - old_size)
+                    return
+            else:
+                del blocks[b]
+            self._rebuild()
+            return
+        segs = blk.segs[:j] + new
+        last, rest = b, j + k - len(blk.segs)     # old segments still to drop after block b
+        if rest <= 0:
+            segs += blk.segs[j+k:]
+        while rest > 0:
+            last += 1
+            n = len(blocks[last].segs)
+            if n > rest:
+                segs += blocks[last].segs[rest:]
+            rest -= n
+        blocks[b:last+1] = [_Block(segs[i:i+BLOCK]) for i in range(0, len(segs), BLOCK)]
+        self._rebuild()
+
+    # ---------------------------------------------------------------- editing
+
+    def _resplit(self, b, j, pos, offset, deleted, inserted):
+        # re-split from segment j of block b (which starts at pos) with the edit applied and replace
+        # the old segments until a new boundary lands on an old one past the edited range. The
+        # old segments are read (and joined) only as far as the scan gets.
+        edit_end = offset + deleted
+        delta = len(inserted) - deleted
+        old = self._segments_from(b, j)
+        old_ends = []               # ends of the old segments read so far, old coordinates
+        parts, end = [], pos
+        for seg in old:
+            parts.append(seg[0])
+            end += len(seg[0])
+            old_ends.append(end)
+            if end >= edit_end:
+                break
+        joined = ''.join(parts)
+        text = joined[:offset-pos] + inserted + joined[edit_end-pos:]
+        whole = len(old_ends) == 0 or old_ends[-1] == self.length   # text runs to the end of the script
+        new = []
+        k = 0                       # old segments consumed so far
+        start = scan = 0            # in text coordinates (text[0] is at pos)
+        synced = False
+        while not synced:
+            more = 0
+            for m in _SCAN_RE.finditer(text, scan):
+                if m.end() - m.start() != 1:
+                    continue
+                if text[m.start()] == "'" and not whole:
+                    more = -1       # a quote may pair with one further down: read everything
+                    break
+                if text[m.start()] != ';':
+                    continue
+                e = m.end()
+                new.append(_parse_segment(text[start:e]))
+                start = e
+                e += pos
+                while k < len(old_ends) and old_ends[k] + delta < e:
+                    k += 1
+                if k < len(old_ends) and old_ends[k] + delta == e and old_ends[k] > edit_end:
+                    k += 1
+                    synced = True
+                    break
+            if synced or whole:
+                break
+            # ran off the end of what was read: read more old segments and scan again from the
+            # last boundary (a string or comment may have been cut at the end)
+            want = len(old_ends) if more == 0 else -1
+            parts = []
+            for seg in old:
+                parts.append(seg[0])
+                old_ends.append(old_ends[-1] + len(seg[0]))
+                want -= 1
+                if want == 0:
+                    break
+            text += ''.join(parts)
+            whole = old_ends[-1] == self.length
+            scan = start
+        if not synced:
+            # ran to the end of the text: everything from segment j of block b was replaced
+            k = len(old_ends)
+            if start < len(text):
+                new.append(_parse_segment(text[start:]))
+        self.length += delta
+        self._text = None
+        self._replace(b, j, k, new)
+        self.last_reparsed = len(new)
+        return k
+
+    def edit(self, offset, deleted, inserted=''):
+        """Replace text[offset:offset+deleted] with inserted and re-parse what it touched.
+        Returns the number of old segments replaced."""
+        if offset < 0 or deleted < 0 or offset + deleted > self.length:
+            raise ValueError(f'edit ({offset}, {deleted}) outside text of length {self.length}')
+        b, j, pos = self._locate(offset)
+        if "'" in inserted or (deleted and '\\' in self.substring(offset, offset + deleted)):
+            # an unterminated string literal has no quote after it; it may pair with one typed
+            # (or un-escaped) further down
+            bad = self._first_bad()
+            if bad is not None and bad[2] < pos:
+                b, j, pos = bad
+        return self._resplit(b, j, pos, offset, deleted, inserted)
+
+    def _segments(self):
+        # (start, segment) for every segment
+        pos = 0
+        for blk in self._blocks:
+            for seg in blk.segs:
+                yield pos, seg
+                pos += len(seg[0])
+
+    def spans(self):
+        return [(start, start + len(seg[0])) for start, seg in self._segments()]
+
+    def statements(self):
+        return [stm for blk in self._blocks for seg in blk.segs for stm in seg[1]]
+
+    def errors(self):
+        return [d.shifted(start) for start, seg in self._segments() for d in seg[2]]
+
+    def token_count(self):
+        return sum(blk.ntokens for blk in self._blocks)
+
+if __name__ == '__main__':
+    import random, time
+    stmt = "INSERT INTO users (id, name) VALUES ({0}, 'user{0}');\nSELECT id FROM users WHERE id = {0};\n"
+    script = ''.join(stmt.format(k) for k in range(50000))
+    t0 = time.perf_counter(); session = IncrementalSession(script); t1 = time.perf_counter()
+    print('initial parse:', round(t1 - t0, 3), 's', len(session.statements()), 'statements')
+    rng = random.Random(0)
+    times = []
+    for _ in range(200):
+        off = rng.randrange(len(session))
+        deleted = rng.randint(0, 3)
+        if "'" in session.substring(off, off + deleted):
+            # removing a quote changes which quotes pair up for the rest of the script, so that
+            # edit re-lexes everything after it (the same work as a full parse)
+            deleted = 0
+        t0 = time.perf_counter()
+        session.edit(off, deleted, rng.choice(['1', ' ', ';', 'x', '']))
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    print('per edit: median', round(times[len(times) // 2] * 1000, 2), 'ms  max', round(times[-1] * 1000, 2), 'ms')
+    fresh = IncrementalSession(session.text)
+    print('same as full re-parse:', fresh.statements() == session.statements() and fresh.errors() == session.errors())
@@ -0,0 +1,403 @@
+# parse_cache.py
+# Caché en disco de scripts ya parseados (AST + diagnósticos), para no volver a parsear en CI los
+# mismos archivos .sql sin cambios (tests_punto_2.sql, fixtures, ...).
+#
+# - Clave: sha256 del contenido del archivo junto con la versión de la gramática (hash del código del
+#   parser, su lexer y sus diagnósticos y del formato, o de CRUD_ounto2.g4 y point2_driver.py para
+#   ANTLR): cambiar cualquiera de ellos invalida todo solo.
+# - Formato binario: cabecera con una tabla de (offset, largo) por sección; las secciones son los
+#   arrays tipados de una Arena (ast_arena.py) tal cual están en memoria, más las tablas chicas
+#   (tipos, átomos, envoltorios) y los diagnósticos en JSON.
+# - Al leer se hace mmap del archivo y los arrays quedan como memoryviews sobre el mapeo: no se
+#   deserializa nada por adelantado; cada sentencia se arma como tupla recién cuando se pide, y los
+#   diagnósticos se decodifican al primer acceso.
+# - Escrituras atómicas (archivo temporal único + os.replace, que se borra si la escritura falla), así
+#   varios procesos e hilos pueden compartir el directorio; un archivo dañado o de otra versión se
+#   trata como fallo y se borra.
+# - Un archivo que no es UTF-8 no aborta la corrida: da (y guarda) un diagnóstico de LexError.
+# - Tamaño acotado (max_bytes): al pasarse se borran las entradas usadas hace más tiempo (cada
+#   acierto actualiza el mtime del archivo).
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from ast_arena import Arena, RD_TAGS, parse_program_arena
+from diagnostics import Diagnostic, DiagnosticCollector, LexError, LineIndex
+
+FORMAT_VERSION = 1
+MAGIC = b'PCACHE\x00\x01'
+SUFFIX = '.pca'
+# (section, array typecode) in file order; 'meta' and 'diagnostics' are JSON
+SECTIONS = (('kind', 'H'), ('wrap', 'H'), ('child_end', 'I'), ('start', 'i'), ('end', 'i'),
+            ('children', 'i'), ('roots', 'i'), ('meta', None), ('diagnostics', None))
+HEADER = struct.Struct('<8s' + 'QQ' * len(SECTIONS))
+ALIGN = 8
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# every source that shapes a cached entry: parser, lexer and token storage, the arena layout and
+# the diagnostic records (ANTLR: the grammar and the driver's tree-to-list conversion)
+_GRAMMAR_FILES = {
+    'rd': ('rd_parser_match_punto5.py', 'dfa_lexer.py', 'token_buffer.py', 'ast_arena.py', 'diagnostics.py'),
+    'antlr': ('CRUD_ounto2.g4', 'point2_driver.py'),
+}
+_versions = {}
+
+def grammar_version(engine='rd'):
+    """Hash of what decides the AST of an engine: its grammar/parser sources, the file format and
+    the byte order of the stored arrays."""
+    v = _versions.get(engine)
+    if v is None:
+        h = hashlib.sha256(f'{FORMAT_VERSION}:{engine}:{sys.byteorder}'.encode('ascii'))
+        for name in _GRAMMAR_FILES[engine]:
+            with open(os.path.join(_HERE, name), 'rb') as f:
+                h.update(f.read())
+        v = _versions[engine] = h.hexdigest()
+    return v
+
+# --- atoms: JSON has no tuples, so they are tagged
+
+def _enc(v):
+    if type(v) is tuple:
+        return {'t': [_enc(x) for x in v]}
+    return v
+
+def _dec(v):
+    if type(v) is dict:
+        return tuple(_dec(x) for x in v['t'])
+    return v
+
+def _encode_errors(engine, errors):
+    if engine == 'rd':
+        return [list(d) for d in errors]
+    return list(errors)
+
+def _decode_errors(engine, data, source=None):
+    # rd: a DiagnosticCollector over source, so line_col/render work as after a fresh parse
+    if engine == 'rd':
+        errors = DiagnosticCollector(source=source)
+        errors.extend(Diagnostic(c, o, tuple(e), f, v, d) for c, o, e, f, v, d in data)
+        errors.total = len(errors)
+        return errors
+    return data
+
+def dumps(arena, errors, engine='rd'):
+    """Serialize an Arena and its diagnostics to the cache format."""
+    meta = {'engine': engine, 'kind_names': arena.kind_names, 'kind_leaf': arena.kind_leaf,
+            'atoms': [_enc(a) for a in arena.atoms], 'wraps': [_enc(w) for w in arena.wraps],
+            'tags': sorted(arena.tags) if arena.tags is not None else None}
+    blobs = []
+    for name, code in SECTIONS:
+        if name == 'meta':
+            blobs.append(json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        elif name == 'diagnostics':
+            blobs.append(json.dumps(_encode_errors(engine, errors), ensure_ascii=False,
+                                    separators=(',', ':')).encode('utf-8'))
+        else:
+            blobs.append(getattr(arena, name).tobytes())
+    table = []
+    pos = HEADER.size
+    for b in blobs:
+        pos += -pos % ALIGN
+        table += [pos, len(b)]
+        pos += len(b)
+    out = bytearray(HEADER.pack(MAGIC, *table))
+    for b in blobs:
+        out += bytes(-len(out) % ALIGN)
+        out += b
+    return bytes(out)
+
+class CachedParse:
+    """A parse result read from the cache: .arena (Sequence of statement tuples, built on access),
+    .errors (decoded on first use), .hit. The arrays are views over the mmapped file until close()."""
+
+    def __init__(self, arena, errors=None, engine='rd', hit=False, mm=None, raw_errors=None):
+        self.arena = arena
+        self.engine = engine
+        self.hit = hit
+        self._mm = mm
+        self._errors = errors
+        self._raw_errors = raw_errors
+
+    @property
+    def errors(self):
+        if self._errors is None:
+            self._errors = _decode_errors(self.engine, json.loads(bytes(self._raw_errors)), self.arena.source)
+            self._raw_errors.release()
+            self._raw_errors = None
+        return self._errors
+
+    def statements(self):
+        return list(self.arena)
+
+    def close(self):
+        if self._mm is None:
+            return
+        a = self.arena
+        for name, code in SECTIONS:
+            if code is not None:
+                getattr(a, name).release()
+        if self._raw_errors is not None:
+            self._raw_errors.release()
+            self._raw_errors = None
+        self._mm.close()
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load(path, source=None):
+    """Map a cache file; raises ValueError if it is not a valid cache file."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    views = {}
+    try:
+        if len(mm) < HEADER.size:
+            raise ValueError('truncated cache file')
+        fields = HEADER.unpack_from(mm)
+        if fields[0] != MAGIC:
+            raise ValueError('not a parse cache file')
+        table = fields[1:]
+        if any(table[2 * k] + table[2 * k + 1] > len(mm) for k in range(len(SECTIONS))):
+            raise ValueError('truncated cache file')
+        view = memoryview(mm)
+        for k, (name, code) in enumerate(SECTIONS):
+            part = view[table[2 * k]:table[2 * k] + table[2 * k + 1]]
+            views[name] = part.cast(code) if code is not None else part
+        view.release()
+        meta = json.loads(bytes(views['meta']))
+        views['meta'].release()
+    except Exception:
+        for v in views.values():
+            v.release()
+        mm.close()
+        raise ValueError(f'corrupt cache file {path}') from None
+    arena = Arena(source, frozenset(meta['tags']) if meta['tags'] is not None else None)
+    for name, code in SECTIONS:
+        if code is not None:
+            setattr(arena, name, views[name])
+    arena.kind_names = meta['kind_names']
+    arena.kind_leaf = meta['kind_leaf']
+    arena.atoms = [_dec(a) for a in meta['atoms']]
+    arena.wraps = [_dec(w) for w in meta['wraps']]
+    return CachedParse(arena, None, meta['engine'], True, mm, views['diagnostics'])
+
+# --- parsing a text with an engine, into an Arena
+
+def _decode(content):
+    # (text, None); bytes that are not UTF-8 give U+FFFD in text and a LexError at the first of them
+    try:
+        return content.decode('utf-8'), None
+    except UnicodeDecodeError as e:
+        return content.decode('utf-8', 'replace'), LexError('\ufffd', len(content[:e.start].decode('utf-8')))
+
+def _lex_failure(engine, text, err):
+    # the result of a parse stopped by err, as _parse_rd reports lex errors
+    if engine == 'rd':
+        errors = DiagnosticCollector(source=text)
+        errors.append(err.diagnostic())
+        return Arena(text, RD_TAGS), errors
+    line, col = LineIndex(text).line_col(err.pos)
+    return Arena(text, frozenset()), [{'line': line, 'column': col - 1, 'message': str(err)}]
+
+def _parse_rd(text):
+    try:
+        return parse_program_arena(text)
+    except LexError as e:
+        return _lex_failure('rd', text, e)
+
+_antlr = None
+
+def _parse_antlr(text):
+    global _antlr
+    from antlr4 import InputStream
+    if _antlr is None:
+        from point2_driver import BatchParser
+        _antlr = BatchParser()
+    tree, errors, mode = _antlr.parse(InputStream(text))
+    arena = Arena(text, frozenset())    # [rule, children...] lists, terminals as atoms
+    arena.append(_antlr.to_json(tree))
+    return arena, errors
+
+_PARSERS = {'rd': _parse_rd, 'antlr': _parse_antlr}
+
+class ParseCache:
+    def __init__(self, directory='.parse_cache', max_bytes=256 << 20, engine='rd'):
+        if engine not in _PARSERS:
+            raise ValueError(f'unknown engine {engine!r}')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.hits = self.misses = self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, content):
+        h = hashlib.sha256(grammar_version(self.engine).encode('ascii'))
+        h.update(content)
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, content, source=None):
+        """CachedParse for these bytes, or None. source: the decoded text (leaf values are read from it)."""
+        path = self.path(self.key(content))
+        try:
+            res = load(path, source if source is not None else _decode(content)[0])
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self._discard(path)
+            return None
+        try:
+            os.utime(path)              # recency for eviction
+        except OSError:
+            pass
+        return res
+
+    def put(self, content, arena, errors):
+        path = self.path(self.key(content))
+        data = dumps(arena, errors, self.engine)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)   # atomic: readers never see a half-written file
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+        return len(data)
+
+    def parse(self, content):
+        """Parse bytes through the cache; returns a CachedParse (hit) or a fresh result (miss).
+        Bytes that are not UTF-8 give (and cache) a LexError diagnostic, like any other lex error."""
+        text, bad = _decode(content)
+        res = self.get(content, text)
+        if res is not None:
+            self.hits += 1
+            return res
+        self.misses += 1
+        if bad is not None:
+            arena, errors = _lex_failure(self.engine, text, bad)
+        else:
+            arena, errors = _PARSERS[self.engine](text)
+        self.put(content, arena, errors)
+        return CachedParse(arena, errors if self.engine == 'rd' else list(errors), self.engine)
+
+    def parse_file(self, path):
+        with open(path, 'rb') as f:
+            return self.parse(f.read())
+
+    def entries(self):
+        """(mtime, size, path) of every cache file, oldest first."""
+        out = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(SUFFIX):
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue        # evicted by another process meanwhile
+                    out.append((st.st_mtime, st.st_size, e.path))
+        out.sort()
+        return out
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._discard(path):
+                self.evictions += 1
+            total -= size
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._discard(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(s for _, s, _ in entries), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+if __name__ == '__main__':
+    import argparse
+
+    ap = argparse.ArgumentParser(description='parse .sql files through the on-disk parse cache')
+    ap.add_argument('files', nargs='*')
+    ap.add_argument('--dir', default='.parse_cache')
+    ap.add_argument('--max-mb', type=float, default=256)
+    ap.add_argument('--engine', default='rd', choices=sorted(_PARSERS))
+    args = ap.parse_args()
+    if args.files:
+        cache = ParseCache(args.dir, int(args.max_mb * (1 << 20)), args.engine)
+        for name in args.files:
+            t0 = time.perf_counter()
+            res = cache.parse_file(name)
+            n, errors = len(res.arena), res.errors
+            print(f'{name}: {"hit " if res.hit else "miss"} {n} statements, {len(errors)} errors, '
+                  f'{(time.perf_counter() - t0) * 1000:.2f} ms')
+            res.close()
+        print(cache.stats())
+        sys.exit(0)
+
+    # demo: tests_punto_2.sql and a larger generated script, parsed vs loaded from the cache
+    from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+    from bench_parsers import generate_sql
+
+    with open(os.path.join(_HERE, 'tests_punto_2.sql'), 'rb') as f:
+        fixture = f.read()
+    big = generate_sql(4000, 3, 4, 0.02, seed=25).encode('utf-8')
+    with tempfile.TemporaryDirectory() as d:
+        cache = ParseCache(d)
+        for label, content in (('tests_punto_2.sql', fixture), ('generated script', big)):
+            text = content.decode('utf-8')
+            t0 = time.perf_counter()
+            p = RDParserMatch(tokenize_buffer(text))
+            plain = p.parse_program()
+            t1 = time.perf_counter()
+            cache.parse(content).close()                        # miss: parse and store
+            t2 = time.perf_counter()
+            res = cache.parse(content)                          # hit: mmap, nothing decoded yet
+            t3 = time.perf_counter()
+            first = res.arena[0]
+            t4 = time.perf_counter()
+            stmts = list(res.arena)
+            t5 = time.perf_counter()
+            same = stmts == plain and res.errors == list(p.errors)
+            size = os.path.getsize(cache.path(cache.key(content)))
+            print(f'{label}: {len(content)} bytes, {len(stmts)} statements, {len(res.errors)} errors, '
+                  f'cache file {size} bytes, same AST and errors: {same}')
+            print(f'  parse {(t1 - t0) * 1000:.2f} ms | miss+store {(t2 - t1) * 1000:.2f} ms | '
+                  f'hit open {(t3 - t2) * 1000:.3f} ms | first statement {(t4 - t3) * 1000:.3f} ms | '
+                  f'all statements {(t5 - t4) * 1000:.2f} ms')
+            print('  first:', first)
+            res.close()
+        # eviction: a budget smaller than both entries keeps only the most recent one
+        small = ParseCache(d, max_bytes=os.path.getsize(cache.path(cache.key(big))) + 1)
+        time.sleep(0.01)
+        small.parse(fixture).close()
+        small.evict()
+        print('after shrinking the budget:', small.stats(),
+              '| fixture kept:', os.path.exists(small.path(small.key(fixture))))
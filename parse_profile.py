@@ -0,0 +1,191 @@
+# parse_profile.py
+# Instrumentación de los parsers: RDParserMatch (punto 5), ParserLL1 (punto 3) y cyk (punto 4).
+#
+# - Las clases originales no se tocan: instrument() arma una subclase que envuelve next/match y los
+#   métodos parse_*, así que con el perfilado apagado el costo es cero (se usa la clase de siempre).
+# - RDParserMatch: por tipo de sentencia (create, insert, select, ...) cuenta sentencias, tiempo,
+#   tokens, llamadas a match/next y tokens saltados por la recuperación en modo pánico.
+# - En todos: profundidad máxima de llamadas parse_* anidadas; tiempo de tokenize vs parseo.
+# - cyk_profiled: corre cyk o cyk_bitset con su diccionario stats (celdas, cortes, consultas de
+#   reglas, celdas llenas, símbolos), contados por el propio motor a partir de su tabla.
+# - Profile.dump() exporta el resumen como JSON; los __main__ lo activan con --profile[=archivo].
+
+import json
+import sys
+import time
+from functools import wraps
+
+from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+import codigo_del_3
+from cyk_full_punto4 import cyk_bitset
+
+class Profile:
+    def __init__(self):
+        self.sections = {}
+
+    def section(self, name):
+        return self.sections.setdefault(name, {})
+
+    def bucket(self, section, kind):
+        return self.section(section).setdefault('by_kind', {}).setdefault(kind, {
+            'count': 0, 'seconds': 0.0, 'tokens': 0, 'match': 0, 'next': 0, 'skipped': 0})
+
+    def to_dict(self):
+        return self.sections
+
+    def dump(self, dest='-'):
+        text = json.dumps(self.sections, indent=2, sort_keys=True)
+        if dest in (None, '-'):
+            print(text)     # the drivers print nothing else when profiling
+        else:
+            with open(dest, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+
+def profile_arg(argv=None):
+    """None without --profile; '-' (stdout) for --profile; the path for --profile=path."""
+    for a in (sys.argv[1:] if argv is None else argv):
+        if a == '--profile':
+            return '-'
+        if a.startswith('--profile='):
+            return a.split('=', 1)[1]
+    return None
+
+# --- parser instrumentation
+
+def _depth_wrapper(fn):
+    @wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        self._depth += 1
+        if self._depth > self._max_depth:
+            self._max_depth = self._depth
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            self._depth -= 1
+    return wrapper
+
+def instrument(cls, stmt_method=None):
+    """Subclass of cls counting next/match calls, recovery skips and parse_* nesting depth.
+    stmt_method: name of the method that parses one statement; its results are grouped by kind."""
+    ns = {}
+    for name in dir(cls):
+        if name.startswith('parse_') and name != stmt_method and callable(getattr(cls, name)):
+            ns[name] = _depth_wrapper(getattr(cls, name))
+
+    def __init__(self, *args, **kwargs):
+        cls.__init__(self, *args, **kwargs)
+        self._depth = self._max_depth = 0
+        self.n_next = self.n_match = self.n_skipped = 0
+        self.stmt_stats = {}
+        plain_next = self.next      # may be an instance attribute (RDParserMatch over a TokenBuffer)
+        def next_():
+            self.n_next += 1
+            plain_next()
+        self.next = next_
+    ns['__init__'] = __init__
+
+    def match(self, *args, **kwargs):
+        self.n_match += 1
+        i0 = self.i
+        errors = getattr(self, 'errors', None)
+        e0 = errors.total if errors is not None else 0
+        ok = cls.match(self, *args, **kwargs)
+        if errors is not None and errors.total > e0:
+            # error path: every token consumed except the expected one found after skipping
+            self.n_skipped += self.i - i0 - (1 if ok else 0)
+        return ok
+    ns['match'] = match
+
+    if hasattr(cls, 'skip_statement'):
+        def skip_statement(self):
+            i0 = self.i
+            cls.skip_statement(self)
+            # the ';' that ends the skip is consumed, not skipped (as after a failing match)
+            self.n_skipped += self.i - i0 - (self.i > i0 and self.prev.type == 'SEMI')
+        ns['skip_statement'] = skip_statement
+
+    if stmt_method is not None:
+        plain_stmt = getattr(cls, stmt_method)
+        def stmt(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            i0, m0, n0, s0 = self.i, self.n_match, self.n_next, self.n_skipped
+            result = plain_stmt(self, *args, **kwargs)
+            kind = result[0] if isinstance(result, tuple) and result else type(result).__name__
+            b = self.stmt_stats.setdefault(kind, {'count': 0, 'seconds': 0.0, 'tokens': 0, 'match': 0,
+                                                   'next': 0, 'skipped': 0})
+            b['count'] += 1
+            b['seconds'] += time.perf_counter() - t0
+            b['tokens'] += self.i - i0
+            b['match'] += self.n_match - m0
+            b['next'] += self.n_next - n0
+            b['skipped'] += self.n_skipped - s0
+            return result
+        ns[stmt_method] = _depth_wrapper(stmt)
+
+    return type(f'Profiled{cls.__name__}', (cls,), ns)
+
+ProfiledRDParser = instrument(RDParserMatch, stmt_method='parse_terminated_stmt')
+ProfiledParserLL1 = instrument(codigo_del_3.ParserLL1)
+
+def _merge(section, parser):
+    section['next'] = section.get('next', 0) + parser.n_next
+    section['match'] = section.get('match', 0) + parser.n_match
+    section['recovery_skipped_tokens'] = section.get('recovery_skipped_tokens', 0) + parser.n_skipped
+    section['max_depth'] = max(section.get('max_depth', 0), parser._max_depth)
+
+def profile_rd(text, profile, **parser_kwargs):
+    """Tokenize and parse text with an instrumented RDParserMatch; returns (stmts, errors)."""
+    sec = profile.section('rd')
+    t0 = time.perf_counter()
+    buf = tokenize_buffer(text)
+    t1 = time.perf_counter()
+    p = ProfiledRDParser(buf, **parser_kwargs)
+    stmts = p.parse_program()
+    t2 = time.perf_counter()
+    sec['tokenize_seconds'] = sec.get('tokenize_seconds', 0.0) + (t1 - t0)
+    sec['parse_seconds'] = sec.get('parse_seconds', 0.0) + (t2 - t1)
+    sec['tokens'] = sec.get('tokens', 0) + len(buf)
+    sec['statements'] = sec.get('statements', 0) + len(stmts)
+    sec['errors'] = sec.get('errors', 0) + p.errors.total
+    _merge(sec, p)
+    for kind, s in p.stmt_stats.items():
+        b = profile.bucket('rd', kind)
+        for k, v in s.items():
+            b[k] += v
+    return stmts, p.errors
+
+def profile_ll1(text, profile, iterative=False):
+    """Tokenize and parse one expression with an instrumented ParserLL1; returns the tree."""
+    sec = profile.section('ll1')
+    t0 = time.perf_counter()
+    buf = codigo_del_3.tokenize_buffer(text)
+    t1 = time.perf_counter()
+    p = ProfiledParserLL1(buf)
+    try:
+        ast = p.parse_E_iterative() if iterative else p.parse_E()
+        if p.kind != codigo_del_3.K_EOF:
+            raise SyntaxError(f'Extra input after valid expression at pos {p.curr.pos}: {p.curr}')
+    except SyntaxError:
+        sec['errors'] = sec.get('errors', 0) + 1
+        ast = None
+    t2 = time.perf_counter()
+    sec['tokenize_seconds'] = sec.get('tokenize_seconds', 0.0) + (t1 - t0)
+    sec['parse_seconds'] = sec.get('parse_seconds', 0.0) + (t2 - t1)
+    sec['tokens'] = sec.get('tokens', 0) + len(buf)
+    sec['expressions'] = sec.get('expressions', 0) + 1
+    _merge(sec, p)
+    return ast
+
+def cyk_profiled(tokens, cnf, profile, start='E', engine=cyk_bitset):
+    """Run engine (cyk or cyk_bitset, the one the bench and the server use) on tokens with its stats
+    counters on, adding them and the time to the profile section named after the engine."""
+    sec = profile.section(engine.__name__)
+    stats = {}
+    t0 = time.perf_counter()
+    ok = engine(tokens, cnf, start, stats=stats)
+    sec['seconds'] = sec.get('seconds', 0.0) + time.perf_counter() - t0
+    stats['sentences'] = 1
+    stats['accepted'] = int(ok)
+    for k, v in stats.items():
+        sec[k] = sec.get(k, 0) + v
+    return ok
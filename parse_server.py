@@ -0,0 +1,365 @@
+# parse_server.py
+# Servidor de parseo residente: evita pagar en cada corrida el arranque del intérprete, el import de
+# antlr4, la construcción de los lexers DFA y la conversión a CNF.
+#
+# - Protocolo de líneas JSON, por stdin/stdout (por defecto) o por un socket Unix (--socket ruta).
+#   Pedido:    {"id": 1, "engine": "rd" | "ll1" | "cyk" | "antlr", "text": "...", "ast": true}
+#   Respuesta: {"id": 1, "engine": "rd", "ok": true, "ast": ..., "errors": [...], "ms": 0.42}
+#   Las respuestas salen a medida que terminan (no en orden): el cliente las empareja por "id".
+#   {"op": "ping"} y {"op": "stats"} responden sin pasar por los workers.
+# - Los parseos (CPU) corren en un ProcessPoolExecutor; cada worker importa un motor recién cuando lo
+#   usa por primera vez y lo deja caliente (parser ANTLR reutilizado, gramática CNF compilada).
+#   --preload rd,cyk los importa al crear cada worker; --workers 0 parsea en un único hilo del
+#   servidor. Si un worker muere (OOM, segfault) el pool se reconstruye y el servicio sigue.
+# - Cada worker devuelve la respuesta ya serializada a JSON (sin recursión si el AST es muy profundo),
+#   así un árbol anidado no rompe ni el pickle de vuelta ni el json.dumps del servidor.
+# - El proceso servidor solo importa la biblioteca estándar, así el arranque en frío es rápido.
+# - Cada conexión admite varios pedidos en vuelo (acotados por --max-inflight) y los ASTs se
+#   devuelven como listas JSON; los errores como diagnósticos con línea y columna.
+#
+# Uso: python parse_server.py [--socket /tmp/parse.sock] [--workers N] [--preload rd,ll1,cyk,antlr]
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ENGINES = ('rd', 'll1', 'cyk', 'antlr')
+LINE_LIMIT = 1 << 26        # longest request line accepted (whole scripts travel in one line)
+
+# ---------------------------------------------------------------- worker side
+# state kept warm in each worker process: engine name -> loaded handler
+
+_engines = {}
+
+def _diagnostics(errors):
+    out = []
+    for d in errors:
+        lc = errors.line_col(d.offset) or (None, None)
+        out.append({'code': d.code, 'line': lc[0], 'column': lc[1], 'offset': d.offset,
+                    'message': d.message, 'found': d.found, 'value': d.value})
+    return out
+
+def _load_rd():
+    from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+    from diagnostics import DiagnosticCollector, LexError
+
+    def run(text, with_ast):
+        try:
+            buf = tokenize_buffer(text)
+        except LexError as e:
+            errors = DiagnosticCollector(source=text)
+            errors.append(e.diagnostic())
+            return {'ok': False, 'errors': _diagnostics(errors)}
+        p = RDParserMatch(buf, iterative_expr=True)
+        stmts = p.parse_program()
+        res = {'ok': not p.errors, 'errors': _diagnostics(p.errors), 'statements': len(stmts)}
+        if with_ast:
+            res['ast'] = stmts
+        return res
+    return run
+
+def _load_ll1():
+    from codigo_del_3 import parse_expression
+
+    def run(text, with_ast):
+        try:
+            ast = parse_expression(text, iterative=True)
+        except SyntaxError as e:
+            return {'ok': False, 'errors': [{'message': str(e)}]}
+        return {'ok': True, 'errors': [], 'ast': ast} if with_ast else {'ok': True, 'errors': []}
+    return run
+
+def _load_cyk():
+    from codigo_del_3 import tokenize_buffer, TOKEN_NAMES
+    from cyk_full_punto4 import GRAMMAR, compile_grammar, cyk_forest, original_tree
+    cnf = compile_grammar(GRAMMAR, 'E')
+    # token kinds -> terminals of GRAMMAR (ids and numbers are both 'id')
+    sym = {'PLUS': '+', 'MINUS': '-', 'TIMES': '*', 'DIV': '/', 'LPAREN': '(', 'RPAREN': ')',
+           'ID': 'id', 'NUMBER': 'id'}
+    terminal = [sym.get(name) for name in TOKEN_NAMES]
+
+    def run(text, with_ast):
+        try:
+            buf = tokenize_buffer(text)
+        except SyntaxError as e:
+            return {'ok': False, 'errors': [{'message': str(e)}]}
+        tokens = [terminal[k] for k in buf.kinds[:-1]]
+        forest = cyk_forest(tokens, cnf, 'E')
+        if forest is None:
+            return {'ok': False, 'errors': [{'message': 'input not in the language of GRAMMAR'}]}
+        res = {'ok': True, 'errors': [], 'trees': forest.count()}
+        if with_ast:
+            res['ast'] = original_tree(forest.tree(), GRAMMAR)
+        return res
+    return run
+
+def _load_antlr():
+    from antlr4 import InputStream
+    from point2_driver import BatchParser
+    bp = BatchParser()
+
+    def run(text, with_ast):
+        tree, errors, mode = bp.parse(InputStream(text))
+        res = {'ok': not errors, 'errors': errors, 'mode': mode}
+        if with_ast:
+            res['ast'] = bp.to_json(tree)
+        return res
+    return run
+
+_LOADERS = {'rd': _load_rd, 'll1': _load_ll1, 'cyk': _load_cyk, 'antlr': _load_antlr}
+
+def _engine(name):
+    run = _engines.get(name)
+    if run is None:
+        run = _engines[name] = _LOADERS[name]()
+    return run
+
+def _init_worker(preload=()):
+    for name in preload:
+        try:
+            _engine(name)
+        except ImportError:
+            pass            # reported per request when the engine is actually used
+
+_RAW = object()     # marks output text on the _dumps_deep stack
+
+def _dumps_deep(obj):
+    # json.dumps without recursion, for results nested deeper than the recursion limit
+    out, stack = [], [obj]
+    while stack:
+        x = stack.pop()
+        if type(x) is tuple and x and x[0] is _RAW:
+            out.append(x[1])
+        elif isinstance(x, (list, tuple)):
+            out.append('[')
+            stack.append((_RAW, ']'))
+            for k in range(len(x) - 1, -1, -1):
+                stack.append(x[k])
+                if k:
+                    stack.append((_RAW, ','))
+        elif isinstance(x, dict):
+            out.append('{')
+            stack.append((_RAW, '}'))
+            items = list(x.items())
+            for k in range(len(items) - 1, -1, -1):
+                key, value = items[k]
+                stack.append(value)
+                stack.append((_RAW, (',' if k else '') + json.dumps(str(key), ensure_ascii=False) + ':'))
+        else:
+            out.append(json.dumps(x, ensure_ascii=False))
+    return ''.join(out)
+
+def _dumps(obj):
+    try:
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+    except RecursionError:
+        return _dumps_deep(obj)
+
+def _with_head(head, body):
+    # '{"id":1,"engine":"rd"}' + '{"ok":true,...}' -> '{"id":1,"engine":"rd","ok":true,...}'
+    return _dumps(head)[:-1] + ',' + body[1:]
+
+def handle(engine, text, with_ast=True):
+    """Parse text with one engine in this process; returns the response fields as a JSON object
+    string (serialized here, so deep ASTs never cross the process boundary as nested objects)."""
+    t0 = time.perf_counter()
+    try:
+        res = _engine(engine)(text, with_ast)
+    except ImportError as e:
+        res = {'ok': False, 'errors': [{'message': f'engine {engine} not available: {e}'}]}
+    except RecursionError:
+        res = {'ok': False, 'errors': [{'message': 'input nested too deeply'}]}
+    res['ms'] = round((time.perf_counter() - t0) * 1000, 3)
+    return _dumps(res)
+
+# ---------------------------------------------------------------- server side
+
+class _FileLines:
+    """readline() of a blocking binary file, run in a thread (regular files can not be pipe transports)."""
+
+    def __init__(self, f):
+        self.f = f
+
+    async def readline(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self.f.readline)
+
+def _request_id(line):
+    try:
+        req = json.loads(line)
+    except (ValueError, RecursionError):
+        return None
+    return req.get('id') if isinstance(req, dict) else None
+
+class ParseServer:
+    def __init__(self, workers=None, preload=(), max_inflight=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.preload = tuple(preload)
+        self.max_inflight = max_inflight or 4 * max(self.workers, 1)
+        self.pool = None
+        self.started = time.time()
+        self.counts = {name: 0 for name in ENGINES}
+        self.seconds = {name: 0.0 for name in ENGINES}
+        self.bad_requests = 0
+        self.restarts = 0
+
+    def start(self):
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.preload,))
+        else:
+            # one thread: the engines (the ANTLR BatchParser, lazy _engines) are not thread-safe
+            self.pool = ThreadPoolExecutor(1, initializer=_init_worker, initargs=(self.preload,))
+
+    def _replace_pool(self, broken):
+        # a worker died; the other requests that saw the same broken pool must not restart it again
+        if self.pool is broken:
+            self.restarts += 1
+            broken.shutdown(wait=False)
+            self.pool = None
+            self.start()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def stats(self):
+        return {'uptime_s': round(time.time() - self.started, 3), 'workers': self.workers,
+                'requests': dict(self.counts), 'bad_requests': self.bad_requests, 'restarts': self.restarts,
+                'mean_ms': {k: round(self.seconds[k] * 1000 / n, 3) for k, n in self.counts.items() if n}}
+
+    async def respond(self, line):
+        """One request line -> one response line (a JSON object, no newline)."""
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError('request must be a JSON object')
+        except (ValueError, RecursionError) as e:
+            self.bad_requests += 1
+            return _dumps({'id': None, 'ok': False, 'errors': [{'message': f'bad request: {e}'}]})
+        rid = req.get('id')
+        op = req.get('op')
+        if op == 'ping':
+            return _dumps({'id': rid, 'ok': True})
+        if op == 'stats':
+            return _dumps({'id': rid, 'ok': True, 'stats': self.stats()})
+        engine, text = req.get('engine'), req.get('text')
+        if engine not in ENGINES or not isinstance(text, str):
+            self.bad_requests += 1
+            return _dumps({'id': rid, 'ok': False,
+                           'errors': [{'message': f'need "engine" in {list(ENGINES)} and a "text" string'}]})
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        t0 = time.perf_counter()
+        try:
+            body = await loop.run_in_executor(pool, handle, engine, text, bool(req.get('ast', True)))
+        except Exception as e:      # a crashed worker must not take the connection down
+            if isinstance(e, BrokenProcessPool):
+                self._replace_pool(pool)
+            return _dumps({'id': rid, 'engine': engine, 'ok': False,
+                           'errors': [{'message': f'{type(e).__name__}: {e}'}]})
+        self.counts[engine] += 1
+        self.seconds[engine] += time.perf_counter() - t0
+        return _with_head({'id': rid, 'engine': engine}, body)
+
+    async def serve_stream(self, reader, write):
+        """Read request lines until EOF; every request runs as its own task, responses are written
+        (one JSON line each) as soon as they are ready."""
+        slots = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+
+        async def one(line):
+            # every request gets exactly one response line, whatever fails on the way
+            try:
+                res = await self.respond(line)
+            except Exception as e:
+                res = _dumps({'id': _request_id(line), 'ok': False, 'errors': [{'message': f'{type(e).__name__}: {e}'}]})
+            finally:
+                slots.release()
+            await write(res + '\n')
+
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # line longer than the reader's limit: the rest of it can not be told apart from the
+                # next requests, so the stream is answered once and closed
+                self.bad_requests += 1
+                await write(json.dumps({'id': None, 'ok': False, 'errors': [
+                    {'message': 'request line too long; closing the connection'}]}) + '\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(one(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=LINE_LIMIT)
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except ValueError:
+            reader = _FileLines(sys.stdin.buffer)   # stdin redirected from a regular file
+        out = sys.stdout
+
+        async def write(text):
+            out.write(text)
+            out.flush()
+        await self.serve_stream(reader, write)
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.remove(path)         # stale socket from a previous run
+
+        async def connection(reader, writer):
+            async def write(text):
+                writer.write(text.encode('utf-8'))
+                await writer.drain()
+            try:
+                await self.serve_stream(reader, write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connection, path, limit=LINE_LIMIT)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f'parse server listening on {path} ({self.workers} workers)', file=sys.stderr)
+        async with server:
+            await stop.wait()
+        os.remove(path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='resident parse server (JSON lines over stdin or a Unix socket)')
+    ap.add_argument('--socket', default=None, help='Unix socket path (default: stdin/stdout)')
+    ap.add_argument('--workers', type=int, default=None, help='worker processes; 0 parses in a server thread')
+    ap.add_argument('--preload', default='', help='engines imported when each worker starts, e.g. rd,cyk')
+    ap.add_argument('--max-inflight', type=int, default=None, help='pending requests per connection')
+    args = ap.parse_args(argv)
+    preload = [e for e in args.preload.split(',') if e]
+    for e in preload:
+        if e not in ENGINES:
+            ap.error(f'unknown engine {e!r} in --preload')
+    server = ParseServer(args.workers, preload, args.max_inflight)
+    server.start()
+    try:
+        asyncio.run(server.serve_unix(args.socket) if args.socket else server.serve_stdio())
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,28 @@
 # codigo de python
+#
+# Modo lote (--batch): recibe muchos archivos o directorios y los reparte entre procesos.
+# - Cada proceso crea un solo CRUDLexer/CRUDParser y lo reutiliza para todos sus archivos, así la
+#   caché DFA de ANTLR se mantiene caliente.
+# - Parseo en dos etapas: primero predicción SLL con BailErrorStrategy (rápida); solo si falla se
+#   vuelve a parsear el mismo archivo con LL completo y la estrategia de errores normal.
+# - Por archivo se escribe una línea JSON con el AST compacto (listas [regla, hijos...], tokens como
+#   texto) o solo los diagnósticos (--no-ast), más el tiempo de parseo y el modo que se usó; si un
+#   archivo no se puede leer o su parseo falla, su línea lleva 'error' y el lote sigue.
 
+import argparse
+import fnmatch
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from antlr4 import FileStream, CommonTokenStream, ParseTreeWalker
+from antlr4.error.ErrorListener import ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.atn.PredictionMode import PredictionMode
+from antlr4.tree.Tree import TerminalNode
 
 from antlr_out.CRUDLexer import CRUDLexer
 from antlr_out.CRUDParser import CRUDParser
@@ -14,6 +35,164 @@ def main(input_file):
     tree = parser.program()
     print(tree.toStringTree(recog=parser))
 
+class CollectingErrorListener(ErrorListener):
+    def __init__(self):
+        self.errors = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.errors.append({'line': line, 'column': column, 'message': msg})
+
+class BatchParser:
+    """One lexer/parser pair reused across inputs (the ATN/DFA caches live in the generated
+    classes and stay warm for the whole process)."""
+
+    def __init__(self):
+        self.lexer = CRUDLexer(None)
+        self.parser = CRUDParser(None)
+        self.listener = CollectingErrorListener()
+        self.lexer.removeErrorListeners()
+        self.lexer.addErrorListener(self.listener)
+        self.parser.removeErrorListeners()
+
+    def parse(self, input_stream):
+        """Returns (tree, errors, mode); mode is 'SLL' or 'LL'."""
+        self.listener.errors = []
+        self.lexer.inputStream = input_stream
+        tokens = CommonTokenStream(self.lexer)
+        tokens.fill()
+        parser = self.parser
+        lex_errors = list(self.listener.errors)
+        # stage 1: SLL, give up at the first syntax error (no listener: the bail strategy raises)
+        parser.setTokenStream(tokens)
+        parser._interp.predictionMode = PredictionMode.SLL
+        parser._errHandler = BailErrorStrategy()
+        try:
+            return parser.program(), lex_errors, 'SLL'
+        except ParseCancellationException:
+            pass
+        # stage 2: full LL with normal error recovery, on the same tokens. setTokenStream would not
+        # do here: it resets the parser before attaching the stream, so the stream stays at the
+        # token where SLL bailed. reset() (with the stream attached) rewinds it to token 0.
+        parser._interp.predictionMode = PredictionMode.LL
+        parser._errHandler = DefaultErrorStrategy()
+        parser.reset()
+        tokens.seek(0)
+        parser.addErrorListener(self.listener)
+        try:
+            tree = parser.program()
+        finally:
+            parser.removeErrorListener(self.listener)
+        return tree, self.listener.errors, 'LL'
+
+    def to_json(self, tree):
+        # [rule, child, ...] with terminals as their text; iterative, expressions can nest deeply.
+        # Children are pushed in reverse so they are popped, and appended, in source order.
+        names = self.parser.ruleNames
+        root = []
+        stack = [(tree, root)]
+        while stack:
+            node, out = stack.pop()
+            if isinstance(node, TerminalNode):
+                out.append(node.getText())
+                continue
+            item = [names[node.getRuleIndex()]]
+            out.append(item)
+            for child in reversed(node.children or ()):
+                stack.append((child, item))
+        return root[0]
+
+_batch_parser = None
+
+def _init_worker():
+    global _batch_parser
+    _batch_parser = BatchParser()
+
+def parse_file(path, with_ast=True):
+    """Parse one file with the process' BatchParser; returns the JSON-lines record as a dict."""
+    if _batch_parser is None:
+        _init_worker()
+    record = {'file': path}
+    t0 = time.perf_counter()
+    try:
+        input_stream = FileStream(path, encoding='utf-8')
+    except (OSError, UnicodeDecodeError) as e:
+        record['error'] = str(e)
+        return record
+    t1 = time.perf_counter()
+    try:
+        tree, errors, mode = _batch_parser.parse(input_stream)
+        ast = _batch_parser.to_json(tree) if with_ast else None
+    except Exception as e:
+        # one bad file (ANTLR runtime error, RecursionError, ...) must not abort the whole batch;
+        # the parser may be left half-way through a rule, so the process gets a fresh one
+        record['error'] = f'{type(e).__name__}: {e}'
+        _init_worker()
+        return record
+    t2 = time.perf_counter()
+    record['mode'] = mode
+    record['errors'] = errors
+    if with_ast:
+        record['ast'] = ast
+    record['read_ms'] = round((t1 - t0) * 1000, 3)
+    record['parse_ms'] = round((t2 - t1) * 1000, 3)
+    return record
+
+def _parse_file_star(job):
+    return parse_file(*job)
+
+def expand_paths(paths, pattern='*.sql'):
+    """Files are taken as given; directories are walked (sorted) for names matching pattern."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, names in os.walk(p):
+                dirs.sort()
+                files.extend(os.path.join(root, n) for n in sorted(names) if fnmatch.fnmatch(n, pattern))
+        else:
+            files.append(p)
+    return files
+
+def run_batch(paths, workers=None, with_ast=True, pattern='*.sql', out=sys.stdout):
+    """Parse every file in a process pool and write one JSON line per file, in input order."""
+    files = expand_paths(paths, pattern)
+    workers = workers or os.cpu_count() or 1
+    jobs = [(f, with_ast) for f in files]
+    t0 = time.perf_counter()
+    n_err = n_ll = 0
+    pool = None
+    if workers == 1 or len(files) < 2:
+        results = map(_parse_file_star, jobs)
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker)
+        results = pool.map(_parse_file_star, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+    try:
+        for rec in results:
+            n_err += bool(rec.get('errors') or rec.get('error'))
+            n_ll += rec.get('mode') == 'LL'
+            out.write(json.dumps(rec, separators=(',', ':')) + '\n')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f'{len(files)} files, {n_err} with errors, {n_ll} needed LL, {time.perf_counter() - t0:.3f} s',
+          file=sys.stderr)
+    return n_err
+
 if __name__ == "__main__":
-    file_path = sys.argv[1] if len(sys.argv) > 1 else "tests.sql"
-    main(file_path)
+    ap = argparse.ArgumentParser(description='ANTLR driver for the CRUD grammar (punto 2)')
+    ap.add_argument('paths', nargs='*', default=['tests.sql'])
+    ap.add_argument('--batch', action='store_true', help='parse many files/directories, JSON lines output')
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--no-ast', action='store_true', help='only diagnostics and timings')
+    ap.add_argument('--pattern', default='*.sql', help='file name pattern inside directories')
+    ap.add_argument('--out', default=None, help='JSON lines output file (default stdout)')
+    args = ap.parse_args()
+    if not args.batch:
+        main(args.paths[0])
+    else:
+        out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+        try:
+            failed = run_batch(args.paths, args.workers, not args.no_ast, args.pattern, out)
+        finally:
+            if args.out:
+                out.close()
+        sys.exit(1 if failed else 0)
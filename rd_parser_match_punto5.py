@@ -5,12 +5,31 @@
 # Funcionalidades:
 # - función match(expected) que consume tokens o registra error y trata de recuperarse.
 # - recuperación por pánico: al encontrar un error, el parser salta tokens hasta encontrar uno en el conjunto de sincronización.
-# - reportes de errores con posición y mensaje claro.
+# - errores como registros Diagnostic (código, offset, esperados, encontrado) en un DiagnosticCollector
+#   (diagnostics.py): no se imprime nada al parsear; línea/columna y mensajes se arman al final con
+#   p.errors.render(texto). RDParserMatch(tokens, max_errors=N, on_limit='stop'|'skip') limita los errores.
+# - tokenize_stream(fuente): lexer por bloques con memoria acotada para scripts muy grandes.
+# - Fuentes de tokenize_stream, iter_statements e iter_insert_rows, con una sola regla: solo un objeto
+#   os.PathLike (pathlib.Path, ...) es una ruta; str y bytes son siempre el texto SQL; también se aceptan
+#   un mmap o un archivo abierto (binario o de texto).
+# - tokenize_buffer(s): tokens compactos (TokenBuffer) que RDParserMatch consume directamente; los arma el
+#   lexer DFA generado desde TOKEN_SPEC (dfa_lexer.py); tokenize_buffer_re(s) es la versión con MASTER_RE.
+# - iter_statements(fuente): genera (ast, errores) sentencia a sentencia sin guardar todo el script.
+# - RDParserMatch(tokens, iterative_expr=True): expresiones y condiciones WHERE sin recursión (precedencia
+#   de operadores con pila).
+# - parse_program_parallel(s): divide el script en ';' de nivel superior y parsea por rangos en varios procesos.
+# - INSERT con varias filas (VALUES (...), (...)) -> ('insert_many', tabla, columnas, filas); para cargas
+#   masivas iter_insert_rows(fuente) entrega fila por fila tuplas de valores de Python, sin AST.
 # - ejemplos de uso en __main__ con sentencias válidas e inválidas.
 
-import re
+import re, os, mmap, sys
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
 
+from token_buffer import TokenBuffer
+from diagnostics import DiagnosticCollector, ErrorBudgetExceeded, LexError
+from dfa_lexer import DFALexer
+
 # Tokenizer (similar al usado en Punto 1)
 TOKEN_SPEC = [
     ('NUMBER',   r'\d+'),
@@ -28,6 +47,7 @@ TOKEN_SPEC = [
     ('GT',       r'>'),
     ('ASSIGN',   r'='),
     ('PLUS',     r'\+'),
+    ('COMMENT',  r'--[^\n]*'),
     ('MINUS',    r'-'),
     ('TIMES',    r'\*'),
     ('DIV',      r'/'),
@@ -39,6 +59,8 @@ TOKEN_SPEC = [
 
 MASTER_RE = re.compile('|'.join('(?P<%s>%s)' % pair for pair in TOKEN_SPEC), re.DOTALL | re.IGNORECASE)
 
+SKIP = ('WS', 'COMMENT')
+
 KEYWORDS = {'CREATE','TABLE','INSERT','INTO','VALUES','SELECT','FROM','WHERE','UPDATE','SET','DELETE','AS','TRUE','FALSE','NULL','INT','VARCHAR','TEXT','BOOLEAN','AND','OR'}
 
 class Token:
@@ -49,64 +71,244 @@ class Token:
     def __repr__(self):
         return f"Token({self.type},{self.value!r},{self.pos})"
 
-def tokenize(s):
+def tokenize(s, base=0):
+    # base: absolute offset of s inside a larger script (positions are reported as base + offset)
     for m in MASTER_RE.finditer(s):
         kind = m.lastgroup
         val = m.group()
-        if kind == 'WS': continue
+        if kind in SKIP: continue
         if kind == 'ID':
             up = val.upper()
             if up in KEYWORDS:
-                yield Token(up, up, m.start())
+                yield Token(up, up, base + m.start())
             else:
-                yield Token('ID', val, m.start())
+                yield Token('ID', val, base + m.start())
         elif kind == 'MISMATCH':
-            raise SyntaxError(f'Unexpected character {val!r} at {m.start()}')
+            raise LexError(val, base + m.start())
+        else:
+            yield Token(kind, val, base + m.start())
+    yield Token('EOF','', base + len(s))
+
+# Integer token kinds (the parser works on these instead of type strings)
+TOKEN_NAMES = ['EOF'] + [name for name, _ in TOKEN_SPEC if name not in SKIP and name != 'MISMATCH'] + sorted(KEYWORDS)
+KIND = {name: k for k, name in enumerate(TOKEN_NAMES)}
+KEYWORD_KIND = {kw: KIND[kw] for kw in KEYWORDS}
+
+(K_EOF, K_NUMBER, K_STRING, K_COMMA, K_SEMI, K_LPAREN, K_RPAREN, K_STAR, K_DOT, K_ID, K_ASSIGN,
+ K_PLUS, K_MINUS, K_TIMES, K_DIV, K_CREATE, K_TABLE, K_INSERT, K_INTO, K_VALUES, K_SELECT, K_FROM,
+ K_WHERE, K_UPDATE, K_SET, K_DELETE, K_AS, K_VARCHAR, K_AND, K_OR) = (KIND[name] for name in (
+    'EOF', 'NUMBER', 'STRING', 'COMMA', 'SEMI', 'LPAREN', 'RPAREN', 'STAR', 'DOT', 'ID', 'ASSIGN',
+    'PLUS', 'MINUS', 'TIMES', 'DIV', 'CREATE', 'TABLE', 'INSERT', 'INTO', 'VALUES', 'SELECT', 'FROM',
+    'WHERE', 'UPDATE', 'SET', 'DELETE', 'AS', 'VARCHAR', 'AND', 'OR'))
+
+def _mask(*names):
+    m = 0
+    for name in names:
+        m |= 1 << KIND[name]
+    return m
+
+B_EOF = 1 << K_EOF
+M_STMT_SYNC = _mask('SEMI', 'EOF')
+M_EXPR_SYNC = _mask('SEMI', 'COMMA', 'RPAREN')
+# tokens consumed by expression error recovery; a ';' stops it (M_EXPR_SYNC) but is left for
+# parse_terminated_stmt, so an error never spills into the next statement
+E_EXPR_SYNC = (K_COMMA, K_RPAREN)
+M_SIMPLE_TYPE = _mask('INT', 'TEXT', 'BOOLEAN')
+M_CONST = _mask('TRUE', 'FALSE', 'NULL')
+M_ADDOP = _mask('PLUS', 'MINUS')
+M_MULOP = _mask('TIMES', 'DIV')
+M_COMPARE = _mask('EQ', 'NEQ', 'LT', 'LE', 'GT', 'GE', 'ASSIGN')
+
+def tokenize_buffer_re(s):
+    # same tokens as tokenize(), stored as a TokenBuffer (kinds + offsets, no Token objects)
+    buf = TokenBuffer(s, TOKEN_NAMES, KEYWORD_KIND.values(), Token)
+    kinds, starts, ends = buf.kinds.append, buf.starts.append, buf.ends.append
+    kw = KEYWORD_KIND.get
+    for m in MASTER_RE.finditer(s):
+        kind = m.lastgroup
+        if kind in SKIP: continue
+        if kind == 'ID':
+            k = kw(m.group().upper(), K_ID)
+        elif kind == 'MISMATCH':
+            raise LexError(m.group(), m.start())
+        else:
+            k = KIND[kind]
+        kinds(k); starts(m.start()); ends(m.end())
+    kinds(K_EOF); starts(len(s)); ends(len(s))
+    return buf
+
+# The same table compiled to a DFA (dfa_lexer.py): one pass, keywords recognized by the automaton.
+DFA_LEXER = DFALexer(TOKEN_SPEC, TOKEN_NAMES, KEYWORDS, SKIP, flags=re.DOTALL | re.IGNORECASE, token_cls=Token)
+
+def tokenize_buffer(s):
+    # same TokenBuffer as tokenize_buffer_re(s)
+    return DFA_LEXER.tokenize(s)
+
+# Streaming tokenizer: scans SQL text (str or bytes), a PathLike path, a binary/text file object or
+# an mmap in fixed-size chunks (a str is never a file name, as in iter_statements and iter_insert_rows).
+# Positions are absolute byte offsets. A match that touches the end of the buffer (or an
+# unterminated quote) may continue in the next chunk, so it is carried over instead of emitted.
+MASTER_RE_BYTES = re.compile('|'.join('(?P<%s>%s)' % pair for pair in TOKEN_SPEC).encode('ascii'), re.DOTALL | re.IGNORECASE)
+
+CHUNK_SIZE = 1 << 16
+
+def _read_chunks(source, chunk_size):
+    if hasattr(source, '__fspath__'):
+        with open(source, 'rb') as f:
+            yield from _read_chunks(f, chunk_size)
+        return
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, (bytes, mmap.mmap)):
+        for off in range(0, len(source), chunk_size):
+            yield source[off:off+chunk_size]
+        return
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        yield data
+
+def tokenize_stream(source, chunk_size=CHUNK_SIZE):
+    base = 0      # absolute offset of buf[0]
+    buf = b''
+    chunks = _read_chunks(source, chunk_size)
+    eof = False
+    while not eof:
+        data = next(chunks, None)
+        if data is None:
+            eof = True
         else:
-            yield Token(kind, val, m.start())
-    yield Token('EOF','', len(s))
+            buf += data
+        cut = len(buf)
+        for m in MASTER_RE_BYTES.finditer(buf):
+            kind = m.lastgroup
+            # an unmatched byte may be an unterminated quote or the start of a multi-byte character
+            if not eof and (m.end() == len(buf) or (kind == 'MISMATCH' and (m.group() == b"'" or m.end() + 3 > len(buf)))):
+                cut = m.start()
+                break
+            if kind in SKIP: continue
+            if kind == 'MISMATCH':
+                # a single byte: report the character it starts, or U+FFFD if it is not UTF-8
+                raise LexError(buf[m.start():m.start() + 4].decode('utf-8', 'replace')[0], base + m.start())
+            try:
+                val = m.group().decode('utf-8')
+            except UnicodeDecodeError as e:
+                # only a STRING can hold non-ASCII bytes
+                raise LexError('\ufffd', base + m.start() + e.start) from None
+            if kind == 'ID':
+                up = val.upper()
+                if up in KEYWORDS:
+                    yield Token(up, up, base + m.start())
+                else:
+                    yield Token('ID', val, base + m.start())
+            else:
+                yield Token(kind, val, base + m.start())
+        base += cut
+        buf = buf[cut:]
+    yield Token('EOF','', base)
 
 # Parser with match() and panic-mode recovery
+# Tokens are pulled lazily from the iterator: only the current token and the last consumed
+# one (self.prev) are kept, so memory does not grow with the size of the script.
+# Token types are handled as integer kinds (self.kind) and sets of types as bitmasks; the
+# parser also consumes a TokenBuffer directly, slicing values from the source only on demand.
 class RDParserMatch:
-    def __init__(self, tokens):
-        self.tokens = list(tokens)
+    def __init__(self, tokens, iterative_expr=False, max_errors=None, on_limit='stop', diagnostics=None):
         self.i = 0
-        self.curr = self.tokens[self.i]
-        self.errors = []
+        if diagnostics is None:
+            diagnostics = DiagnosticCollector(max_errors, on_limit)
+        self.errors = diagnostics
+        self.iterative_expr = iterative_expr
+        if isinstance(tokens, TokenBuffer):
+            self.buf = tokens
+            if diagnostics.source is None:
+                diagnostics.source = tokens.src
+            self.kinds = tokens.kinds
+            self.last = len(tokens.kinds) - 1
+            self.j = self.pj = 0
+            self.kind = self.kinds[0] if self.last >= 0 else K_EOF
+            self.next = self._next_buf
+        else:
+            self.buf = None
+            self.tokens = iter(tokens)
+            self.ptok = None
+            self.tok = next(self.tokens, None) or Token('EOF','', 0)
+            self.kind = KIND[self.tok.type]
 
     def next(self):
         self.i += 1
-        if self.i < len(self.tokens):
-            self.curr = self.tokens[self.i]
+        self.ptok = self.tok
+        tok = next(self.tokens, None)
+        if tok is not None:
+            self.tok = tok
+            self.kind = KIND[tok.type]
         else:
-            self.curr = Token('EOF','', self.curr.pos if self.curr else 0)
+            self.tok = Token('EOF','', self.tok.pos if self.tok else 0)
+            self.kind = K_EOF
+
+    def _next_buf(self):
+        self.i += 1
+        self.pj = self.j
+        if self.j < self.last:
+            self.j += 1
+            self.kind = self.kinds[self.j]
+
+    # Token views (debugging, error messages)
+    @property
+    def curr(self):
+        return self.tok if self.buf is None else self.buf.token(self.j)
+
+    @property
+    def prev(self):
+        return self.ptok if self.buf is None else self.buf.token(self.pj)
 
-    def error(self, message):
-        msg = f"Error at pos {self.curr.pos}: {message} (got {self.curr.type}:'{self.curr.value}')"
-        self.errors.append(msg)
-        print(msg)
+    def value(self):
+        return self.tok.value if self.buf is None else self.buf.value(self.j)
+
+    def prev_value(self):
+        return self.ptok.value if self.buf is None else self.buf.value(self.pj)
+
+    def error(self, code, expected=(), detail=''):
+        # records a Diagnostic; raises ErrorBudgetExceeded once the collector's budget is used up
+        if self.buf is None:
+            tok = self.tok
+            self.errors.add(code, tok.pos, expected, tok.type, tok.value, detail)
+        else:
+            j = self.j
+            self.errors.add(code, self.buf.starts[j], expected, TOKEN_NAMES[self.kind], self.buf.value(j), detail)
 
     def match(self, expected, sync_set=None):
         """Consume token if it matches expected. If not, report error and attempt recovery.
-        expected: token type string or tuple/list of acceptable token types.
-        sync_set: optional set of token types used for synchronization during panic-mode recovery.
+        expected: token kind or tuple of acceptable token kinds (type names are accepted too).
+        sync_set: optional bitmask (or set of type names) used for synchronization during panic-mode recovery.
         Returns True if matched, False if not (after recovery may have skipped tokens to sync point).
         """
-        if isinstance(expected, str):
+        if isinstance(expected, int):
             expected = (expected,)
-        if self.curr.type in expected:
+        elif isinstance(expected, str):
+            expected = (KIND[expected],)
+        elif expected and isinstance(expected[0], str):
+            expected = tuple(KIND[t] for t in expected)
+        if self.kind in expected:
             self.next()
             return True
         # mismatch: report error
-        self.error(f"Expected {'/'.join(expected)}") 
+        self.error('expected', tuple(TOKEN_NAMES[k] for k in expected))
         # panic-mode recovery: skip until we find a token in sync_set or one of expected
         if sync_set is None:
-            sync_set = {'SEMI', 'EOF'}  # default sync: end of statement
+            sync_set = M_STMT_SYNC  # default sync: end of statement
+        elif not isinstance(sync_set, int):
+            sync_set = _mask(*sync_set)
+        # never skip past EOF, even if the caller's sync set does not mention it
+        sync_set |= B_EOF
         # also accept expected tokens if they appear later
-        while self.curr.type not in sync_set and self.curr.type not in expected:
+        while not (1 << self.kind) & sync_set and self.kind not in expected:
             self.next()
         # if found expected, consume it and continue
-        if self.curr.type in expected:
+        if self.kind in expected:
             self.next()
             return True
         # otherwise, we stopped at a sync token (e.g., SEMI) and return False
@@ -115,166 +317,238 @@ class RDParserMatch:
     # Example: parse simple statement list with synchronization sets
     def parse_program(self):
         stmts = []
-        while self.curr.type != 'EOF':
-            stm = self.parse_stmt()
-            stmts.append(stm)
-            # ensure statement ends with SEMI; if not present, try to sync and skip to next
-            if self.curr.type == 'SEMI':
-                self.match('SEMI')
-            else:
-                # attempt to sync at SEMI or EOF
-                self.match(('SEMI',), sync_set={'SEMI','EOF'})
+        try:
+            while self.kind != K_EOF:
+                stmts.append(self.parse_terminated_stmt())
+        except ErrorBudgetExceeded:
+            pass    # on_limit='stop': keep what was parsed so far
         return stmts
 
+    def parse_terminated_stmt(self):
+        try:
+            stm = self.parse_stmt()
+        except ErrorBudgetExceeded:
+            if self.errors.on_limit != 'skip':
+                raise
+            self.skip_statement()
+            return ('error_stmt',)
+        # ensure statement ends with SEMI; if not present, try to sync and skip to next
+        if self.kind == K_SEMI:
+            self.match(K_SEMI)
+            return stm
+        try:
+            # attempt to sync at SEMI or EOF
+            self.match(K_SEMI, sync_set=M_STMT_SYNC)
+        except ErrorBudgetExceeded:
+            if self.errors.on_limit != 'skip':
+                raise
+            self.skip_statement()   # the same recovery, without recording the error
+        return stm
+
+    def sync_to(self, sync_set):
+        # skip tokens up to (not past) one in sync_set; EOF always stops
+        sync_set |= B_EOF
+        while not (1 << self.kind) & sync_set:
+            self.next()
+
+    def skip_statement(self):
+        # fast skip past the next SEMI without recording anything (error budget used up)
+        if self.buf is not None:
+            try:
+                j = self.kinds.index(K_SEMI, self.j)
+            except ValueError:
+                j = self.last
+            self.i += j - self.j
+            self.pj, self.j, self.kind = max(j - 1, 0), j, self.kinds[j]
+        else:
+            while self.kind != K_SEMI and self.kind != K_EOF:
+                self.next()
+        if self.kind == K_SEMI:
+            self.next()
+
+    def iter_statements(self):
+        """Yield (ast, errors) for each statement as soon as its SEMI is consumed.
+        Errors are handed over with the statement and not kept, so memory stays flat.
+        """
+        while self.kind != K_EOF:
+            try:
+                stm = self.parse_terminated_stmt()
+            except ErrorBudgetExceeded:
+                break
+            yield stm, self.errors.take()
+
     def parse_stmt(self):
         # sync sets for statements: if error inside, skip to next SEMI to continue parsing
-        sync = {'SEMI','EOF'}
-        if self.curr.type == 'CREATE':
+        sync = M_STMT_SYNC
+        k = self.kind
+        if k == K_CREATE:
             return self.parse_create(sync)
-        if self.curr.type == 'INSERT':
+        if k == K_INSERT:
             return self.parse_insert(sync)
-        if self.curr.type == 'SELECT':
+        if k == K_SELECT:
             return self.parse_select(sync)
-        if self.curr.type == 'UPDATE':
+        if k == K_UPDATE:
             return self.parse_update(sync)
-        if self.curr.type == 'DELETE':
+        if k == K_DELETE:
             return self.parse_delete(sync)
-        # unknown start -> skip to next semicolon
-        self.error('Unexpected start of statement')
-        self.match(('SEMI',), sync_set=sync)
+        # unknown start -> skip up to the next semicolon and leave it to parse_terminated_stmt, so
+        # the following statement is never swallowed
+        self.error('stmt_start')
+        self.sync_to(sync)
         return ('error_stmt',)
 
     def parse_create(self, sync):
-        self.match('CREATE', sync_set=sync)
-        self.match('TABLE', sync_set=sync)
+        self.match(K_CREATE, sync_set=sync)
+        self.match(K_TABLE, sync_set=sync)
         tbl = None
-        if self.match('ID', sync_set=sync):
-            tbl = self.tokens[self.i-1].value
+        if self.match(K_ID, sync_set=sync):
+            tbl = self.prev_value()
         else:
             # failed to get table name; sync will skip to SEMI likely
             return ('create', None, [])
-        if not self.match('LPAREN', sync_set=sync):
+        if not self.match(K_LPAREN, sync_set=sync):
             return ('create', tbl, [])
         cols = []
         # parse column list with recovery on commas
         while True:
-            if self.match('ID', sync_set=sync):
-                col = self.tokens[self.i-1].value
+            if self.match(K_ID, sync_set=sync):
+                col = self.prev_value()
                 # expect type
-                if self.curr.type in ('INT','TEXT','BOOLEAN'):
-                    t = self.curr.type; self.next()
-                elif self.curr.type == 'VARCHAR':
-                    self.next(); self.match('LPAREN', sync_set=sync)
-                    if self.match('NUMBER', sync_set=sync):
-                        num = self.tokens[self.i-1].value
-                        self.match('RPAREN', sync_set=sync)
+                if (1 << self.kind) & M_SIMPLE_TYPE:
+                    t = TOKEN_NAMES[self.kind]; self.next()
+                elif self.kind == K_VARCHAR:
+                    self.next(); self.match(K_LPAREN, sync_set=sync)
+                    if self.match(K_NUMBER, sync_set=sync):
+                        num = self.prev_value()
+                        self.match(K_RPAREN, sync_set=sync)
                         t = f'VARCHAR({num})'
                     else:
                         t = 'VARCHAR(?)'
                 else:
                     # missing type, report and continue
-                    self.error(f'Missing type for column {col}')
+                    self.error('column_type', detail=col)
                     t = 'UNKNOWN'
                 cols.append((col, t))
             else:
                 break
-            if self.curr.type == 'COMMA':
+            if self.kind == K_COMMA:
                 self.next(); continue
             else:
                 break
-        if not self.match('RPAREN', sync_set=sync):
+        if not self.match(K_RPAREN, sync_set=sync):
             # attempt to recover but continue
             pass
         return ('create', tbl, cols)
 
     def parse_insert(self, sync):
-        self.match('INSERT', sync_set=sync); self.match('INTO', sync_set=sync)
+        self.match(K_INSERT, sync_set=sync); self.match(K_INTO, sync_set=sync)
         tbl = None
-        if self.match('ID', sync_set=sync):
-            tbl = self.tokens[self.i-1].value
+        if self.match(K_ID, sync_set=sync):
+            tbl = self.prev_value()
         else:
             return ('insert', None, [], [])
-        if not self.match('LPAREN', sync_set=sync):
+        if not self.match(K_LPAREN, sync_set=sync):
             return ('insert', tbl, [], [])
         ids = []
         while True:
-            if self.match('ID', sync_set=sync):
-                ids.append(self.tokens[self.i-1].value)
+            if self.match(K_ID, sync_set=sync):
+                ids.append(self.prev_value())
             else:
                 break
-            if self.curr.type == 'COMMA':
+            if self.kind == K_COMMA:
                 self.next(); continue
             else:
                 break
-        self.match('RPAREN', sync_set=sync)
-        self.match('VALUES', sync_set=sync)
-        self.match('LPAREN', sync_set=sync)
+        self.match(K_RPAREN, sync_set=sync)
+        self.match(K_VALUES, sync_set=sync)
+        rows = [self.parse_values_row(sync)]
+        while self.kind == K_COMMA:
+            self.next()
+            rows.append(self.parse_values_row(sync))
+        if len(rows) == 1:
+            return ('insert', tbl, ids, rows[0])
+        return ('insert_many', tbl, ids, rows)
+
+    def parse_values_row(self, sync):
+        # one '(' literal, ... ')' tuple of a VALUES list
+        self.match(K_LPAREN, sync_set=sync)
         vals = []
         while True:
-            if self.curr.type == 'NUMBER':
-                vals.append(('num', self.curr.value)); self.next()
-            elif self.curr.type == 'STRING':
-                vals.append(('str', self.curr.value)); self.next()
-            elif self.curr.type in ('TRUE','FALSE','NULL'):
-                vals.append((self.curr.type.lower(), self.curr.value)); self.next()
+            lit = self.parse_literal()
+            if lit is not None:
+                vals.append(lit)
             else:
                 # unexpected literal; attempt to recover by skipping to comma or RPAREN
-                self.error('Expected literal in VALUES list')
-                self.match(('COMMA','RPAREN'), sync_set=sync)
-                if self.curr.type == 'COMMA':
+                self.error('literal')
+                self.match((K_COMMA, K_RPAREN), sync_set=sync)
+                if self.kind == K_COMMA:
                     self.next(); continue
                 else:
                     break
-            if self.curr.type == 'COMMA':
+            if self.kind == K_COMMA:
                 self.next(); continue
             else:
                 break
-        self.match('RPAREN', sync_set=sync)
-        return ('insert', tbl, ids, vals)
+        self.match(K_RPAREN, sync_set=sync)
+        return vals
+
+    def parse_literal(self):
+        # NUMBER, STRING, TRUE/FALSE/NULL -> leaf node; None (nothing consumed) for any other token
+        k = self.kind
+        if k == K_NUMBER:
+            lit = ('num', self.value())
+        elif k == K_STRING:
+            lit = ('str', self.value())
+        elif (1 << k) & M_CONST:
+            lit = (TOKEN_NAMES[k].lower(), self.value())
+        else:
+            return None
+        self.next()
+        return lit
 
     def parse_select(self, sync):
-        self.match('SELECT', sync_set=sync)
+        self.match(K_SELECT, sync_set=sync)
         # select list
         items = []
-        if self.curr.type == 'STAR':
+        if self.kind == K_STAR:
             self.next(); items = ['*']
         else:
             while True:
-                if self.match('ID', sync_set=sync):
-                    name = self.tokens[self.i-1].value
-                    if self.curr.type == 'DOT':
-                        self.next(); self.match('ID', sync_set=sync); name += '.' + self.tokens[self.i-1].value
-                    if self.curr.type == 'AS':
-                        self.next(); self.match('ID', sync_set=sync); name = (name, self.tokens[self.i-1].value)
+                if self.match(K_ID, sync_set=sync):
+                    name = self.prev_value()
+                    if self.kind == K_DOT:
+                        self.next(); self.match(K_ID, sync_set=sync); name += '.' + self.prev_value()
+                    if self.kind == K_AS:
+                        self.next(); self.match(K_ID, sync_set=sync); name = (name, self.prev_value())
                     items.append(name)
                 else:
                     # try to parse expression as fallback (not implemented fully here)
                     break
-                if self.curr.type == 'COMMA':
+                if self.kind == K_COMMA:
                     self.next(); continue
                 else:
                     break
-        self.match('FROM', sync_set=sync)
+        self.match(K_FROM, sync_set=sync)
         tbl = None
-        if self.match('ID', sync_set=sync):
-            tbl = self.tokens[self.i-1].value
+        if self.match(K_ID, sync_set=sync):
+            tbl = self.prev_value()
         where = None
-        if self.curr.type == 'WHERE':
+        if self.kind == K_WHERE:
             self.next()
             where = self.parse_cond_expr(sync)
         return ('select', items, tbl, where)
 
     def parse_update(self, sync):
-        self.match('UPDATE', sync_set=sync)
+        self.match(K_UPDATE, sync_set=sync)
         tbl = None
-        if self.match('ID', sync_set=sync):
-            tbl = self.tokens[self.i-1].value
-        self.match('SET', sync_set=sync)
+        if self.match(K_ID, sync_set=sync):
+            tbl = self.prev_value()
+        self.match(K_SET, sync_set=sync)
         assigns = []
         while True:
-            if self.match('ID', sync_set=sync):
-                name = self.tokens[self.i-1].value
-                if self.match('ASSIGN', sync_set=sync):
+            if self.match(K_ID, sync_set=sync):
+                name = self.prev_value()
+                if self.match(K_ASSIGN, sync_set=sync):
                     expr = self.parse_expr_simple()
                     assigns.append((name, expr))
                 else:
@@ -282,73 +556,343 @@ class RDParserMatch:
                     break
             else:
                 break
-            if self.curr.type == 'COMMA':
+            if self.kind == K_COMMA:
                 self.next(); continue
             else:
                 break
         where = None
-        if self.curr.type == 'WHERE':
+        if self.kind == K_WHERE:
             self.next(); where = self.parse_cond_expr(sync)
         return ('update', tbl, assigns, where)
 
     def parse_delete(self, sync):
-        self.match('DELETE', sync_set=sync); self.match('FROM', sync_set=sync)
+        self.match(K_DELETE, sync_set=sync); self.match(K_FROM, sync_set=sync)
         tbl = None
-        if self.match('ID', sync_set=sync):
-            tbl = self.tokens[self.i-1].value
+        if self.match(K_ID, sync_set=sync):
+            tbl = self.prev_value()
         where = None
-        if self.curr.type == 'WHERE':
+        if self.kind == K_WHERE:
             self.next(); where = self.parse_cond_expr(sync)
         return ('delete', tbl, where)
 
     # expression helpers (simple)
     def parse_expr_simple(self):
+        if self.iterative_expr:
+            return self.parse_expr_iterative()
         return self.parse_expr_term()
     def parse_expr_term(self):
         node = self.parse_expr_factor()
-        while self.curr.type in ('PLUS','MINUS'):
-            op = self.curr.type; self.next(); rhs = self.parse_expr_factor(); node = (op, node, rhs)
+        while (1 << self.kind) & M_ADDOP:
+            op = TOKEN_NAMES[self.kind]; self.next(); rhs = self.parse_expr_factor(); node = (op, node, rhs)
         return node
     def parse_expr_factor(self):
         node = self.parse_expr_atom()
-        while self.curr.type in ('TIMES','DIV'):
-            op = self.curr.type; self.next(); rhs = self.parse_expr_atom(); node = (op, node, rhs)
+        while (1 << self.kind) & M_MULOP:
+            op = TOKEN_NAMES[self.kind]; self.next(); rhs = self.parse_expr_atom(); node = (op, node, rhs)
         return node
     def parse_expr_atom(self):
-        if self.curr.type == 'LPAREN':
-            self.match('LPAREN'); node = self.parse_expr_simple(); self.match('RPAREN'); return node
-        if self.curr.type == 'NUMBER':
-            v = self.curr.value; self.next(); return ('num', v)
-        if self.curr.type == 'STRING':
-            v = self.curr.value; self.next(); return ('str', v)
-        if self.curr.type == 'ID':
-            v = self.curr.value; self.next(); return ('id', v)
+        k = self.kind
+        if k == K_LPAREN:
+            self.match(K_LPAREN); node = self.parse_expr_simple(); self.match(K_RPAREN); return node
+        if k == K_NUMBER:
+            v = self.value(); self.next(); return ('num', v)
+        if k == K_STRING:
+            v = self.value(); self.next(); return ('str', v)
+        if k == K_ID:
+            v = self.value(); self.next(); return ('id', v)
         # error
-        self.error('Unexpected token in expression'); self.match(('SEMI','COMMA','RPAREN'), sync_set={'SEMI','COMMA','RPAREN'})
+        self.error('expr_token'); self.match(E_EXPR_SYNC, sync_set=M_EXPR_SYNC)
         return ('error_expr',)
 
+    # Iterative operator-precedence version of parse_expr_term/factor/atom: same AST, same errors
+    # and recovery, but parentheses use an explicit stack of frames, so deep nesting and long
+    # operator chains cost no Python recursion. Each frame keeps the left-associated sum built so
+    # far (with its pending +/- operator) and the product being built (with its pending *//).
+    def parse_expr_iterative(self):
+        frames = []
+        total = addop = prod = mulop = None
+        while True:
+            k = self.kind
+            if k == K_LPAREN:
+                self.match(K_LPAREN)
+                frames.append((total, addop, prod, mulop))
+                total = addop = prod = mulop = None
+                continue
+            if k == K_NUMBER:
+                atom = ('num', self.value()); self.next()
+            elif k == K_STRING:
+                atom = ('str', self.value()); self.next()
+            elif k == K_ID:
+                atom = ('id', self.value()); self.next()
+            else:
+                self.error('expr_token'); self.match(E_EXPR_SYNC, sync_set=M_EXPR_SYNC)
+                atom = ('error_expr',)
+            prod = atom if prod is None else (mulop, prod, atom)
+            while True:
+                if (1 << self.kind) & M_MULOP:
+                    mulop = TOKEN_NAMES[self.kind]; self.next()
+                    break
+                total = prod if total is None else (addop, total, prod)
+                prod = None
+                if (1 << self.kind) & M_ADDOP:
+                    addop = TOKEN_NAMES[self.kind]; self.next()
+                    break
+                if not frames:
+                    return total
+                node = total
+                self.match(K_RPAREN)
+                total, addop, prod, mulop = frames.pop()
+                prod = node if prod is None else (mulop, prod, node)
+
     # conditions (comparison + AND/OR)
     def parse_cond_expr(self, sync):
+        if self.iterative_expr:
+            return self.parse_cond_iterative(sync)
         left = self.parse_cond_term(sync)
-        while self.curr.type == 'OR':
+        while self.kind == K_OR:
             self.next(); right = self.parse_cond_term(sync); left = ('or', left, right)
         return left
     def parse_cond_term(self, sync):
         left = self.parse_cond_factor(sync)
-        while self.curr.type == 'AND':
+        while self.kind == K_AND:
             self.next(); right = self.parse_cond_factor(sync); left = ('and', left, right)
         return left
     def parse_cond_factor(self, sync):
-        if self.curr.type == 'LPAREN':
-            self.next(); node = self.parse_cond_expr(sync); self.match('RPAREN', sync_set=sync); return node
-        # comparison
+        if self.kind == K_LPAREN:
+            self.next(); node = self.parse_cond_expr(sync); self.match(K_RPAREN, sync_set=sync); return node
+        return self.parse_comparison(sync)
+    def parse_comparison(self, sync):
         l = self.parse_expr_simple()
-        if self.curr.type in ('EQ','NEQ','LT','LE','GT','GE','ASSIGN'):
-            op = self.curr.type; self.next(); r = self.parse_expr_simple(); return (op.lower(), l, r)
-        self.error('Expected comparison operator'); self.match(('SEMI','COMMA','RPAREN'), sync_set=sync); return ('error_cond',)
+        if (1 << self.kind) & M_COMPARE:
+            op = TOKEN_NAMES[self.kind]; self.next(); r = self.parse_expr_simple(); return (op.lower(), l, r)
+        self.error('comparison'); self.match(E_EXPR_SYNC, sync_set=sync); return ('error_cond',)
+
+    # Iterative version of parse_cond_expr/term/factor, like parse_expr_iterative: each '(' pushes
+    # the OR chain built so far and the AND chain being built.
+    def parse_cond_iterative(self, sync):
+        frames = []
+        total = prod = None
+        while True:
+            if self.kind == K_LPAREN:
+                self.next()
+                frames.append((total, prod))
+                total = prod = None
+                continue
+            node = self.parse_comparison(sync)
+            prod = node if prod is None else ('and', prod, node)
+            while True:
+                if self.kind == K_AND:
+                    self.next()
+                    break
+                total = prod if total is None else ('or', total, prod)
+                prod = None
+                if self.kind == K_OR:
+                    self.next()
+                    break
+                if not frames:
+                    return total
+                node = total
+                self.match(K_RPAREN, sync_set=sync)
+                total, prod = frames.pop()
+                prod = node if prod is None else ('and', prod, node)
+
+_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+
+def literal_value(node):
+    # Python value of a literal leaf: ('num','7') -> 7, ('str',"'a\'b'") -> "a'b", TRUE/FALSE/NULL
+    tag, text = node
+    if tag == 'num':
+        return int(text)
+    if tag == 'str':
+        return _ESCAPE_RE.sub(r'\1', text[1:-1])
+    if tag == 'true':
+        return True
+    if tag == 'false':
+        return False
+    if tag == 'null':
+        return None
+    raise ValueError(f'not a literal: {node!r}')
+
+# Bulk INSERT fast path: scans INSERT INTO t (cols) VALUES (...), (...), ...; statements with
+# regular expressions and yields each row as a tuple of Python values, without Tokens or AST.
+_W = r"(?:\s|--[^\n]*)*"
+_END = r"(?![A-Za-z0-9_])"
+_NAME = r"[A-Za-z_][A-Za-z0-9_]*"
+_LIT = r"(?:\d+|'(?:[^'\\]|\\.)*'|TRUE|FALSE|NULL)" + _END
+_INSERT_HEAD = (_W + r"INSERT" + _END + _W + r"INTO" + _END + _W + "(" + _NAME + ")" + _W + r"\(" + _W +
+                "(" + _NAME + "(?:" + _W + "," + _W + _NAME + ")*)" + _W + r"\)" + _W + r"VALUES" + _END + _W)
+_INSERT_ROW = r"\(" + _W + "(" + _LIT + "(?:" + _W + "," + _W + _LIT + ")*)" + _W + r"\)" + _W + r"([,;]?)" + _W
+_ROW_VALUE = r"--[^\n]*|(\d+)|'((?:[^'\\]|\\.)*)'|(TRUE|FALSE|NULL)"
+
+_STMT_END = r"'(?:[^'\\]|\\.)*'|--[^\n]*|;"
+
+def _bulk_patterns(binary):
+    enc = (lambda p: p.encode('ascii')) if binary else (lambda p: p)
+    flags = re.IGNORECASE | re.DOTALL
+    return (re.compile(enc(_INSERT_HEAD), flags), re.compile(enc(_INSERT_ROW), flags),
+            re.compile(enc(_ROW_VALUE), flags), re.compile(enc(_NAME)), re.compile(enc(r"--[^\n]*")),
+            re.compile(enc(_W)), re.compile(enc(_STMT_END), re.DOTALL))
+
+_BULK_STR = _bulk_patterns(False)
+_BULK_BYTES = _bulk_patterns(True)
+_BULK_CONST = {'TRUE': True, 'FALSE': False, 'NULL': None}
+
+def iter_insert_rows(source, chunk_size=CHUNK_SIZE):
+    """Yield (table, columns, row) for every row of a script made only of INSERT statements.
+    source: SQL text or bytes, an mmap, a PathLike path or a file object, as in iter_statements;
+    file objects are read chunk_size bytes at a time. Values come converted (int, str, bool or None).
+    Whatever RDParserMatch reports as an error (other statements, keywords as names, a missing ';')
+    raises SyntaxError with its position."""
+    if isinstance(source, str):
+        yield from _insert_rows(source, _BULK_STR)
+    elif isinstance(source, (bytes, mmap.mmap)):
+        yield from _insert_rows(source, _BULK_BYTES)
+    elif hasattr(source, 'read'):
+        yield from _insert_rows(b'', _BULK_BYTES, _read_chunks(source, chunk_size))
+    else:
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                yield from _insert_rows(m, _BULK_BYTES)
+
+def _settled(text, pos, m, end_re, quote, semi):
+    # True if more input cannot change the match m at pos (or its failure, m None): a match has to
+    # end two characters before the end of the buffer (a final '-' may open a comment), a failure
+    # needs the ';' closing the statement outside of any string
+    if m is not None:
+        return m.end() + 1 < len(text)
+    prev = pos
+    for e in end_re.finditer(text, pos):
+        if quote in text[prev:e.start()]:
+            return False    # unterminated string: that ';' may be inside it
+        if e.group() == semi:
+            return True
+        prev = e.end()
+    return False
+
+def _insert_rows(text, patterns, chunks=None):
+    # chunks: iterator over the rest of the script (None: text is all of it); consumed text is dropped
+    head_re, row_re, value_re, name_re, comment_re, ws_re, end_re = patterns
+    binary = not isinstance(text, str)
+    dec = (lambda b: b.decode('utf-8')) if binary else (lambda s: s)
+    comma, semi, quote = (b',', b';', b"'") if binary else (',', ';', "'")
+    esc = _ESCAPE_RE.sub
+    const = _BULK_CONST
+    base = pos = 0      # base: absolute offset of text[0]
+    eof = chunks is None
+    table = None        # None: at the start of a statement; else reading its rows
+    while True:
+        if table is None:
+            start = ws_re.match(text, pos).end()
+            m = head_re.match(text, start)
+        else:
+            start = pos
+            m = row_re.match(text, pos)
+        if not eof and (start >= len(text) or not _settled(text, start, m, end_re, quote, semi)):
+            data = next(chunks, None)
+            if data is None:
+                eof = True
+            else:
+                text = text[pos:] + data
+                base += pos
+                pos = 0
+            continue
+        if table is None:
+            if start >= len(text):
+                return
+            if m is None:
+                raise SyntaxError(f'Expected INSERT INTO <table> (<columns>) VALUES at {base + start}')
+            names = [dec(x) for x in [m.group(1)] + name_re.findall(comment_re.sub(text[:0], m.group(2)))]
+            for x in names:
+                if x.upper() in KEYWORDS:
+                    raise SyntaxError(f'Keyword {x} used as a name at {base + start}')
+            table, cols = names[0], tuple(names[1:])
+            pos = m.end()
+            continue
+        if m is None:
+            raise SyntaxError(f'Expected a VALUES row of literals at {base + pos}')
+        row = []
+        for v in value_re.finditer(m.group(1)):
+            g = v.lastindex
+            if g == 1:
+                row.append(int(v.group(1)))
+            elif g == 2:
+                v = dec(v.group(2))
+                row.append(esc(r'\1', v) if '\\' in v else v)
+            elif g == 3:
+                row.append(const[dec(v.group(3)).upper()])
+        yield table, cols, tuple(row)
+        pos = m.end()
+        sep = m.group(2)
+        if sep != comma:
+            if not sep:
+                raise SyntaxError(f'Expected , or ; after VALUES row at {base + pos}')
+            table = None
+
+def iter_statements(source):
+    """Stream (ast, errors) pairs from SQL text (str or bytes), a PathLike path, a file object, an
+    mmap, or an iterable of Tokens."""
+    if isinstance(source, str):
+        tokens = tokenize(source)
+    elif isinstance(source, (bytes, mmap.mmap)) or hasattr(source, '__fspath__') or hasattr(source, 'read'):
+        tokens = tokenize_stream(source)
+    else:
+        tokens = source
+    return RDParserMatch(tokens).iter_statements()
+
+# Parallel mode: split the script at top-level ';' (skipping quoted strings and -- comments),
+# parse contiguous ranges of statements in a process pool and merge results in source order.
+SPLIT_RE = re.compile(r"'([^'\\]|\\.)*'|--[^\n]*|;", re.DOTALL)
+
+PARALLEL_MIN_STATEMENTS = 2000   # below this the fork/pickle overhead costs more than it saves
+
+def split_statements(s):
+    # (start, end) spans covering s; every span but the last ends right after its ';'
+    spans = []
+    start = 0
+    for m in SPLIT_RE.finditer(s):
+        if m.end() - m.start() == 1 and s[m.start()] == ';':
+            spans.append((start, m.end()))
+            start = m.end()
+    if s[start:].strip():
+        spans.append((start, len(s)))
+    return spans
+
+def _parse_range(job):
+    text, base = job
+    p = RDParserMatch(tokenize(text, base))
+    stmts = p.parse_program()
+    return stmts, list(p.errors)
+
+def parse_program_parallel(s, workers=None, min_statements=PARALLEL_MIN_STATEMENTS, chunks_per_worker=4):
+    """Parse a whole script using a process pool. Returns (stmts, errors) in source order, errors as a
+    DiagnosticCollector over s; the same result as parse_program for any chunking (statements never
+    depend on each other: error recovery always stops at ';')."""
+    workers = workers or os.cpu_count() or 1
+    spans = split_statements(s)
+    errors = DiagnosticCollector(source=s)
+    if workers < 2 or len(spans) < min_statements:
+        stmts, er = _parse_range((s, 0))
+        errors.extend(er)
+        errors.total = len(errors)
+        return stmts, errors
+    step = -(-len(spans) // (workers * chunks_per_worker))
+    jobs = []
+    for i in range(0, len(spans), step):
+        a = spans[i][0]
+        b = spans[min(i + step, len(spans)) - 1][1]
+        jobs.append((s[a:b], a))
+    stmts = []
+    with ProcessPoolExecutor(workers) as ex:
+        for st, er in ex.map(_parse_range, jobs):
+            stmts.extend(st); errors.extend(er)
+    errors.total = len(errors)
+    return stmts, errors
 
 # Example usage
 if __name__ == '__main__':
+    from parse_profile import Profile, profile_arg, profile_rd
     code = """
     CREATE TABLE users (id INT, name VARCHAR(100), active BOOLEAN);
     INSERT INTO users (id, name, active) VALUES (1, 'Ana', TRUE);
@@ -361,9 +905,16 @@ if __name__ == '__main__':
     # strip comments
     lines = [ln.split('--')[0] for ln in code.splitlines()]
     code_clean = '\n'.join(lines)
+    dest = profile_arg(sys.argv[1:])
+    if dest:
+        # the same parse, instrumented; nothing but the JSON is printed so tools can read it
+        prof = Profile()
+        profile_rd(code_clean, prof)
+        prof.dump(dest)
+        sys.exit(0)
     tokens = list(tokenize(code_clean))
     print('TOKENS:', tokens)
     p = RDParserMatch(tokens)
     ast = p.parse_program()
     print('\nAST:') ; pprint(ast)
-    print('\nErrors:'); pprint(p.errors)
+    print('\nErrors:'); print(p.errors.render(code_clean))
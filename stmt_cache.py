@@ -0,0 +1,199 @@
+# stmt_cache.py
+# Caché de ASTs por "forma" de sentencia para el parser del punto 5 (RDParserMatch).
+#
+# - La huella de una sentencia es su texto con los literales (NUMBER, STRING, TRUE, FALSE, NULL)
+#   reemplazados por marcadores del tipo de literal y sin comentarios; se calcula con una sola
+#   expresión regular, sin tokenizar. Así "SELECT id FROM users WHERE id = 7;" y "... id = 8;"
+#   comparten huella.
+# - La primera vez se tokeniza y parsea normalmente y, si no hubo errores, se vuelve a parsear con
+#   marcadores (Slot) en lugar de los literales: el AST plantilla resultante se compila a una
+#   función que rearma el AST concreto con los valores nuevos, sin lexer ni descenso recursivo.
+#   La función es una secuencia plana de asignaciones (un temporal por nodo a rearmar), así la
+#   profundidad del AST no choca con los límites del compilador de Python.
+# - Las plantillas viven en un LRU acotado con contadores de aciertos, fallos y desalojos.
+# - Sentencias con errores, o cuyos literales no terminan como hojas del AST (p. ej. el tamaño de
+#   VARCHAR(100), que se formatea dentro de un texto), se parsean siempre de la forma normal.
+# - Como parse_program_parallel, cada sentencia se parsea sola (cortada en su ';'); como la
+#   recuperación de errores nunca cruza un ';', el resultado es el mismo que el de parse_program.
+
+import re
+from collections import OrderedDict
+
+from diagnostics import DiagnosticCollector
+from rd_parser_match_punto5 import RDParserMatch, Token, tokenize, tokenize_buffer, split_statements
+
+# comments are dropped from the fingerprint; group 1 = STRING, 2 = NUMBER, 3 = TRUE/FALSE/NULL
+LITERAL_RE = re.compile(r"--[^\n]*|('(?:[^'\\]|\\.)*')|\b(\d+)\b|\b(TRUE|FALSE|NULL)\b", re.DOTALL | re.IGNORECASE)
+
+_UNCACHEABLE = object()     # cached result for shapes that can not be templated
+
+class Slot:
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return f'Slot({self.index})'
+
+_LITERAL_TYPES = (str, int, float, bool, type(None))
+
+def _emit(ast):
+    # flat Python statements that rebuild ast, one temporary per rebuilt tuple or list (no nested
+    # expressions, so the depth of the AST does not matter), with every Slot k read from v[k].
+    # Subtrees without slots or lists are shared constants c[i]. Returns (lines, result, consts, used).
+    lines, consts, used = [], [], []
+
+    def const(x):
+        if type(x) in _LITERAL_TYPES:
+            return repr(x)
+        consts.append(x)
+        return f'c[{len(consts) - 1}]'
+
+    out = []                # (expression or None when the node is constant, node) per finished node
+    stack = [(ast, False)]
+    while stack:
+        node, done = stack.pop()
+        if isinstance(node, Slot):
+            used.append(node.index)
+            out.append((f'v[{node.index}]', node))
+        elif not isinstance(node, (tuple, list)):
+            out.append((None, node))
+        elif not done:
+            stack.append((node, True))
+            stack.extend((x, False) for x in reversed(node))
+        else:
+            items = out[len(out) - len(node):]
+            del out[len(out) - len(node):]
+            if isinstance(node, tuple) and all(e is None for e, _ in items):
+                out.append((None, node))
+                continue
+            exprs = ', '.join(const(x) if e is None else e for e, x in items)
+            name = f't{len(lines)}'
+            if isinstance(node, list):
+                lines.append(f'{name} = [{exprs}]')
+            else:
+                lines.append(f'{name} = ({exprs}{"," if len(node) == 1 else ""})')
+            out.append((name, node))
+    e, node = out[0]
+    return lines, const(node) if e is None else e, consts, used
+
+def compile_template(ast, n_slots):
+    """Return a function values -> concrete AST, or None if the slots do not map 1:1 to leaves
+    (or the template can not be compiled)."""
+    lines, result, consts, used = _emit(ast)
+    if sorted(used) != list(range(n_slots)):
+        return None
+    src = 'def fill(v):\n' + ''.join(f'    {line}\n' for line in lines) + f'    return {result}\n'
+    ns = {'c': consts}
+    try:
+        exec(compile(src, '<template>', 'exec'), ns)
+    except (SyntaxError, MemoryError, RecursionError):
+        return None
+    return ns['fill']
+
+class StatementCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.templates = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.templates), 'maxsize': self.maxsize}
+
+    def clear(self):
+        self.templates.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def _store(self, key, filler):
+        self.templates[key] = filler
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+            self.evictions += 1
+
+    def fingerprint(self, text):
+        # (key, literal values, literal offsets inside text)
+        parts, values, offsets = [], [], []
+        pos = 0
+        for m in LITERAL_RE.finditer(text):
+            parts.append(text[pos:m.start()])
+            pos = m.end()
+            g = m.lastindex
+            if g is None:
+                continue
+            v = m.group(g)
+            if g == 3:
+                v = v.upper()
+                parts.append(v)
+            else:
+                parts.append(g)
+            values.append(v)
+            offsets.append(m.start())
+        parts.append(text[pos:])
+        return tuple(parts), values, offsets
+
+    def parse_stmt(self, text, base=0):
+        """Parse one ';'-terminated statement (text starts at offset base of the script).
+        Returns (stmts, errors): normally one AST, none for blank text."""
+        key, values, offsets = self.fingerprint(text)
+        filler = self.templates.get(key)
+        if filler is not None and filler is not _UNCACHEABLE:
+            self.templates.move_to_end(key)
+            self.hits += 1
+            return [filler(values)], []
+        self.misses += 1
+        tokens = list(tokenize(text, base))
+        p = RDParserMatch(tokens)
+        stmts = p.parse_program()
+        if filler is None:
+            ok = len(stmts) == 1 and not p.errors
+            self._store(key, self._template(tokens, [base + o for o in offsets]) if ok else _UNCACHEABLE)
+        return stmts, p.errors
+
+    def _template(self, tokens, offsets):
+        # parse the statement again with Slot markers as literal values; every literal found by
+        # the fingerprint must be a literal token, or the template could fill the wrong leaf
+        slot_of = {pos: Slot(n) for n, pos in enumerate(offsets)}
+        toks = []
+        for t in tokens:
+            slot = slot_of.pop(t.pos, None)
+            if slot is not None:
+                if t.type not in ('STRING', 'NUMBER', 'TRUE', 'FALSE', 'NULL'):
+                    return _UNCACHEABLE
+                t = Token(t.type, slot, t.pos)
+            toks.append(t)
+        if slot_of:
+            return _UNCACHEABLE
+        p = RDParserMatch(toks)
+        ast = p.parse_terminated_stmt()
+        if p.errors:
+            return _UNCACHEABLE
+        return compile_template(ast, len(offsets)) or _UNCACHEABLE
+
+    def parse_program(self, s):
+        """Parse a whole script statement by statement through the cache. Returns (stmts, errors),
+        errors as a DiagnosticCollector over s like RDParserMatch.parse_program leaves in p.errors."""
+        stmts, errors = [], DiagnosticCollector(source=s)
+        for a, b in split_statements(s):
+            st, err = self.parse_stmt(s[a:b], a)
+            stmts.extend(st)
+            errors.extend(err)
+        errors.total = len(errors)
+        return stmts, errors
+
+_default_cache = StatementCache()
+
+def parse_program_cached(s, cache=None):
+    return (cache or _default_cache).parse_program(s)
+
+if __name__ == '__main__':
+    import time
+    rows = ''.join(f"INSERT INTO users (id, name, active) VALUES ({k}, 'user{k}', {'TRUE' if k % 2 else 'FALSE'});\n"
+                   f"SELECT id, name FROM users WHERE id = {k};\n"
+                   f"UPDATE users SET name = 'x{k}' WHERE id = {k} + 1;\n" for k in range(20000))
+    t0 = time.perf_counter(); p = RDParserMatch(tokenize_buffer(rows)); plain = p.parse_program(); t1 = time.perf_counter()
+    cache = StatementCache(maxsize=64)
+    cached, errors = cache.parse_program(rows); t2 = time.perf_counter()
+    print('plain:', round(t1 - t0, 3), 's  cached:', round(t2 - t1, 3), 's  same:', plain == cached and p.errors == errors)
+    print(cache.stats())
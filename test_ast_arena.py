@@ -0,0 +1,77 @@
+import pytest
+
+import codigo_del_3 as ll1
+import rd_parser_match_punto5 as rd
+from ast_arena import ArenaVisitor, parse_expression_arena, parse_program_arena
+
+STATEMENTS = [
+    "CREATE TABLE users (id INT, name VARCHAR(100), active BOOLEAN)",
+    "INSERT INTO users (id, name, active) VALUES (1, 'Ana', TRUE), (2, 'it\\'s', NULL)",
+    "INSERT INTO users (id) VALUES (3)",
+    "SELECT id, users.name AS n FROM users WHERE active = TRUE AND (id > 1 + 2 * x OR name != 'Bo')",
+    "UPDATE users SET name = 'x', id = (id - 1) / 2 WHERE id = 2",
+    "DELETE FROM users",
+]
+ERRORS = "UPDATE users SET = 'x' WHERE id = 2;\nFOO bar;\nSELECT FROM WHERE;\nINSERT INTO t VALUES (1, +);\nDELETE t"
+
+
+def plain(text, **kw):
+    p = rd.RDParserMatch(rd.tokenize_buffer(text), **kw)
+    return p.parse_program(), list(p.errors)
+
+
+@pytest.mark.parametrize('text', [';\n'.join(STATEMENTS) + ';', ERRORS, ERRORS + ';' + ';\n'.join(STATEMENTS), ''])
+def test_rd_round_trip(text):
+    arena, errors = parse_program_arena(text)
+    stmts, plain_errors = plain(text)
+    assert list(arena) == stmts
+    assert arena[1:3] == stmts[1:3]
+    assert list(errors) == plain_errors
+
+
+def test_rd_round_trip_with_an_error_budget():
+    text = ERRORS + ';' + ';\n'.join(STATEMENTS) + ';'
+    arena, errors = parse_program_arena(text, max_errors=2, on_limit='skip')
+    stmts, plain_errors = plain(text, max_errors=2, on_limit='skip')
+    assert list(arena) == stmts and ('error_stmt',) in stmts
+    assert list(errors) == plain_errors
+
+
+def test_statement_spans():
+    text = ';\n'.join(STATEMENTS) + ';'
+    arena, _ = parse_program_arena(text)
+    assert [text[slice(*arena.span(r))] for r in arena.roots] == STATEMENTS
+
+
+@pytest.mark.parametrize('expr', ['a', '12', 'a + b / (c - 12) + d', '((((x))))', 'a * b * c - d - e',
+                                  ' + '.join(f'(x{k} - {k}) / y' for k in range(200))])
+def test_ll1_round_trip(expr):
+    arena = parse_expression_arena(expr)
+    assert len(arena) == 1
+    assert arena[0] == ll1.parse_expression(expr)
+    assert arena.span(arena.roots[0]) == (0, len(expr))
+
+
+def test_visitor_walks_every_node_in_order_and_can_skip():
+    arena, _ = parse_program_arena("SELECT a FROM t WHERE a = 1 AND b < 2; DELETE FROM t WHERE c = 3;")
+
+    class Recorder(ArenaVisitor):
+        def __init__(self, skip=()):
+            self.events, self.skip = [], skip
+
+        def enter(self, ref):
+            self.events.append(('enter', self.arena.kind_name(ref)))
+            return self.arena.kind_name(ref) not in self.skip
+
+        def leave(self, ref):
+            self.events.append(('leave', self.arena.kind_name(ref)))
+
+    v = Recorder()
+    v.visit(arena, arena.roots[0])
+    entered = [k for e, k in v.events if e == 'enter']
+    assert entered[0] == 'select' and v.events[-1] == ('leave', 'select')
+    assert entered.count('assign') == 1 and entered.count('lt') == 1 and entered.count('and') == 1
+    assert len(v.events) == 2 * len(entered)
+    v = Recorder(skip={'and'})
+    v.visit(arena, arena.roots[0])
+    assert 'assign' not in [k for _, k in v.events]
@@ -0,0 +1,74 @@
+import pytest
+
+from crud_executor import Database, ExecutionError
+
+CREATE = "CREATE TABLE t (a INT, b INT, c VARCHAR(3));"
+
+
+def db(*indexed):
+    d = Database()
+    d.execute_script(CREATE)
+    for col in indexed:
+        d.create_index('t', col)
+    return d
+
+
+def rows(d, where=''):
+    return d.execute_script(f"SELECT a, b, c FROM t{where};")[0].rows
+
+
+@pytest.mark.parametrize('bad', [
+    "INSERT INTO t (a, b) VALUES (1, 99999999999999999999);",
+    "INSERT INTO t (a, b) VALUES (1, 9223372036854775808);",
+    "INSERT INTO t (a, c) VALUES (1, 'long');",
+    "INSERT INTO t (a, b) VALUES (1, 'x');",
+])
+def test_failed_insert_leaves_no_partial_row(bad):
+    d = db('a')
+    with pytest.raises(ExecutionError):
+        d.execute_script(bad)
+    d.execute_script("INSERT INTO t (a, b) VALUES (2, 3);")
+    assert rows(d) == [(2, 3, None)]
+    assert rows(d, ' WHERE a = 1') == []
+    assert all(len(col.data) == 1 for col in d.table('t').columns.values())
+
+
+def test_failed_multi_row_insert_keeps_none_of_its_rows():
+    d = db('b')
+    d.execute_script("INSERT INTO t (a, b) VALUES (1, 1);")
+    with pytest.raises(ExecutionError):
+        d.execute_script("INSERT INTO t (a, b) VALUES (2, 2), (3, 3), (4, 99999999999999999999);")
+    assert rows(d) == [(1, 1, None)]
+    assert rows(d, ' WHERE b = 2') == []
+    assert len(d.table('t')) == 1
+
+
+def test_int_range_edges_are_accepted():
+    d = db()
+    d.execute_script("INSERT INTO t (a, b) VALUES (9223372036854775807, 0);")
+    d.execute_script("UPDATE t SET b = b - 9223372036854775807 - 1;")
+    assert rows(d) == [(2**63 - 1, -2**63, None)]
+
+
+def test_update_out_of_range_changes_nothing():
+    d = db()
+    d.execute_script("INSERT INTO t (a, b) VALUES (1, 2);")
+    with pytest.raises(ExecutionError):
+        d.execute_script("UPDATE t SET a = a + 9223372036854775807;")
+    assert rows(d) == [(1, 2, None)]
+
+
+def test_bulk_load_matches_execute_script():
+    script = ("INSERT INTO t (a, c) VALUES (1, 'x,y'), (2, 'a;b') -- (3, 'no');\n, (4, NULL);"
+              "INSERT INTO t (b, a) VALUES (5, 6);")
+    d, loaded = db(), db()
+    d.execute_script(script)
+    assert loaded.bulk_load(script) == 4
+    assert rows(loaded) == rows(d) == [(1, None, 'x,y'), (2, None, 'a;b'), (4, None, None), (6, 5, None)]
+
+
+def test_bulk_load_rejects_a_missing_semicolon():
+    d = db()
+    with pytest.raises(SyntaxError):
+        d.bulk_load("INSERT INTO t (a) VALUES (1), (2)")
+    assert rows(d) == []
@@ -0,0 +1,43 @@
+import random
+import re
+
+import pytest
+
+import codigo_del_3 as c3
+import rd_parser_match_punto5 as rd
+from bench_parsers import generate_sql
+from dfa_lexer import DFALexer
+
+PIECES = ['SELECT', 'select', 'SeLeCt', 'ſelect', 'ınt', 'id', 'x1', '12', "'a b'", "'x\\'y'", "'", '--c\n',
+          '==', '=', '<=', '<', '*', '-', '--', '/', ',', ';', '(', ')', '.', ' ', '\n', 'é', '#', 'nulls']
+
+
+def outcome(f, s):
+    try:
+        buf = f(s)
+        return list(buf.kinds), list(buf.starts), list(buf.ends)
+    except SyntaxError as e:
+        return str(e)
+
+
+@pytest.mark.parametrize('module', [rd, c3], ids=['sql', 'expr'])
+def test_dfa_matches_regex_on_random_fragments(module):
+    rng = random.Random(0)
+    for _ in range(2000):
+        s = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+        assert outcome(module.tokenize_buffer, s) == outcome(module.tokenize_buffer_re, s), s
+
+
+def test_dfa_matches_regex_on_generated_sql():
+    sql = generate_sql(300, 3, 4, 0.05, 1)
+    assert outcome(rd.tokenize_buffer, sql) == outcome(rd.tokenize_buffer_re, sql)
+
+
+def test_bytes_lexer_gives_byte_offsets():
+    lexer = DFALexer(rd.TOKEN_SPEC, rd.TOKEN_NAMES, rd.KEYWORDS, rd.SKIP, flags=re.DOTALL | re.IGNORECASE,
+                     binary=True, token_cls=rd.Token)
+    sql = "SELECT nombre FROM t WHERE x = 'ñandú';"
+    text = lexer.tokenize(sql.encode('utf-8'))
+    ref = rd.tokenize_buffer_re(sql)
+    assert list(text.kinds) == list(ref.kinds)
+    assert text.starts[-2] == len(sql.encode('utf-8')) - 1
@@ -0,0 +1,230 @@
+import itertools
+import os
+import random
+
+import pytest
+
+import cyk_full_punto4
+from cyk_full_punto4 import (GRAMMAR, ParallelCYK, compile_grammar, cyk, cyk_batch, cyk_bitset, cyk_forest,
+                             grammar_key, grammar_size, measure_compile, to_cnf_poly)
+from earley_punto4 import earley, earley_parse
+
+TERMINALS = ['id', '+', '-', '*', '/', '(', ')']
+
+
+def strings(max_len):
+    for n in range(1, max_len + 1):
+        yield from itertools.product(TERMINALS, repeat=n)
+
+
+@pytest.fixture(scope='module')
+def cnf():
+    return compile_grammar(GRAMMAR, 'E')
+
+
+def test_earley_and_cyk_agree_on_all_short_strings(cnf):
+    accepted = 0
+    for toks in strings(5):
+        toks = list(toks)
+        ok = earley(toks, GRAMMAR, 'E')
+        assert cyk(toks, cnf, 'E') == ok, toks
+        assert cyk_bitset(toks, cnf, 'E') == ok, toks
+        assert (cyk_forest(toks, cnf, 'E') is not None) == ok, toks
+        accepted += ok
+    assert accepted > 0
+
+
+def random_grammar(rng):
+    # small grammars where ε rules, left recursion and unit cycles (S -> A, A -> S) are all common
+    nonterminals = ['S', 'A', 'B', 'C']
+    symbols = nonterminals + ['a', 'b']
+    return {A: [tuple(rng.choice(symbols) for _ in range(rng.randint(0, 3))) for _ in range(rng.randint(1, 3))]
+            for A in nonterminals}
+
+
+def tree_leaves(tree, grammar):
+    # leaves of an earley_parse tree, checking that every node applies one of its rules
+    leaves, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, tuple):
+            leaves.append(node)
+            continue
+        kids = node[1:]
+        if kids == ('ε',):
+            kids = ()
+        assert tuple(k[0] if isinstance(k, tuple) else k for k in kids) in grammar[node[0]], node
+        stack.extend(reversed(kids))
+    return leaves
+
+
+def test_earley_handles_unit_cycles_and_chains_through_start():
+    assert earley(['a'], {'S': [('S',), ('a',)]}, 'S')
+    assert earley(['b', 'b'], {'S': [('A',), ('b',)], 'A': [('C', 'b')], 'C': [('S',)]}, 'S')
+
+
+def test_earley_agrees_with_cyk_on_random_grammars():
+    rng = random.Random(7)
+    for _ in range(300):
+        grammar = random_grammar(rng)
+        cnf = compile_grammar(grammar, 'S')
+        for toks in itertools.chain.from_iterable(itertools.product('ab', repeat=n) for n in range(1, 5)):
+            toks = list(toks)
+            ok = earley(toks, grammar, 'S')
+            assert ok == cyk_bitset(toks, cnf, 'S'), (grammar, toks)
+            if ok:
+                assert tree_leaves(earley_parse(toks, grammar, 'S'), grammar) == toks, (grammar, toks)
+
+
+def test_to_cnf_poly_keeps_the_language_in_cnf_shape():
+    rng = random.Random(11)
+    for _ in range(300):
+        grammar = random_grammar(rng)
+        g = to_cnf_poly(grammar, 'S', terminals={'a', 'b'})
+        for A, rhss in g.items():
+            for rhs in rhss:
+                if len(rhs) == 2:
+                    assert rhs[0] in g and rhs[1] in g, (grammar, A, rhs)
+                elif len(rhs) == 1:
+                    assert rhs[0] in ('a', 'b'), (grammar, A, rhs)
+                else:
+                    assert rhs == () and A == 'S', (grammar, A, rhs)
+        assert (() in g.get('S', [])) == earley([], grammar, 'S'), grammar
+        for toks in itertools.chain.from_iterable(itertools.product('ab', repeat=n) for n in range(1, 5)):
+            toks = list(toks)
+            assert cyk(toks, g, 'S') == earley(toks, grammar, 'S'), (grammar, toks)
+
+
+def test_empty_input_uses_the_start_epsilon_rule():
+    for grammar, expected in (({'S': [('a', 'S'), ()]}, True), ({'S': [('a', 'S'), ('a',)]}, False)):
+        cnf = compile_grammar(grammar, 'S')
+        assert earley([], grammar, 'S') == expected
+        assert cyk([], cnf, 'S') == cyk([], cnf.cnf, 'S') == cyk_bitset([], cnf, 'S') == expected
+        with ParallelCYK(cnf, workers=1) as p:
+            assert p.recognize([], 'S') == expected
+        assert cyk_batch([[], ['a'], [], ['b']], cnf, 'S', workers=2) == [expected, True, expected, False]
+
+
+def test_to_cnf_poly_reports_every_stage():
+    stats = {}
+    g = to_cnf_poly(GRAMMAR, 'E', stats=stats)
+    assert list(stats) == ['input', 'TERM', 'BIN', 'DEL', 'UNIT', 'USELESS']
+    assert stats['input'] == grammar_size(GRAMMAR)
+    assert stats['USELESS'] == grammar_size(g)
+    assert compile_grammar(GRAMMAR, 'E').stats == stats
+
+
+def test_cnf_version_invalidates_the_disk_cache(tmp_path, monkeypatch):
+    grammar = {'S': [('a', 'S'), ('b',)]}
+    cache = str(tmp_path)
+    key = grammar_key(grammar, 'S')
+    compile_grammar(grammar, 'S', cache)
+    cyk_full_punto4._COMPILED.pop(key)
+    assert compile_grammar(grammar, 'S', cache).source == 'disk'
+    monkeypatch.setattr(cyk_full_punto4, 'CNF_VERSION', cyk_full_punto4.CNF_VERSION + 1)
+    assert grammar_key(grammar, 'S') != key
+    cg = compile_grammar(grammar, 'S', cache)
+    assert cg.source == 'built' and cg.key != key
+    assert len(list(tmp_path.glob('*.pickle'))) == 2
+
+
+def random_sentences(rng, count, max_len, alphabet=TERMINALS):
+    return [[rng.choice(alphabet) for _ in range(rng.randint(1, max_len))] for _ in range(count)]
+
+
+EXPR_SAMPLES = [['(', 'id', '+', 'id', ')', '*', 'id', '-', 'id', '/', '(', 'id', ')'], ['id', '+'], ['id']]
+
+
+def test_parallel_cyk_pool_matches_cyk_bitset(cnf):
+    sentences = EXPR_SAMPLES + random_sentences(random.Random(3), 40, 9, ['id', '+', '*', '(', ')'])
+    with ParallelCYK(cnf, workers=2, min_work=0) as p:
+        assert p.pool is not None
+        for toks in sentences:
+            assert p.recognize(toks, 'E') == cyk_bitset(toks, cnf, 'E'), toks
+    assert any(cyk_bitset(toks, cnf, 'E') for toks in sentences)
+
+
+def test_parallel_cyk_with_more_than_64_symbols():
+    # even palindromes over 70 letters: over 200 CNF symbols, so every cell spans several words
+    letters = [f't{k}' for k in range(70)]
+    wide = compile_grammar({'S': [(a, 'S', a) for a in letters] + [(a, a) for a in letters]}, 'S')
+    rng = random.Random(5)
+    sentences = []
+    for _ in range(15):
+        half = [rng.choice(letters) for _ in range(rng.randint(1, 6))]
+        sentences.append(half + half[::-1])
+        sentences.append(half + half)
+    assert len(wide.index) > 64
+    with ParallelCYK(wide, workers=2, min_work=0) as p:
+        assert p.width > 8
+        for toks in sentences:
+            assert p.recognize(toks, 'S') == cyk_bitset(toks, wide, 'S') == (toks == toks[::-1]), toks
+
+
+def test_parallel_cyk_error_is_not_masked_and_frees_the_segment(cnf, monkeypatch):
+    def boom(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(cyk_full_punto4, '_fill_diagonal_q', boom)
+    before = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else None
+    with ParallelCYK(cnf, workers=1) as p:
+        with pytest.raises(KeyboardInterrupt):
+            p.recognize(['id', '+', 'id'], 'E')
+    if before is not None:
+        assert set(os.listdir('/dev/shm')) <= before
+
+
+def test_cyk_batch_keeps_input_order(cnf):
+    sentences = random_sentences(random.Random(9), 60, 7, ['id', '+', '*', '(', ')'])
+    expected = [cyk_bitset(toks, cnf, 'E') for toks in sentences]
+    assert any(expected) and not all(expected)
+    assert cyk_batch(sentences, cnf, 'E', workers=2, chunksize=7) == expected
+    assert cyk_batch(sentences, cnf.cnf, 'E', workers=1) == expected
+
+
+def test_earley_parse_does_not_commit_to_a_cyclic_derivation():
+    grammar = {'S': [('C',), ('S', 'B', 'B', 'b'), ('a', 'A')], 'A': [('B', 'S'), ('a', 'a'), ('b', 'a', 'a')],
+               'B': [('S', 'b')], 'C': [(), ('S',), ('a', 'B')]}
+    toks = ['b', 'b', 'b']
+    assert tree_leaves(earley_parse(toks, grammar, 'S'), grammar) == toks
+
+
+def test_earley_parse_yields_the_input():
+    toks = ['(', 'id', '+', 'id', ')', '*', 'id']
+    tree = earley_parse(toks, GRAMMAR, 'E')
+    leaves = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, tuple):
+            stack.extend(reversed(node[1:]))
+        elif node != 'ε':
+            leaves.append(node)
+    assert leaves == toks
+
+
+def test_forest_trees_enumerates_every_derivation_in_order():
+    # S -> S + S | id: Catalan(n) trees, enumerated like the nested "for left: for right" loops
+    ambiguous = {'S': [('S', 'X0'), ('id',)], 'X0': [('T_+', 'S')], 'T_+': [('+',)]}
+    forest = cyk_forest(['id'] + ['+', 'id'] * 5, ambiguous, 'S')
+    trees = list(forest.trees())
+    assert len(trees) == len(set(trees)) == forest.count() == 42
+    assert trees[0] == forest.tree()
+    # the last split varies fastest: the first two trees differ only inside the rightmost S
+    assert trees[0][1] == trees[1][1]
+
+
+def test_compiled_grammar_rejects_another_start(cnf):
+    for recognize in (cyk, cyk_bitset, cyk_forest):
+        with pytest.raises(ValueError):
+            recognize(['id'], cnf, 'T')
+
+
+def test_measure_compile_keeps_other_cache_entries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    times = measure_compile(GRAMMAR, 'E')
+    assert times['build'] > 0 and times['load'] is not None
+    assert list(tmp_path.iterdir()) == []
+    other = tmp_path / 'cache'
+    compile_grammar({'S': [('a',)]}, 'S', str(other))
+    measure_compile(GRAMMAR, 'E', str(other))
+    assert len(list(other.glob('*.pickle'))) == 2
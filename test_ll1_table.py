@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+from bench_parsers import generate_expression
+from codigo_del_3 import Token, parse_expression, parse_expression_table
+from ll1_table import EPS, VALUE, LL1Table
+from token_buffer import TokenBuffer
+
+ATOMS = ['a', '1', '+', '-', '*', '/', '(', ')']
+
+
+def outcome(parse, s):
+    try:
+        return parse(s)
+    except SyntaxError as e:
+        return ('error', str(e))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_table_matches_recursive_on_generated_expressions(seed):
+    s = generate_expression(200, 3, seed)
+    assert parse_expression_table(s) == parse_expression(s)
+
+
+def test_table_matches_recursive_on_all_short_inputs():
+    for n in range(1, 5):
+        for toks in itertools.product(ATOMS, repeat=n):
+            s = ' '.join(toks)
+            assert outcome(parse_expression_table, s) == outcome(parse_expression, s), s
+
+
+# a grammar with a 5-symbol rhs, a unit production and an ε in the middle of a prediction chain
+MIXED = {
+    'S': [('A', 'C', 'b', 'c', 'a')],
+    'A': [('B',)],
+    'B': [('a',)],
+    'C': [()],
+}
+MIXED_TERMINALS = ['a', 'b', 'c', 'EOF']
+
+
+def mixed_buffer(s):
+    buf = TokenBuffer(s, MIXED_TERMINALS, token_cls=Token)
+    for pos, ch in enumerate(s):
+        buf.append(MIXED_TERMINALS.index(ch), pos, pos + 1)
+    buf.append(len(MIXED_TERMINALS) - 1, len(s), len(s))
+    return buf
+
+
+def test_reductions_of_every_length():
+    table = LL1Table(MIXED, 'S', MIXED_TERMINALS)
+    leaves = [VALUE, VALUE, ('t', VALUE), 'EOF']
+    tree, i = table.parse(mixed_buffer('abca'), leaves)
+    assert tree == ('S', ('A', ('B', 'a')), ('C', EPS), 'b', ('t', 'c'), 'a')
+    assert i == 4
+    with pytest.raises(SyntaxError, match='in B at pos 0'):
+        table.parse(mixed_buffer('b'), leaves)
+    with pytest.raises(SyntaxError, match=r"Expected \('c',\) at pos 2"):
+        table.parse(mixed_buffer('abb'), leaves)
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from diagnostics import DiagnosticCollector
+from parse_cache import ParseCache, dumps, load
+from ast_arena import parse_program_arena
+from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+
+SCRIPT = ("CREATE TABLE t (a INT, b VARCHAR(5));\n"
+          "INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'it\\'s');\n"
+          "SELECT a FROM t WHERE (a = 1 OR b != 'y') AND a < 3;\n"
+          "UPDATE t SET = 2;\nFOO bar;\nDELETE FROM t WHERE a = 2 * (1 + 1)\n").encode('utf-8')
+
+
+def plain(content):
+    text = content.decode('utf-8')
+    p = RDParserMatch(tokenize_buffer(text))
+    return p.parse_program(), p.errors
+
+
+def test_format_round_trip(tmp_path):
+    text = SCRIPT.decode('utf-8')
+    arena, errors = parse_program_arena(text)
+    path = tmp_path / 'entry.pca'
+    path.write_bytes(dumps(arena, errors))
+    stmts, plain_errors = plain(SCRIPT)
+    with load(path, text) as res:
+        assert list(res.arena) == stmts
+        assert list(res.errors) == list(plain_errors)
+        assert [res.arena.span(r) for r in res.arena.roots] == [arena.span(r) for r in arena.roots]
+
+
+def test_hit_and_miss_give_the_same_result_and_collector(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    stmts, errors = plain(SCRIPT)
+    assert errors
+    for hit in (False, True):
+        with cache.parse(SCRIPT) as res:
+            assert res.hit == hit
+            assert res.statements() == stmts
+            assert isinstance(res.errors, DiagnosticCollector)
+            assert res.errors.render() == errors.render()
+            assert res.errors.line_col(res.errors[0].offset) == errors.line_col(errors[0].offset)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:20],
+    lambda data: b'NOTCACHE' + data[8:],
+    lambda data: data[:-40],
+    lambda data: b'',
+])
+def test_corrupt_entry_is_discarded_and_reparsed(tmp_path, damage):
+    cache = ParseCache(str(tmp_path))
+    cache.parse(SCRIPT).close()
+    path = cache.path(cache.key(SCRIPT))
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(damage(data))
+    assert cache.get(SCRIPT) is None
+    assert not os.path.exists(path)
+    with cache.parse(SCRIPT) as res:
+        assert not res.hit
+        assert res.statements() == plain(SCRIPT)[0]
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    scripts = [SCRIPT + f"SELECT a FROM t WHERE a = {k};".encode('ascii') for k in range(3)]
+    for k, content in enumerate(scripts):
+        cache.parse(content).close()
+        os.utime(cache.path(cache.key(content)), (1000 + k, 1000 + k))
+    cache.get(scripts[0]).close()         # a hit makes the oldest entry the most recent
+    size = os.path.getsize(cache.path(cache.key(scripts[0])))
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict()
+    kept = [os.path.exists(cache.path(cache.key(c))) for c in scripts]
+    assert kept == [True, False, True]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_bytes_that_are_not_utf8_give_a_cached_lex_error(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    content = b"SELECT a FROM t;\nSELECT 'caf\xe9' FROM t;\n"
+    for hit in (False, True):
+        with cache.parse(content) as res:
+            assert res.hit == hit and res.statements() == []
+            assert [d.code for d in res.errors] == ['bad_char']
+            assert res.errors[0].value == '\ufffd'
+            assert res.errors.line_col(res.errors[0].offset) == (2, 12)
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path))
+
+    def fail(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        cache.parse(SCRIPT)
+    assert list(tmp_path.iterdir()) == []
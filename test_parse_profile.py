@@ -0,0 +1,83 @@
+import itertools
+import json
+
+import pytest
+
+from cyk_full_punto4 import GRAMMAR, compile_grammar, cyk, cyk_bitset
+from parse_profile import Profile, cyk_profiled, profile_arg, profile_ll1, profile_rd
+from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+
+COUNTERS = ('count', 'tokens', 'match', 'next', 'skipped')
+
+
+def counts(profile):
+    sec = profile.sections['rd']
+    totals = {k: sec[k] for k in ('tokens', 'statements', 'errors', 'match', 'next', 'recovery_skipped_tokens')}
+    return totals, {kind: tuple(b[k] for k in COUNTERS) for kind, b in sec['by_kind'].items()}
+
+
+def test_rd_counts_on_a_script_with_errors():
+    # UPDATE: UPDATE t SET matched, then the missing column skips '= 1 2 3' up to the ';'
+    s = "SELECT a FROM t; UPDATE t SET = 1 2 3; DELETE FROM t;"
+    prof = Profile()
+    stmts, errors = profile_rd(s, prof)
+    p = RDParserMatch(tokenize_buffer(s))
+    assert stmts == p.parse_program() and list(errors) == list(p.errors)
+    totals, by_kind = counts(prof)
+    assert totals == {'tokens': 18, 'statements': 3, 'errors': 1, 'match': 14, 'next': 17,
+                      'recovery_skipped_tokens': 4}
+    assert by_kind == {'select': (1, 5, 5, 5, 0), 'update': (1, 8, 5, 8, 4), 'delete': (1, 4, 4, 4, 0)}
+
+
+def test_rd_counts_skipped_statements_past_the_budget():
+    # the second UPDATE hits the budget: skip_statement jumps over '= 2 3' and consumes the ';'
+    s = "UPDATE t SET = 1; UPDATE t SET = 2 3; SELECT a FROM t;"
+    prof = Profile()
+    stmts, errors = profile_rd(s, prof, max_errors=1, on_limit='skip')
+    assert [st[0] for st in stmts] == ['update', 'error_stmt', 'select'] and errors.dropped == 1
+    totals, by_kind = counts(prof)
+    assert totals['recovery_skipped_tokens'] == 5
+    assert by_kind == {'update': (1, 6, 5, 6, 2), 'error_stmt': (1, 7, 4, 4, 3), 'select': (1, 5, 5, 5, 0)}
+
+
+def test_profiles_accumulate_and_dump_as_json(tmp_path):
+    prof = Profile()
+    profile_rd("SELECT a FROM t;", prof)
+    profile_rd("SELECT a FROM t;", prof)
+    assert profile_ll1('a + b * c', prof) is not None
+    assert profile_ll1('a + * c', prof) is None
+    assert prof.sections['rd']['by_kind']['select']['count'] == 2
+    assert prof.sections['ll1']['expressions'] == 2 and prof.sections['ll1']['errors'] == 1
+    path = tmp_path / 'profile.json'
+    prof.dump(str(path))
+    assert json.loads(path.read_text()) == json.loads(json.dumps(prof.to_dict()))
+
+
+@pytest.mark.parametrize('argv, dest', [([], None), (['--profile'], '-'), (['x', '--profile=out.json'], 'out.json')])
+def test_profile_arg(argv, dest):
+    assert profile_arg(argv) == dest
+
+
+def test_cyk_profiled_agrees_with_cyk():
+    cnf = compile_grammar(GRAMMAR, 'E')
+    terminals = ['id', '+', '*', '(', ')']
+    sentences = [list(t) for n in range(1, 6) for t in itertools.product(terminals, repeat=n)]
+    prof = Profile()
+    for toks in sentences:
+        expected = cyk(toks, cnf, 'E')
+        assert cyk_profiled(toks, cnf, prof, 'E', cyk) == expected, toks
+        assert cyk_profiled(toks, cnf, prof, 'E') == expected, toks
+    slow, fast = prof.sections['cyk'], prof.sections['cyk_bitset']
+    assert slow['sentences'] == fast['sentences'] == len(sentences)
+    assert slow['accepted'] == fast['accepted'] == sum(cyk(t, cnf, 'E') for t in sentences) > 0
+    # both engines fill the same cells with the same symbols
+    assert (slow['cells_filled'], slow['symbols']) == (fast['cells_filled'], fast['symbols'])
+    assert slow['cells'] == sum(len(t) * (len(t) + 1) // 2 for t in sentences)
+
+
+def test_cyk_stats_on_one_sentence():
+    cnf = compile_grammar(GRAMMAR, 'E')
+    stats = {}
+    assert cyk_bitset(['id', '+', 'id'], cnf, 'E', stats=stats)
+    # 'id': E T F X0 X1 twice, '+': T_+, '+ id': EP, 'id + id': E X0; 'id +' stays empty
+    assert stats == {'tokens': 3, 'cells_filled': 5, 'symbols': 14}
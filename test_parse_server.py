@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+
+import parse_server
+from parse_server import ParseServer
+
+
+def serve(lines, limit=parse_server.LINE_LIMIT, workers=0, raw=False):
+    # run serve_stream in-process over the given request lines; responses in the order written
+    # (raw: as the JSON lines themselves)
+    async def go():
+        reader = asyncio.StreamReader(limit=limit)
+        for line in lines:
+            reader.feed_data((line if isinstance(line, str) else json.dumps(line)).encode('utf-8') + b'\n')
+        reader.feed_eof()
+        out = []
+
+        async def write(text):
+            out.append(text if raw else json.loads(text))
+        server = ParseServer(workers=workers)
+        server.start()
+        try:
+            await server.serve_stream(reader, write)
+        finally:
+            server.close()
+        return out, server
+    return asyncio.run(go())
+
+
+def test_engines_and_bad_requests():
+    out, server = serve([
+        {'id': 1, 'engine': 'rd', 'text': "SELECT a FROM t WHERE a = 1;"},
+        {'id': 2, 'engine': 'rd', 'text': "SELECT FROM t;\nFOO;"},
+        {'id': 3, 'engine': 'll1', 'text': 'a + b * (c - 1)'},
+        {'id': 4, 'engine': 'll1', 'text': 'a + * b'},
+        {'id': 5, 'engine': 'cyk', 'text': 'a + b * c', 'ast': False},
+        {'id': 6, 'engine': 'cyk', 'text': 'a + + c'},
+        {'id': 7, 'engine': 'nope', 'text': 'x'},
+        {'id': 8, 'op': 'ping'},
+        'not json',
+        '[1, 2]',
+    ])
+    by_id = {r['id']: r for r in out if r['id'] is not None}
+    assert len(out) == 10 and sum(r['id'] is None for r in out) == 2
+    assert by_id[1]['ok'] and by_id[1]['ast'] == [['select', ['a'], 't', ['assign', ['id', 'a'], ['num', '1']]]]
+    assert not by_id[2]['ok'] and {e['line'] for e in by_id[2]['errors']} == {1, 2}
+    assert by_id[3]['ok'] and not by_id[4]['ok']
+    assert by_id[5]['ok'] and by_id[5]['trees'] == 1 and 'ast' not in by_id[5]
+    assert not by_id[6]['ok']
+    assert not by_id[7]['ok'] and by_id[8]['ok']
+    assert server.bad_requests == 3
+
+
+def test_crashed_request_keeps_its_id(monkeypatch):
+    def crash(engine, text, with_ast=True):
+        raise RuntimeError('worker died')
+    monkeypatch.setattr(parse_server, 'handle', crash)
+    out, _ = serve([{'id': 'abc', 'engine': 'rd', 'text': 'SELECT a FROM t;'}])
+    assert out == [{'id': 'abc', 'engine': 'rd', 'ok': False, 'errors': [{'message': 'RuntimeError: worker died'}]}]
+
+
+def test_overlong_line_is_answered_before_closing():
+    out, server = serve([{'id': 1, 'engine': 'rd', 'text': 'x' * 500}, {'id': 2, 'op': 'ping'}], limit=100)
+    assert len(out) == 1 and out[0]['id'] is None and not out[0]['ok']
+    assert 'too long' in out[0]['errors'][0]['message']
+    assert server.bad_requests == 1
+
+
+def test_deeply_nested_ast_is_answered():
+    # the client needs a raised recursion limit to load this AST; the server must not
+    text = '(' * 3000 + 'a' + ')' * 3000
+    for workers in (0, 1):
+        out, _ = serve([{'id': 1, 'op': 'ping'}, {'id': 2, 'engine': 'll1', 'text': text}], workers=workers, raw=True)
+        assert len(out) == 2 and all(line.endswith('\n') for line in out)
+        deep = [line for line in out if line.startswith('{"id":2,')]
+        assert len(deep) == 1 and deep[0].startswith('{"id":2,"engine":"ll1","ok":true,')
+        assert deep[0].count('[') > 3000 and deep[0].count('[') == deep[0].count(']')
+
+
+def _load_dying_rd():
+    run = parse_server._load_rd()
+
+    def dying(text, with_ast):
+        if text == 'die':
+            os._exit(1)
+        return run(text, with_ast)
+    return dying
+
+
+def test_dead_worker_is_replaced(monkeypatch):
+    # worker processes are forked after the patch, so they load the dying engine
+    monkeypatch.setitem(parse_server._LOADERS, 'rd', _load_dying_rd)
+    monkeypatch.setattr(parse_server, '_engines', {})
+    server = ParseServer(workers=1)
+    server.start()
+
+    async def go():
+        first = json.loads(await server.respond(json.dumps({'id': 1, 'engine': 'rd', 'text': 'die'})))
+        second = json.loads(await server.respond(json.dumps({'id': 2, 'engine': 'rd', 'text': 'SELECT a FROM t;'})))
+        return first, second
+    try:
+        first, second = asyncio.run(go())
+    finally:
+        server.close()
+    assert first['id'] == 1 and not first['ok'] and 'BrokenProcessPool' in first['errors'][0]['message']
+    assert second['id'] == 2 and second['ok']
+    assert server.restarts == 1
+
+
+def test_dumps_deep_matches_json_dumps():
+    obj = {'a': [1, 'x', None, True, 2.5, ('t', ['é', {}])], 'b': [], 'c': {'d': '"q"'}}
+    assert parse_server._dumps_deep(obj) == json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
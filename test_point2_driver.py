@@ -0,0 +1,257 @@
+import importlib.util
+import io
+import json
+import os
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def point2_driver():
+    # the real driver needs the ANTLR runtime and the generated antlr_out parser
+    pytest.importorskip('antlr4')
+    pytest.importorskip('antlr_out.CRUDParser')
+    import point2_driver
+    return point2_driver
+
+
+def records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.fixture
+def files(tmp_path):
+    good = tmp_path / 'good.sql'
+    good.write_text("SELECT a FROM t WHERE a == 1;\n", encoding='utf-8')
+    bad = tmp_path / 'bad.sql'
+    bad.write_text("SELECT FROM WHERE;\n", encoding='utf-8')
+    latin = tmp_path / 'latin.sql'
+    latin.write_bytes(b"SELECT a FROM t WHERE b == '\xe9';\n")
+    return [str(good), str(bad), str(latin), str(tmp_path / 'missing.sql')]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_writes_one_line_per_file_in_order(point2_driver, files, workers):
+    out = io.StringIO()
+    point2_driver.run_batch(files, workers=workers, out=out)
+    recs = records(out)
+    assert [r['file'] for r in recs] == files
+    assert recs[0]['errors'] == [] and recs[0]['mode'] == 'SLL' and recs[0]['ast'][0] == 'program'
+    assert recs[1]['errors'] and recs[1]['mode'] == 'LL'
+    assert 'error' in recs[2] and 'error' in recs[3]
+
+
+def test_a_crash_inside_the_parser_only_fails_that_file(point2_driver, files, monkeypatch):
+    real = point2_driver.BatchParser
+
+    class Crashing(real):
+        def to_json(self, tree):
+            if self.lexer.inputStream.fileName.endswith('bad.sql'):
+                raise RecursionError('maximum recursion depth exceeded')
+            return super().to_json(tree)
+
+    monkeypatch.setattr(point2_driver, 'BatchParser', Crashing)
+    monkeypatch.setattr(point2_driver, '_batch_parser', None)
+    out = io.StringIO()
+    point2_driver.run_batch(files[:2] + files[:1], workers=1, out=out)
+    recs = records(out)
+    assert recs[1]['error'].startswith('RecursionError')
+    assert recs[0]['ast'] == recs[2]['ast'] and recs[2]['errors'] == []
+
+
+# --- BatchParser against a scripted stand-in for the ANTLR runtime and the generated classes, so the
+# SLL -> LL sequence runs without antlr4 installed. Input words: 'hard' makes SLL bail, 'bad' is a
+# syntax error for LL, '#' a lex error.
+
+class ParseCancellationException(Exception):
+    pass
+
+
+class ErrorListener:
+    pass
+
+
+class BailErrorStrategy:
+    pass
+
+
+class DefaultErrorStrategy:
+    pass
+
+
+class PredictionMode:
+    SLL, LL = 'SLL', 'LL'
+
+
+class TerminalNode:
+    def __init__(self, text):
+        self.text = text
+
+    def getText(self):
+        return self.text
+
+
+class Rule:
+    def __init__(self, index, children):
+        self.index, self.children = index, children
+
+    def getRuleIndex(self):
+        return self.index
+
+
+class FileStream:
+    def __init__(self, path, encoding='utf-8'):
+        self.fileName = path
+        with open(path, encoding=encoding) as f:
+            self.text = f.read()
+
+
+class InputStream:
+    def __init__(self, text):
+        self.text = text
+
+
+class CommonTokenStream:
+    def __init__(self, lexer):
+        self.lexer, self.tokens, self.index = lexer, [], 0
+
+    def fill(self):
+        for pos, word in enumerate(self.lexer.inputStream.text.split()):
+            if word == '#':
+                for listener in self.lexer.listeners:
+                    listener.syntaxError(self.lexer, None, 1, pos, "token recognition error at: '#'", None)
+            else:
+                self.tokens.append(word)
+
+    def seek(self, index):
+        self.index = index
+
+
+class Recognizer:
+    def __init__(self, _input):
+        self.listeners = ['console']
+
+    def removeErrorListeners(self):
+        self.listeners = []
+
+    def addErrorListener(self, listener):
+        self.listeners.append(listener)
+
+    def removeErrorListener(self, listener):
+        self.listeners.remove(listener)
+
+
+class CRUDLexer(Recognizer):
+    inputStream = None
+
+
+class CRUDParser(Recognizer):
+    ruleNames = ['program', 'stmt']
+
+    def __init__(self, _input):
+        super().__init__(_input)
+        self._input = None
+        self._interp = types.SimpleNamespace(predictionMode=PredictionMode.LL)
+        self._errHandler = DefaultErrorStrategy()
+        self.calls = []
+
+    def reset(self):
+        if self._input is not None:
+            self._input.seek(0)
+
+    def setTokenStream(self, stream):
+        # like the runtime: reset first, then attach
+        self._input = None
+        self.reset()
+        self._input = stream
+
+    def program(self):
+        stream = self._input
+        self.calls.append((self._interp.predictionMode, type(self._errHandler).__name__, stream.index,
+                           list(self.listeners)))
+        children = []
+        while stream.index < len(stream.tokens):
+            word = stream.tokens[stream.index]
+            if word == 'hard' and self._interp.predictionMode == PredictionMode.SLL:
+                raise ParseCancellationException()
+            if word == 'bad':
+                for listener in self.listeners:
+                    listener.syntaxError(self, word, 1, stream.index, f"extraneous input '{word}'", None)
+            else:
+                children.append(Rule(1, [TerminalNode(word)]))
+            stream.index += 1
+        return Rule(0, children)
+
+
+@pytest.fixture
+def stub_driver(monkeypatch):
+    modules = {
+        'antlr4': {'FileStream': FileStream, 'InputStream': InputStream, 'CommonTokenStream': CommonTokenStream,
+                   'ParseTreeWalker': object},
+        'antlr4.error': {},
+        'antlr4.error.ErrorListener': {'ErrorListener': ErrorListener},
+        'antlr4.error.ErrorStrategy': {'BailErrorStrategy': BailErrorStrategy,
+                                       'DefaultErrorStrategy': DefaultErrorStrategy},
+        'antlr4.error.Errors': {'ParseCancellationException': ParseCancellationException},
+        'antlr4.atn': {},
+        'antlr4.atn.PredictionMode': {'PredictionMode': PredictionMode},
+        'antlr4.tree': {},
+        'antlr4.tree.Tree': {'TerminalNode': TerminalNode},
+        'antlr_out': {},
+        'antlr_out.CRUDLexer': {'CRUDLexer': CRUDLexer},
+        'antlr_out.CRUDParser': {'CRUDParser': CRUDParser},
+    }
+    for name, attrs in modules.items():
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        monkeypatch.setitem(sys.modules, name, mod)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'point2_driver.py')
+    spec = importlib.util.spec_from_file_location('point2_driver_stubbed', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_sll_success_needs_one_pass_without_listeners(stub_driver):
+    bp = stub_driver.BatchParser()
+    tree, errors, mode = bp.parse(InputStream('a b'))
+    assert (errors, mode) == ([], 'SLL')
+    assert bp.parser.calls == [('SLL', 'BailErrorStrategy', 0, [])]
+    assert bp.to_json(tree) == ['program', ['stmt', 'a'], ['stmt', 'b']]
+
+
+def test_sll_bail_reparses_from_the_first_token_with_ll(stub_driver):
+    bp = stub_driver.BatchParser()
+    tree, errors, mode = bp.parse(InputStream('a hard bad c'))
+    assert mode == 'LL'
+    assert bp.parser.calls == [('SLL', 'BailErrorStrategy', 0, []),
+                               ('LL', 'DefaultErrorStrategy', 0, [bp.listener])]
+    assert [e['message'] for e in errors] == ["extraneous input 'bad'"]
+    assert bp.to_json(tree) == ['program', ['stmt', 'a'], ['stmt', 'hard'], ['stmt', 'c']]
+    # the listener is detached again and the next input starts clean, in SLL
+    assert bp.parser.listeners == []
+    tree, errors, mode = bp.parse(InputStream('d'))
+    assert (errors, mode) == ([], 'SLL')
+    assert bp.parser.calls[-1] == ('SLL', 'BailErrorStrategy', 0, [])
+
+
+def test_lex_errors_are_kept_in_both_stages(stub_driver):
+    bp = stub_driver.BatchParser()
+    _, errors, mode = bp.parse(InputStream('a # b'))
+    assert mode == 'SLL' and [e['message'] for e in errors] == ["token recognition error at: '#'"]
+    _, errors, mode = bp.parse(InputStream('# hard bad'))
+    assert mode == 'LL'
+    assert [e['message'] for e in errors] == ["token recognition error at: '#'", "extraneous input 'bad'"]
+
+
+def test_parse_file_records_the_mode(stub_driver, tmp_path, monkeypatch):
+    monkeypatch.setattr(stub_driver, '_batch_parser', None)
+    easy, hard = tmp_path / 'easy.sql', tmp_path / 'hard.sql'
+    easy.write_text('a b')
+    hard.write_text('hard bad')
+    out = io.StringIO()
+    stub_driver.run_batch([str(easy), str(hard)], workers=1, out=out)
+    recs = records(out)
+    assert [(r['mode'], len(r['errors'])) for r in recs] == [('SLL', 0), ('LL', 1)]
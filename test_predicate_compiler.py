@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from crud_executor import ExecutionError
+from predicate_compiler import compile_batch, compile_predicate, interpret
+from rd_parser_match_punto5 import RDParserMatch, tokenize
+
+ROWS = [{'a': a, 'b': b} for a in (None, -3, 0, 1, 2) for b in (None, 0, 2)]
+COLUMNS = {c: [r[c] for r in ROWS] for c in 'ab'}
+
+
+def where(text):
+    return RDParserMatch(tokenize(f"SELECT * FROM t WHERE {text};")).parse_program()[0][3]
+
+
+def check(cond):
+    ref = [interpret(cond, r) for r in ROWS]
+    pred = compile_predicate(cond)
+    assert [pred(r) for r in ROWS] == [bool(v) for v in ref]
+    assert compile_batch(cond)(COLUMNS, range(len(ROWS))) == [i for i, v in enumerate(ref) if v]
+
+
+def rand_expr(rng, depth):
+    if depth <= 0 or rng.random() < 0.4:
+        r = rng.random()
+        return ('id', rng.choice('ab')) if r < 0.5 else ('num', str(rng.randint(0, 3))) if r < 0.9 else ('null', 'NULL')
+    return (rng.choice(['PLUS', 'MINUS', 'TIMES', 'DIV']), rand_expr(rng, depth - 1), rand_expr(rng, depth - 1))
+
+
+def rand_cond(rng, depth):
+    if depth > 0 and rng.random() < 0.5:
+        return (rng.choice(['and', 'or']), rand_cond(rng, depth - 1), rand_cond(rng, depth - 1))
+    return (rng.choice(['eq', 'neq', 'lt', 'le', 'gt', 'ge']), rand_expr(rng, 2), rand_expr(rng, 2))
+
+
+def test_random_conditions_match_interpret():
+    rng = random.Random(0)
+    checked = 0
+    while checked < 300:
+        cond = rand_cond(rng, 3)
+        try:
+            [interpret(cond, r) for r in ROWS]
+        except ExecutionError:
+            continue        # folding may drop a failing part the interpreter still evaluates
+        check(cond)
+        checked += 1
+
+
+@pytest.mark.parametrize('n', [300, 3000])
+def test_long_arithmetic_chain_compiles(n):
+    cond = where('a = ' + ' + '.join(['a'] * n))
+    check(cond)
+    assert compile_predicate(cond).__name__ == '_pred'
+    assert compile_batch(cond).__name__ == '_batch'
+
+
+def test_long_or_chain_compiles():
+    check(where(' OR '.join(f'a = {k}' for k in range(500))))
+
+
+def test_deeply_nested_and_falls_back_to_interpret():
+    cond = ('eq', ('id', 'a'), ('num', '1'))
+    for k in range(150):
+        cond = ('and', ('neq', ('id', 'b'), ('num', str(k + 5))), cond)
+    check(cond)
+    assert compile_predicate(cond).__name__ != '_pred'
+    assert compile_batch(cond).__name__ != '_batch'
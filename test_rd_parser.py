@@ -0,0 +1,194 @@
+import io
+
+import pytest
+
+import rd_parser_match_punto5 as rd
+from diagnostics import DiagnosticCollector
+
+
+def parse(s, **kw):
+    p = rd.RDParserMatch(rd.tokenize_buffer(s), **kw)
+    return p.parse_program(), p.errors
+
+
+def script(n, bad=()):
+    stmts = [f"INSERT INTO t (a, b) VALUES ({i}, 'x{i}');" if i % 2 else f"SELECT a FROM t WHERE a = {i};"
+             for i in range(n)]
+    for i, text in bad:
+        stmts[i] = text
+    return '\n'.join(stmts)
+
+
+def test_unknown_statement_does_not_swallow_the_next_one():
+    stmts, errors = parse("FOO bar; SELECT a FROM t;")
+    assert stmts == [('error_stmt',), ('select', ['a'], 't', None)]
+    assert [d.code for d in errors] == ['stmt_start']
+
+
+def test_expression_error_stops_at_semicolon():
+    stmts, errors = parse("UPDATE t SET a = ; DELETE FROM t WHERE a = 1;")
+    assert len(stmts) == 2
+    assert stmts[1] == ('delete', 't', ('assign', ('id', 'a'), ('num', '1')))
+
+
+@pytest.mark.parametrize('bad', [
+    [(12, 'FOO bar;')],
+    [(3, 'UPDATE t SET a = ;'), (20, 'SELECT FROM WHERE;'), (40, 'DELETE t;')],
+    [(0, 'INSERT INTO t VALUES (1, +);'), (51, 'SELECT a FROM t WHERE a')],
+])
+@pytest.mark.parametrize('chunks', [1, 2, 5])
+def test_parallel_matches_serial(bad, chunks):
+    s = script(52, bad)
+    stmts, errors = parse(s)
+    pstmts, perrors = rd.parse_program_parallel(s, workers=2, min_statements=1, chunks_per_worker=chunks)
+    assert pstmts == stmts
+    assert list(perrors) == list(errors)
+
+
+@pytest.mark.parametrize('cond', [
+    'a = 1', 'a = 1 AND b < 2 OR c >= 3 AND (d != 4 OR e = 5)', '((a = 1) OR (b = 2)) AND c = 3',
+    '(a + 1 = 2', 'a = 1 AND', '(a) OR b = 2', 'a = (1 + 2) * 3 OR ((b = 1))',
+])
+def test_iterative_conditions_match_the_recursive_ones(cond):
+    s = f"SELECT a FROM t WHERE {cond}; DELETE FROM t WHERE {cond};"
+    stmts, errors = parse(s)
+    it_stmts, it_errors = parse(s, iterative_expr=True)
+    assert it_stmts == stmts
+    assert list(it_errors) == list(errors)
+
+
+def test_iterative_conditions_survive_deep_nesting():
+    depth = 10000
+    stmts, errors = parse('SELECT a FROM t WHERE ' + '(' * depth + 'a = 1' + ')' * depth + ' AND b = 2;',
+                          iterative_expr=True)
+    assert not errors
+    assert stmts == [('select', ['a'], 't', ('and', ('assign', ('id', 'a'), ('num', '1')),
+                                              ('assign', ('id', 'b'), ('num', '2'))))]
+
+
+def test_parallel_and_fallback_return_a_collector():
+    s = script(4)
+    for kw in ({'workers': 1}, {'workers': 2, 'min_statements': 1}):
+        _, errors = rd.parse_program_parallel(s, **kw)
+        assert isinstance(errors, DiagnosticCollector)
+        assert errors.source is s
+
+
+@pytest.mark.parametrize('missing', [1, 6, 9])
+def test_skip_mode_survives_a_missing_semicolon_past_the_budget(missing):
+    ends = [';'] * 10
+    ends[missing] = ''
+    s = 'FOO; ' * 3 + ' '.join(f"SELECT a FROM t WHERE a = {i}{end}" for i, end in enumerate(ends))
+    full, _ = parse(s)
+    got, errors = parse(s, max_errors=2, on_limit='skip')
+    assert got == full
+    assert len(got) == 3 + 10 - (missing < 9)
+    assert errors.dropped >= 2
+
+
+INSERT_SCRIPTS = [
+    "INSERT INTO t (a, b) VALUES (1, 'x, y'), (2, 'semi; colon') -- (9);\n , (3, 'it\\'s');\n"
+    "insert into u (c) values (TRUE), (null);",
+    "  -- lead\nINSERT INTO t (a,b) VALUES (1,2);INSERT INTO t (b) VALUES ('--no comment');  -- tail",
+]
+BAD_INSERT_SCRIPTS = [
+    "INSERT INTO t (a) VALUES (1)", "INSERT INTO t (a) VALUES (1, +);", "INSERT INTO t (select) VALUES (1);",
+    "INSERT INTO t (a) VALUES ();", "INSERT INTO t (a) VALUES (1) (2);", "INSERT INTO t (a) VALUES (1);;",
+    "INSERT INTO t (a) VALUES (1); SELECT a FROM t;",
+]
+
+
+def insert_rows_from_ast(s):
+    rows = []
+    for stm in parse(s)[0]:
+        for vals in (stm[3] if stm[0] == 'insert_many' else [stm[3]]):
+            rows.append((stm[1], tuple(stm[2]), tuple(rd.literal_value(v) for v in vals)))
+    return rows
+
+
+def bulk_rows(s, chunk_size):
+    # chunk_size None: the text itself; otherwise a file object read chunk_size bytes at a time
+    if chunk_size is None:
+        return list(rd.iter_insert_rows(s))
+    return list(rd.iter_insert_rows(io.BytesIO(s.encode('utf-8')), chunk_size))
+
+
+def test_multi_row_insert_ast():
+    stmts, errors = parse(INSERT_SCRIPTS[0])
+    assert not errors
+    assert stmts[0] == ('insert_many', 't', ['a', 'b'], [[('num', '1'), ('str', "'x, y'")],
+                        [('num', '2'), ('str', "'semi; colon'")], [('num', '3'), ('str', "'it\\'s'")]])
+    assert stmts[1][0] == 'insert_many' and len(stmts[1][3]) == 2
+
+
+@pytest.mark.parametrize('s', INSERT_SCRIPTS)
+@pytest.mark.parametrize('chunk_size', [None, 1, 3, 7, 64])
+def test_iter_insert_rows_matches_the_parser(s, chunk_size):
+    assert bulk_rows(s, chunk_size) == insert_rows_from_ast(s)
+
+
+@pytest.mark.parametrize('s', BAD_INSERT_SCRIPTS)
+@pytest.mark.parametrize('chunk_size', [None, 1, 5])
+def test_iter_insert_rows_rejects_what_the_parser_rejects(s, chunk_size):
+    stmts, errors = parse(s)
+    assert errors or any(stm[0] not in ('insert', 'insert_many') for stm in stmts)
+    with pytest.raises(SyntaxError):
+        bulk_rows(s, chunk_size)
+
+
+def stream_tokens(data, chunk_size):
+    return [(t.type, t.value, t.pos) for t in rd.tokenize_stream(io.BytesIO(data), chunk_size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 4096])
+def test_tokenize_stream_matches_tokenize(chunk_size):
+    s = script(30) + "\nUPDATE t SET b = 'a;b -- c' WHERE a >= 10; -- trailing comment"
+    assert stream_tokens(s.encode('ascii'), chunk_size) == [(t.type, t.value, t.pos) for t in rd.tokenize(s)]
+
+
+@pytest.mark.parametrize('data, char, pos', [
+    (b'SELECT a FROM t WHERE a == 1 \xff;', '\ufffd', 29),
+    ('SELECT é FROM t;'.encode('utf-8'), 'é', 7),
+    (b"SELECT 'a\xffb' FROM t;", '\ufffd', 9),
+])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4096])
+def test_tokenize_stream_reports_bad_bytes_as_lex_errors(data, char, pos, chunk_size):
+    with pytest.raises(rd.LexError) as e:
+        stream_tokens(data, chunk_size)
+    assert (e.value.char, e.value.pos) == (char, pos)
+
+
+def statement_results(source):
+    return [(ast, list(errors)) for ast, errors in rd.iter_statements(source)]
+
+
+def test_iter_statements_reads_bytes_as_the_script(tmp_path):
+    s = script(20, bad=[(3, 'SELECT FROM t;')])
+    expected = statement_results(s)
+    assert expected and any(errors for _, errors in expected)
+    path = tmp_path / 'script.sql'
+    path.write_bytes(s.encode('ascii'))
+    assert statement_results(s.encode('ascii')) == expected
+    assert statement_results(path) == expected
+    with open(path, 'rb') as f:
+        assert statement_results(f) == expected
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_only_pathlike_sources_are_opened(tmp_path, monkeypatch, as_bytes):
+    # the same rule for the three streaming entry points: str and bytes are SQL text
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data.sql').write_text("INSERT INTO t (a) VALUES (1);")
+    name = b'data.sql' if as_bytes else 'data.sql'
+    assert [t.type for t in rd.tokenize_stream(name)] == ['ID', 'DOT', 'ID', 'EOF']
+    assert [ast[0] for ast, _ in rd.iter_statements(name)] == ['error_stmt']
+    with pytest.raises(SyntaxError):
+        list(rd.iter_insert_rows(name))
+    sql = "INSERT INTO t (a) VALUES (2);"
+    sql = sql.encode('ascii') if as_bytes else sql
+    assert list(rd.tokenize_stream(sql))[0].type == 'INSERT'
+    assert list(rd.iter_insert_rows(sql)) == [('t', ('a',), (2,))]
+    path = tmp_path / 'data.sql'
+    assert list(rd.tokenize_stream(path))[0].type == 'INSERT'
+    assert [ast[0] for ast, _ in rd.iter_statements(path)] == ['insert']
+    assert list(rd.iter_insert_rows(path)) == [('t', ('a',), (1,))]
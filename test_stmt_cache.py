@@ -0,0 +1,50 @@
+import pytest
+
+from diagnostics import DiagnosticCollector
+from rd_parser_match_punto5 import RDParserMatch, tokenize_buffer
+from stmt_cache import StatementCache
+
+
+def plain(s):
+    p = RDParserMatch(tokenize_buffer(s))
+    return p.parse_program(), list(p.errors)
+
+
+SCRIPT = ''.join(f"INSERT INTO users (id, name, active) VALUES ({k}, 'user{k}', {'TRUE' if k % 2 else 'NULL'});\n"
+                 f"SELECT id, name FROM users WHERE id = {k} -- k\n;\n"
+                 f"UPDATE users SET name = 'x{k}' WHERE id = {k} + 1;\n" for k in range(20))
+
+
+def test_cached_script_matches_plain_parse():
+    cache = StatementCache()
+    stmts, errors = cache.parse_program(SCRIPT)
+    assert (stmts, list(errors)) == plain(SCRIPT)
+    assert cache.stats()['hits'] == 55
+
+
+def test_errors_come_back_as_a_collector_over_the_script():
+    s = "SELECT a FROM t;\nUPDATE t SET = 1;\nSELECT a FROM t;\nUPDATE t SET = 2;"
+    cache = StatementCache()
+    stmts, errors = cache.parse_program(s)
+    assert isinstance(errors, DiagnosticCollector)
+    assert (stmts, list(errors)) == plain(s)
+    assert len(errors) == errors.total == 2
+    assert [errors.line_col(d.offset)[0] for d in errors] == [2, 4]
+    assert errors.render().startswith('2:')
+
+
+def test_filled_ast_lists_are_not_shared():
+    cache = StatementCache()
+    first = cache.parse_program("SELECT a, b FROM t WHERE a = 1;")[0][0]
+    second = cache.parse_program("SELECT a, b FROM t WHERE a = 2;")[0][0]
+    assert cache.hits == 1
+    assert first[1] == second[1] and first[1] is not second[1]
+
+
+@pytest.mark.parametrize('n', [300, 600])
+def test_long_expression_is_cached(n):
+    cache = StatementCache()
+    for k in (1, 2):
+        s = 'SELECT a FROM t WHERE a = ' + ' + '.join([str(k)] * n) + ';'
+        assert cache.parse_program(s)[0] == plain(s)[0]
+    assert cache.hits == 1
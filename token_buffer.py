@@ -0,0 +1,43 @@
+# token_buffer.py
+# Buffer compacto de tokens (struct-of-arrays) que usan el parser LL(1) del punto 3 y el de punto 5.
+# En lugar de un objeto Token por lexema guarda el tipo como entero pequeño y los offsets
+# inicio/fin en arrays tipados; el valor se corta del texto fuente solo cuando se pide.
+# token(i) / iter() devuelven la vista Token de siempre, útil para depurar.
+
+from array import array
+
+class TokenBuffer:
+    def __init__(self, src, names, keyword_kinds=(), token_cls=None):
+        self.src = src
+        self.names = names                  # kind code -> token type name
+        self.keyword_kinds = frozenset(keyword_kinds)
+        self.token_cls = token_cls
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def append(self, kind, start, end):
+        self.kinds.append(kind); self.starts.append(start); self.ends.append(end)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def type(self, i):
+        return self.names[self.kinds[i]]
+
+    def value(self, i):
+        k = self.kinds[i]
+        if k in self.keyword_kinds:
+            # keywords keep the normalized upper-case spelling, as in tokenize()
+            return self.names[k]
+        return self.src[self.starts[i]:self.ends[i]]
+
+    def token(self, i):
+        return self.token_cls(self.names[self.kinds[i]], self.value(i), self.starts[i])
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self.token(i)
+
+    def __repr__(self):
+        return f"TokenBuffer({len(self.kinds)} tokens)"